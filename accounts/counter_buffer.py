@@ -0,0 +1,236 @@
+"""Write-behind buffer for hot per-row counters and timestamps.
+Page views, downloads, quiz attempts and deck study times used to save()
+the row on every hit, taking a row lock and running the model's pre_save
+receivers each time. Hits are now summed in this process and flushed every
+COUNTER_BUFFER_FLUSH_INTERVAL seconds (or once COUNTER_BUFFER_MAX_PENDING
+rows are dirty) as one UPDATE per model:
+`SET views_count = views_count + CASE id WHEN ... END`. A flush also marks
+the affected engagement scores stale. An interval of 0 writes through.
+Other write-behind buffers (e.g. resources.unique_viewers) register() here
+to share the same flush schedule. Writes still buffered when the process
+exits are flushed then, and logged one by one if that fails.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, F, IntegerField, Value, When
+
+__all__ = [
+    "add",
+    "touch",
+    "register",
+    "after_write",
+    "pending",
+    "flush",
+]
+
+logger = logging.getLogger(__name__)
+
+# Model label -> search kind, for marking engagement scores stale after a flush
+RANKED_MODELS = {
+    'resources.Resource': 'resource',
+    'quizzes.Quiz': 'quiz',
+    'flashcards.Deck': 'deck',
+}
+
+_lock = threading.Lock()
+# (model label, field) -> {pk: delta}
+_deltas: Dict[Tuple[str, str], Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+# model label -> {pk: {field: latest value}}
+_values: Dict[str, Dict[int, Dict]] = defaultdict(dict)
+_first_pending_at = None
+_timer = None
+# (pending, flush) callables of registered buffers
+_buffers = []
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _label(model) -> str:
+    return model._meta.label
+
+
+# ========================================
+# Recording hits
+# ========================================
+
+def add(model, pk: int, field: str, delta: int = 1):
+    """Buffer `field += delta` on one row."""
+    with _lock:
+        _deltas[(_label(model), field)][pk] += delta
+    after_write()
+
+
+def touch(model, pk: int, **values):
+    """Buffer `field = value` on one row; a later touch of the same field wins."""
+    with _lock:
+        _values[_label(model)].setdefault(pk, {}).update(values)
+    after_write()
+
+
+def register(pending_fn, flush_fn):
+    """Flush another buffer alongside this one. pending_fn() returns its dirty
+    entry count; flush_fn() writes them and returns the rows written."""
+    _buffers.append((pending_fn, flush_fn))
+
+
+def pending() -> int:
+    """Number of dirty entries waiting to be flushed."""
+    with _lock:
+        own = sum(len(rows) for rows in _deltas.values()) + sum(
+            len(fields) for rows in _values.values() for fields in rows.values()
+        )
+    return own + sum(pending_fn() for pending_fn, _ in _buffers)
+
+
+def after_write():
+    """Flush now or schedule a flush, after something was buffered."""
+    global _first_pending_at, _timer
+    interval = _setting('COUNTER_BUFFER_FLUSH_INTERVAL', 10)
+    if interval <= 0 or pending() >= _setting('COUNTER_BUFFER_MAX_PENDING', 1000):
+        flush()
+        return
+    with _lock:
+        if _first_pending_at is None:
+            _first_pending_at = time.monotonic()
+        overdue = time.monotonic() - _first_pending_at >= interval
+        if _timer is None and not overdue:
+            # Flushes an idle buffer; busy processes flush from the request that finds it overdue
+            _timer = threading.Timer(interval, _flush_in_thread)
+            _timer.daemon = True
+            _timer.start()
+    if overdue:
+        flush()
+
+
+def _flush_in_thread():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f'Counter buffer flush failed: {e}', exc_info=True)
+    finally:
+        close_old_connections()
+
+
+# ========================================
+# Flushing
+# ========================================
+
+def _take():
+    global _deltas, _values, _first_pending_at
+    with _lock:
+        deltas, values = _deltas, _values
+        _deltas = defaultdict(lambda: defaultdict(int))
+        _values = defaultdict(dict)
+        _first_pending_at = None
+    return deltas, values
+
+
+def _restore(deltas, values):
+    """Put back what a failed flush could not write, so no hits are lost."""
+    with _lock:
+        for key, rows in deltas.items():
+            for pk, delta in rows.items():
+                _deltas[key][pk] += delta
+        for label, rows in values.items():
+            for pk, fields in rows.items():
+                # Newer touches recorded during the flush win
+                _values[label][pk] = {**fields, **_values[label].get(pk, {})}
+
+
+def _write_deltas(label: str, fields: Dict[str, Dict[int, int]]) -> set:
+    model = apps.get_model(label)
+    pks = set()
+    changes = {}
+    for field, rows in fields.items():
+        rows = {pk: delta for pk, delta in rows.items() if delta}
+        if not rows:
+            continue
+        pks.update(rows)
+        changes[field] = F(field) + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in rows.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    if changes:
+        # QuerySet.update() skips save() and its signals
+        model.objects.filter(pk__in=pks).update(**changes)
+    return pks
+
+
+def flush() -> int:
+    """Write every buffered change. Returns the number of rows updated."""
+    from . import ranking
+
+    deltas, values = _take()
+    by_model = defaultdict(dict)
+    for (label, field), rows in deltas.items():
+        by_model[label][field] = rows
+
+    counted = defaultdict(set)
+    touched = 0
+    try:
+        for label, fields in by_model.items():
+            counted[label] = _write_deltas(label, fields)
+            by_model[label] = {}
+        for label, rows in values.items():
+            model = apps.get_model(label)
+            for pk in list(rows):
+                model.objects.filter(pk=pk).update(**rows[pk])
+                del rows[pk]
+                touched += 1
+    except Exception:
+        _restore({(label, field): r for label, fields in by_model.items() for field, r in fields.items()}, values)
+        raise
+
+    for label, pks in counted.items():
+        if label in RANKED_MODELS and pks:
+            try:
+                ranking.mark_stale_many(RANKED_MODELS[label], pks)
+            except Exception as e:
+                print(f"Failed to mark engagement stale for {label} {sorted(pks)}: {e}")
+
+    written = touched + sum(len(pks) for pks in counted.values())
+    for _, flush_fn in _buffers:
+        try:
+            written += flush_fn()
+        except Exception as e:
+            logger.error(f'Buffered write flush failed: {e}', exc_info=True)
+    return written
+
+
+def _describe_pending() -> list:
+    """One line per buffered write, for the log when they cannot be saved."""
+    with _lock:
+        lines = [
+            f'{label}.{field} += {delta} (pk {pk})'
+            for (label, field), rows in _deltas.items() for pk, delta in rows.items() if delta
+        ] + [
+            f'{label} pk {pk}: {fields}'
+            for label, rows in _values.items() for pk, fields in rows.items()
+        ]
+    return lines + [f'{count} entries of another buffer' for count in (fn() for fn, _ in _buffers) if count]
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        if pending():
+            flush()
+    except Exception as e:
+        logger.error(f'Counter buffer flush at exit failed: {e}')
+    lost = _describe_pending()
+    if lost:
+        logger.error('Counter buffer exited with %d unsaved writes:\n%s', len(lost), '\n'.join(lost))
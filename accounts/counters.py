@@ -0,0 +1,142 @@
+"""Denormalized engagement counters on Resource, Quiz and Deck.
+Ratings, likes, bookmarks, comments and cards/questions are counted into
+columns on the content row by the signals in each app, so list pages read
+plain fields instead of aggregating per row. Every change is a single
+UPDATE with F() expressions, safe against concurrent writers;
+recompute() rebuilds the columns from the source tables
+(`manage.py recompute_counters`). CountersMixin keeps ordinary save() calls
+from writing stale counter values back over concurrent increments.
+"""
+from typing import Dict, Iterable, Optional
+
+from django.apps import apps
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+__all__ = [
+    "COUNTER_FIELDS",
+    "CountersMixin",
+    "COUNTED_RELATIONS",
+    "increment",
+    "remember_stars",
+    "rating_saved",
+    "rating_deleted",
+    "recompute",
+]
+
+# Content model -> {counter field: (related model, foreign key)}
+COUNTED_RELATIONS = {
+    'resources.Resource': {
+        'rating_count': ('resources.Rating', 'resource'),
+        'likes_count': ('resources.Like', 'resource'),
+        'bookmarks_count': ('resources.Bookmark', 'resource'),
+        'comments_count': ('resources.Comment', 'resource'),
+    },
+    'quizzes.Quiz': {
+        'rating_count': ('quizzes.QuizRating', 'quiz'),
+        'likes_count': ('quizzes.QuizLike', 'quiz'),
+        'bookmarks_count': ('quizzes.QuizBookmark', 'quiz'),
+        'comments_count': ('quizzes.QuizComment', 'quiz'),
+        'questions_count': ('quizzes.Question', 'quiz'),
+    },
+    'flashcards.Deck': {
+        'rating_count': ('flashcards.DeckRating', 'deck'),
+        'likes_count': ('flashcards.DeckLike', 'deck'),
+        'bookmarks_count': ('flashcards.DeckBookmark', 'deck'),
+        'comments_count': ('flashcards.DeckComment', 'deck'),
+        'cards_count': ('flashcards.Card', 'deck'),
+    },
+}
+
+COUNTER_FIELDS = frozenset({
+    'rating_sum', 'rating_count', 'likes_count', 'bookmarks_count',
+    'comments_count', 'questions_count', 'cards_count',
+    # Hit counters flushed by accounts.counter_buffer
+    'views_count', 'download_count', 'attempts_count',
+})
+
+
+class CountersMixin:
+    """Model mixin: a plain save() of an existing row leaves out the counters,
+    which only ever change through increment(), recompute() and the counter
+    buffer, and the model's WORKER_FIELDS, which only background workers
+    write. Only the UPDATE statement is narrowed: post_save still sees
+    update_fields=None, and a row deleted meanwhile is inserted again with
+    every field, as with any model. Explicit update_fields are written as
+    given."""
+
+    WORKER_FIELDS = ()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if update_fields is None:
+            values = [
+                value for value in values
+                if value[0].name not in COUNTER_FIELDS and value[0].name not in self.WORKER_FIELDS
+            ]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
+# ========================================
+# Incremental updates (called from signals)
+# ========================================
+
+def increment(model, pk: int, **deltas: int) -> int:
+    """Add deltas to counter columns of one row, never going below zero."""
+    changes = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items() if delta
+    }
+    if not changes:
+        return 0
+    # QuerySet.update() skips save() and its signals, so counters never trigger reindexing
+    return model.objects.filter(pk=pk).update(**changes)
+
+
+def remember_stars(rating):
+    """pre_save: keep the stored stars so rating_saved() can apply the difference."""
+    rating._previous_stars = None
+    if rating.pk and not rating._state.adding:
+        rating._previous_stars = (
+            type(rating).objects.filter(pk=rating.pk).values_list('stars', flat=True).first()
+        )
+
+
+def rating_saved(model, pk: int, rating, created: bool):
+    if created:
+        increment(model, pk, rating_count=1, rating_sum=rating.stars)
+        return
+    previous = getattr(rating, '_previous_stars', None)
+    if previous is not None:
+        increment(model, pk, rating_sum=rating.stars - previous)
+
+
+def rating_deleted(model, pk: int, rating):
+    increment(model, pk, rating_count=-1, rating_sum=-rating.stars)
+
+
+# ========================================
+# Repair
+# ========================================
+
+def _count(label: str, fk: str, value=None):
+    related = apps.get_model(label).objects.filter(**{fk: OuterRef('pk')}).order_by().values(fk)
+    aggregate = Sum(value) if value else Count('pk')
+    return Coalesce(
+        Subquery(related.annotate(total=aggregate).values('total')[:1]),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def recompute(label: str, pks: Optional[Iterable[int]] = None) -> int:
+    """Recount every counter of `label` (optionally only rows in pks) from
+    the source tables in one UPDATE. Returns the number of rows written."""
+    relations: Dict = COUNTED_RELATIONS[label]
+    rating_label, rating_fk = relations['rating_count']
+    counts = {field: _count(related, fk) for field, (related, fk) in relations.items()}
+    counts['rating_sum'] = _count(rating_label, rating_fk, 'stars')
+
+    objects = apps.get_model(label).objects.all()
+    if pks is not None:
+        objects = objects.filter(pk__in=list(pks))
+    return objects.update(**counts)
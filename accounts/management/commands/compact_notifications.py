@@ -0,0 +1,223 @@
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Length
+from django.utils import timezone
+
+from accounts.models import (
+    BroadcastNotification,
+    BroadcastReceipt,
+    Notification,
+    NotificationCounter,
+    NotificationReadState,
+)
+from accounts.services import ADMIN_TYPES, PROFESSOR_TYPES, STUDENT_TYPES, record_removed_notifications
+
+User = get_user_model()
+
+# Rough per-row overhead (tuple header, fixed-width columns, index entries)
+# added to the text column lengths when estimating reclaimed bytes
+ROW_OVERHEAD_BYTES = 96
+
+# Counter owners per role and the broadcast types they see (services.get_visible_notification_types)
+ROLE_TYPES = [
+    (Q(user__is_staff=True), ADMIN_TYPES),
+    (Q(user__is_staff=False, user__is_professor=True), PROFESSOR_TYPES),
+    (Q(user__is_staff=False, user__is_professor=False), STUDENT_TYPES),
+]
+
+ARCHIVE_FIELDS = [
+    'id', 'user_id', 'type', 'message', 'url', 'is_read', 'created_at',
+    'related_object_type', 'related_object_id',
+]
+BROADCAST_ARCHIVE_FIELDS = [
+    'id', 'audience', 'type', 'message', 'url', 'sender_id', 'created_at',
+    'related_object_type', 'related_object_id',
+]
+
+
+def _text_length(field):
+    return Coalesce(Length(field), Value(0), output_field=IntegerField())
+
+
+def _estimate_bytes(queryset) -> int:
+    """Approximate on-disk size of the rows in queryset."""
+    totals = queryset.aggregate(
+        rows=Count('id'),
+        text=Sum(_text_length('message') + _text_length('url') + _text_length('related_object_type')),
+    )
+    return (totals['text'] or 0) + totals['rows'] * ROW_OVERHEAD_BYTES
+
+
+class Command(BaseCommand):
+    help = 'Delete or archive old read notifications and collapse duplicate unread ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 30),
+            help='Remove read personal notifications older than this many days',
+        )
+        parser.add_argument(
+            '--broadcast-days', type=int,
+            default=getattr(settings, 'NOTIFICATION_BROADCAST_RETENTION_DAYS', 90),
+            help='Remove broadcast notifications older than this many days',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches')
+        parser.add_argument('--archive', help='Append removed rows as JSON lines to this file before deleting')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be removed without deleting')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.sleep = options['sleep']
+        self.dry_run = options['dry_run']
+        self.archive = open(options['archive'], 'a') if options['archive'] and not self.dry_run else None
+        now = timezone.now()
+
+        try:
+            collapsed = self.collapse_duplicates()
+            expired = self.delete_batched(
+                Notification.objects.filter(is_read=True, created_at__lt=now - timedelta(days=options['days'])),
+                ARCHIVE_FIELDS,
+            )
+            broadcasts = self.delete_broadcasts(now - timedelta(days=options['broadcast_days']))
+        finally:
+            if self.archive:
+                self.archive.close()
+
+        verb = 'Would remove' if self.dry_run else 'Removed'
+        for label, (rows, size) in [
+            ('duplicate unread notifications', collapsed),
+            ('expired read notifications', expired),
+            ('expired broadcasts', broadcasts),
+        ]:
+            self.stdout.write(f'{verb} {rows} {label} (~{size} bytes)')
+        total_rows = collapsed[0] + expired[0] + broadcasts[0]
+        total_bytes = collapsed[1] + expired[1] + broadcasts[1]
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total_rows} rows, ~{total_bytes} bytes in total'))
+
+    def _lock(self, queryset):
+        # Skip rows a live request is updating instead of waiting on them (Postgres);
+        # SQLite serializes writers, so the filters re-applied on delete are enough there
+        if connection.features.has_select_for_update_skip_locked:
+            return queryset.select_for_update(skip_locked=True)
+        return queryset
+
+    def _archive_rows(self, kind, rows):
+        if self.archive:
+            for row in rows:
+                self.archive.write(json.dumps({'kind': kind, **row}, cls=DjangoJSONEncoder) + '\n')
+
+    def delete_batched(self, queryset, archive_fields, kind='notification', before_delete=None):
+        """Delete rows matching queryset in short transactions. Returns (rows, bytes).
+        before_delete(ids) runs in each batch's transaction, before its rows go."""
+        if self.dry_run:
+            return queryset.count(), _estimate_bytes(queryset)
+
+        total_rows = total_bytes = 0
+        while True:
+            with transaction.atomic():
+                batch = list(self._lock(queryset.order_by('id')).values(*archive_fields)[:self.batch_size])
+                if not batch:
+                    break
+                ids = [row['id'] for row in batch]
+                matching = queryset.filter(pk__in=ids)
+                size = _estimate_bytes(matching)
+                if before_delete:
+                    before_delete(ids)
+                deleted = matching.delete()[1].get(queryset.model._meta.label, 0)
+                self._archive_rows(kind, batch)
+            total_rows += deleted
+            total_bytes += size
+            if len(batch) < self.batch_size:
+                break
+            time.sleep(self.sleep)
+        return total_rows, total_bytes
+
+    def collapse_duplicates(self):
+        """Keep only the newest unread notification per user, type and related object."""
+        groups = (
+            Notification.objects.filter(
+                is_read=False, related_object_type__isnull=False, related_object_id__isnull=False,
+            )
+            .values('user_id', 'type', 'related_object_type', 'related_object_id')
+            .annotate(total=Count('id'), newest=Max('id'))
+            .filter(total__gt=1)
+            .order_by()
+        )
+
+        total_rows = total_bytes = 0
+        for group in groups.iterator():
+            duplicates = Notification.objects.filter(
+                user_id=group['user_id'],
+                type=group['type'],
+                related_object_type=group['related_object_type'],
+                related_object_id=group['related_object_id'],
+                is_read=False,
+                id__lt=group['newest'],
+            )
+            if self.dry_run:
+                total_rows += group['total'] - 1
+                total_bytes += _estimate_bytes(duplicates)
+                continue
+
+            with transaction.atomic():
+                batch = list(self._lock(duplicates.order_by('id')).values(*ARCHIVE_FIELDS))
+                matching = duplicates.filter(pk__in=[row['id'] for row in batch])
+                size = _estimate_bytes(matching)
+                # Still-unread rows only, so a concurrent mark-read never gets decremented twice
+                deleted = matching.delete()[1].get(Notification._meta.label, 0)
+                record_removed_notifications(group['user_id'], group['type'], deleted)
+                self._archive_rows('notification', batch)
+            total_rows += deleted
+            total_bytes += size
+        return total_rows, total_bytes
+
+    def delete_broadcasts(self, cutoff):
+        expired = BroadcastNotification.objects.filter(created_at__lt=cutoff)
+        return self.delete_batched(
+            expired, BROADCAST_ARCHIVE_FIELDS, kind='broadcast', before_delete=self.uncount_broadcasts,
+        )
+
+    def uncount_broadcasts(self, ids):
+        """Subtract broadcasts about to be deleted from the counters that counted
+        them as unread: those whose sequence already covers them, for users who
+        could see them and had neither a receipt nor a watermark past them."""
+        first_id = min(ids)
+        audiences = BroadcastNotification.objects.filter(pk__in=ids).values_list('audience', flat=True).distinct()
+        for audience in list(audiences):
+            for role, types in ROLE_TYPES:
+                counted = (
+                    BroadcastNotification.objects.filter(
+                        pk__in=ids,
+                        audience=audience,
+                        type__in=types,
+                        id__lte=OuterRef('broadcast_seq'),
+                    )
+                    .exclude(sender_id=OuterRef('user_id'))
+                    .filter(Exists(User.objects.filter(
+                        pk=OuterRef(OuterRef('user_id')), date_joined__lte=OuterRef('created_at'),
+                    )))
+                    .filter(~Exists(BroadcastReceipt.objects.filter(
+                        broadcast=OuterRef('pk'), user_id=OuterRef(OuterRef('user_id')),
+                    )))
+                    .filter(~Exists(NotificationReadState.objects.filter(
+                        user_id=OuterRef(OuterRef('user_id')), broadcasts_read_until__gte=OuterRef('created_at'),
+                    )))
+                    .order_by()
+                    .values('audience')
+                    .annotate(total=Count('id'))
+                    .values('total')
+                )
+                NotificationCounter.objects.filter(
+                    role, broadcast_audience=audience, broadcast_seq__gte=first_id, broadcast_unread__gt=0,
+                ).update(broadcast_unread=Greatest(
+                    F('broadcast_unread') - Coalesce(Subquery(counted, output_field=IntegerField()), 0), 0,
+                ))
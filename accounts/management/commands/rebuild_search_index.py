@@ -0,0 +1,66 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts import search
+from accounts.models import SearchDocument
+
+DOCUMENT_FIELDS = [
+    'owner_id', 'title', 'description', 'author', 'content', 'resource_type',
+    'is_public', 'verification_status', 'created_at',
+]
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the global search index (SearchDocument rows) from Resources, Quizzes and Decks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Documents written per batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        for label, (kind, owner_field) in search.SEARCH_KINDS.items():
+            model = apps.get_model(label)
+            objects = model.objects.select_related(owner_field).order_by('pk')
+            if kind == 'resource':
+                objects = objects.select_related('extracted_text')
+            indexed = 0
+            batch = []
+            for instance in objects.iterator(chunk_size=batch_size):
+                batch.append(SearchDocument(kind=kind, object_id=instance.pk, **search.document_values(instance)))
+                if len(batch) >= batch_size:
+                    indexed += self.write_batch(batch)
+                    batch = []
+            if batch:
+                indexed += self.write_batch(batch)
+
+            # Documents whose object no longer exists
+            removed, _ = (
+                SearchDocument.objects.filter(kind=kind)
+                .exclude(object_id__in=model.objects.values('pk'))
+                .delete()
+            )
+            self.stdout.write(f'{kind}: {indexed} indexed, {removed} stale documents removed')
+
+        updated = search.update_search_vectors(SearchDocument.objects.all())
+        if updated:
+            self.stdout.write(f'Recomputed {updated} search vectors')
+        if connection.vendor == 'sqlite' and 'search_fts' in connection.introspection.table_names():
+            with connection.cursor() as cursor:
+                cursor.execute("INSERT INTO search_fts (search_fts) VALUES ('rebuild')")
+            self.stdout.write('Rebuilt the FTS5 table')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt: {SearchDocument.objects.count()} documents'
+        ))
+
+    def write_batch(self, documents):
+        with transaction.atomic():
+            SearchDocument.objects.bulk_create(
+                documents,
+                update_conflicts=True,
+                unique_fields=['kind', 'object_id'],
+                update_fields=DOCUMENT_FIELDS,
+            )
+        return len(documents)
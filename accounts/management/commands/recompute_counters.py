@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from accounts import counters
+
+MODEL_CHOICES = {
+    'resource': 'resources.Resource',
+    'quiz': 'quizzes.Quiz',
+    'deck': 'flashcards.Deck',
+}
+
+
+class Command(BaseCommand):
+    help = 'Recount likes, ratings, bookmarks, comments and cards/questions counters from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(MODEL_CHOICES), help='Only this content type')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows recounted per UPDATE')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        labels = [MODEL_CHOICES[options['model']]] if options['model'] else list(MODEL_CHOICES.values())
+
+        total = 0
+        for label in labels:
+            pks = list(apps.get_model(label).objects.order_by('pk').values_list('pk', flat=True))
+            updated = 0
+            # Short UPDATEs keep row locks brief while the site is live
+            for start in range(0, len(pks), batch_size):
+                updated += counters.recompute(label, pks[start:start + batch_size])
+            self.stdout.write(f'{label}: {updated} rows recounted')
+            total += updated
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed counters for {total} rows'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from accounts import ranking
+from accounts.models import EngagementScore
+
+
+class Command(BaseCommand):
+    help = 'Recompute stale engagement scores used to rank global search results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Documents scored per batch')
+        parser.add_argument('--all', action='store_true', help='Recompute every score, not just stale ones')
+
+    def handle(self, *args, **options):
+        refreshed = ranking.refresh_stale(batch_size=options['batch_size'], refresh_all=options['all'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {refreshed} engagement scores ({EngagementScore.objects.count()} total)'
+        ))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import notification_queue
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notifications (run alongside the web process)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Jobs claimed per batch')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        sleep = options['sleep']
+        once = options['once']
+
+        released = notification_queue.release_stale_jobs()
+        if released:
+            self.stdout.write(self.style.WARNING(f'Re-queued {released} stale jobs'))
+
+        self.stdout.write(self.style.SUCCESS('Notification worker started'))
+        total_delivered = total_failed = 0
+        try:
+            while True:
+                close_old_connections()
+                result = notification_queue.run_batch(batch_size)
+                total_delivered += result['delivered']
+                total_failed += result['failed']
+                if result['delivered'] or result['failed']:
+                    self.stdout.write(
+                        f"Delivered {result['delivered']} jobs, {result['failed']} failed"
+                    )
+                    continue
+                if once:
+                    break
+                time.sleep(sleep)
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Notification worker stopped: {total_delivered} delivered, {total_failed} failed'
+        ))
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_user_course'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audience', models.CharField(choices=[('students', 'Students'), ('professors', 'Professors')], max_length=20)),
+                ('type', models.CharField(choices=[('new_upload', 'New Upload'), ('new_comment', 'New Comment'), ('new_rating', 'New Rating'), ('verification_approved', 'Verification Approved'), ('verification_rejected', 'Verification Rejected'), ('new_bookmark', 'New Bookmark'), ('quiz_attempt', 'Quiz Attempt'), ('content_review', 'Content Review Required'), ('student_question', 'Student Question'), ('new_enrollment', 'New Enrollment'), ('new_user_registration', 'New User Registration'), ('reported_content', 'Reported Content'), ('system_alert', 'System Alert'), ('password_reset_request', 'Password Reset Request')], max_length=50)),
+                ('message', models.TextField()),
+                ('url', models.URLField(blank=True, help_text='Link to related content', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('related_object_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('related_object_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('sender', models.ForeignKey(blank=True, help_text='User who triggered the broadcast (never notified about it)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sent_broadcasts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('broadcasts_read_until', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BroadcastReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True)),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='accounts.broadcastnotification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'broadcast')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['audience', '-created_at'], name='accounts_br_audienc_5e9fc9_idx'),
+        ),
+    ]
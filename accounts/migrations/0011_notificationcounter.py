@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_notificationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('personal_unread', models.PositiveIntegerField(default=0)),
+                ('student_unread', models.PositiveIntegerField(default=0)),
+                ('professor_unread', models.PositiveIntegerField(default=0)),
+                ('admin_unread', models.PositiveIntegerField(default=0)),
+                ('broadcast_audience', models.CharField(blank=True, max_length=20)),
+                ('broadcast_unread', models.PositiveIntegerField(default=0)),
+                ('broadcast_seq', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['audience', 'id'], name='accounts_br_audienc_7d0a7e_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_counter', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
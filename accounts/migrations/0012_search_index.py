@@ -0,0 +1,63 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# (kind, table, owner column) for every model indexed by accounts.search
+SEARCH_TABLES = [
+    ('resource', 'resources_resource', 'uploader_id'),
+    ('quiz', 'quizzes_quiz', 'creator_id'),
+    ('deck', 'flashcards_deck', 'owner_id'),
+]
+
+# Must match accounts.search.search_vector() so the planner uses the index
+SEARCH_VECTOR_SQL = (
+    "(setweight(to_tsvector('english'::regconfig, COALESCE(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, COALESCE(description, '')), 'B'))"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for _, table, _ in SEARCH_TABLES:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING gin ({SEARCH_VECTOR_SQL})"
+            )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+                "kind UNINDEXED, object_id UNINDEXED, title, description, author, "
+                "tokenize='porter unicode61', prefix='2 3')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5: accounts.search falls back to substring matching
+            return
+        for kind, table, owner_column in SEARCH_TABLES:
+            schema_editor.execute(
+                f"INSERT INTO search_fts (kind, object_id, title, description, author) "
+                f"SELECT '{kind}', t.id, t.title, coalesce(t.description, ''), coalesce(u.username, '') "
+                f"FROM {table} AS t LEFT JOIN accounts_user AS u ON u.id = t.{owner_column}"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for _, table, _ in SEARCH_TABLES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_gin")
+    elif vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS search_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_notificationcounter'),
+        ('resources', '0005_like_alter_comment_options_comment_parent_comment_and_more'),
+        ('quizzes', '0006_quizlike_alter_quizcomment_options_and_more'),
+        ('flashcards', '0009_remove_deck_is_bookmarked_deckbookmark'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
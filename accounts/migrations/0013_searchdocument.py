@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:16
+
+from django.conf import settings
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('resource', 'Resource'), ('quiz', 'Quiz'), ('deck', 'Flashcard Deck')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('author', models.CharField(blank=True, help_text="Owner's username when indexed", max_length=150)),
+                ('resource_type', models.CharField(blank=True, max_length=20)),
+                ('is_public', models.BooleanField(default=True)),
+                ('verification_status', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_public', 'kind', '-created_at'], name='accounts_se_is_publ_7d6491_idx')],
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
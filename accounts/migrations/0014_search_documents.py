@@ -0,0 +1,94 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+DOCUMENT_COLUMNS = (
+    'kind, object_id, owner_id, title, description, author, resource_type, '
+    'is_public, verification_status, created_at'
+)
+
+# One SELECT per indexed content table, producing DOCUMENT_COLUMNS
+DOCUMENT_SOURCES = [
+    "SELECT 'resource', t.id, t.uploader_id, t.title, coalesce(t.description, ''), u.username, "
+    "t.resource_type, t.is_public, t.verification_status, t.created_at "
+    "FROM resources_resource AS t JOIN accounts_user AS u ON u.id = t.uploader_id",
+    "SELECT 'quiz', t.id, t.creator_id, t.title, coalesce(t.description, ''), u.username, "
+    "'', t.is_public, t.verification_status, t.created_at "
+    "FROM quizzes_quiz AS t JOIN accounts_user AS u ON u.id = t.creator_id",
+    "SELECT 'deck', t.id, t.owner_id, t.title, coalesce(t.description, ''), u.username, "
+    "'', t.visibility = 'public', t.verification_status, t.created_at "
+    "FROM flashcards_deck AS t JOIN accounts_user AS u ON u.id = t.owner_id",
+]
+
+# Content tables indexed in place by 0012
+SEARCH_TABLES = ['resources_resource', 'quizzes_quiz', 'flashcards_deck']
+
+# External-content FTS5 index over accounts_searchdocument, synced by triggers
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE search_fts USING fts5("
+    "title, description, author, content='accounts_searchdocument', content_rowid='id', "
+    "tokenize='porter unicode61', prefix='2 3')",
+    "CREATE TRIGGER search_fts_ai AFTER INSERT ON accounts_searchdocument BEGIN "
+    "INSERT INTO search_fts (rowid, title, description, author) "
+    "VALUES (new.id, new.title, new.description, new.author); END",
+    "CREATE TRIGGER search_fts_ad AFTER DELETE ON accounts_searchdocument BEGIN "
+    "INSERT INTO search_fts (search_fts, rowid, title, description, author) "
+    "VALUES ('delete', old.id, old.title, old.description, old.author); END",
+    "CREATE TRIGGER search_fts_au AFTER UPDATE ON accounts_searchdocument BEGIN "
+    "INSERT INTO search_fts (search_fts, rowid, title, description, author) "
+    "VALUES ('delete', old.id, old.title, old.description, old.author); "
+    "INSERT INTO search_fts (rowid, title, description, author) "
+    "VALUES (new.id, new.title, new.description, new.author); END",
+]
+
+
+def create_search_documents(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # Replaces the per-object table from 0012
+        schema_editor.execute("DROP TABLE IF EXISTS search_fts")
+        try:
+            for statement in SQLITE_FTS:
+                schema_editor.execute(statement)
+        except OperationalError:
+            # SQLite built without FTS5: accounts.search falls back to substring matching
+            pass
+
+    for source in DOCUMENT_SOURCES:
+        schema_editor.execute(f"INSERT INTO accounts_searchdocument ({DOCUMENT_COLUMNS}) {source}")
+
+    if vendor == 'postgresql':
+        # Replaces the per-table expression indexes from 0012
+        for table in SEARCH_TABLES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_gin")
+        schema_editor.execute(
+            "UPDATE accounts_searchdocument SET search_vector = "
+            "setweight(to_tsvector('english', title), 'A') || "
+            "setweight(to_tsvector('english', description), 'B') || "
+            "setweight(to_tsvector('english', author), 'C')"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS accounts_searchdocument_search_gin "
+            "ON accounts_searchdocument USING gin (search_vector)"
+        )
+
+
+def drop_search_documents(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for trigger in ['search_fts_ai', 'search_fts_ad', 'search_fts_au']:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        schema_editor.execute("DROP TABLE IF EXISTS search_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS accounts_searchdocument_search_gin")
+    schema_editor.execute("DELETE FROM accounts_searchdocument")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_searchdocument'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_documents, drop_search_documents),
+    ]
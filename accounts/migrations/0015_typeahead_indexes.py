@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Trigram indexes on the UPPER() expressions Django emits for
+# icontains/istartswith, so typeahead lookups never scan the tables
+TRIGRAM_INDEXES = [
+    ('accounts_searchdocument_title_trgm', 'accounts_searchdocument', 'title'),
+    ('accounts_searchdocument_author_trgm', 'accounts_searchdocument', 'author'),
+    ('resources_tag_name_trgm', 'resources_tag', 'name'),
+]
+
+
+def create_typeahead_indexes(apps, schema_editor):
+    # SQLite serves typeahead from the FTS5 prefix index created in 0014
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)"
+        )
+
+
+def drop_typeahead_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_search_documents'),
+        ('resources', '0005_like_alter_comment_options_comment_parent_comment_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_typeahead_indexes, drop_typeahead_indexes),
+    ]
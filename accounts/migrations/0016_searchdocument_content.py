@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:20
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+FTS_COLUMNS = ['title', 'description', 'author', 'content']
+
+
+def _fts_sql():
+    columns = ', '.join(FTS_COLUMNS)
+    new_values = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+    old_values = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+    return [
+        "CREATE VIRTUAL TABLE search_fts USING fts5("
+        f"{columns}, content='accounts_searchdocument', content_rowid='id', "
+        "tokenize='porter unicode61', prefix='2 3')",
+        "CREATE TRIGGER search_fts_ai AFTER INSERT ON accounts_searchdocument BEGIN "
+        f"INSERT INTO search_fts (rowid, {columns}) VALUES (new.id, {new_values}); END",
+        "CREATE TRIGGER search_fts_ad AFTER DELETE ON accounts_searchdocument BEGIN "
+        f"INSERT INTO search_fts (search_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        "CREATE TRIGGER search_fts_au AFTER UPDATE ON accounts_searchdocument BEGIN "
+        f"INSERT INTO search_fts (search_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO search_fts (rowid, {columns}) VALUES (new.id, {new_values}); END",
+        "INSERT INTO search_fts (search_fts) VALUES ('rebuild')",
+    ]
+
+
+def rebuild_fts_with_content(apps, schema_editor):
+    """Recreate the SQLite FTS5 table from 0014 with the new content column."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in ['search_fts_ai', 'search_fts_ad', 'search_fts_au']:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    schema_editor.execute("DROP TABLE IF EXISTS search_fts")
+    try:
+        for statement in _fts_sql():
+            schema_editor.execute(statement)
+    except OperationalError:
+        # SQLite built without FTS5: accounts.search falls back to substring matching
+        pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_typeahead_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchdocument',
+            name='content',
+            field=models.TextField(blank=True, help_text='Text extracted from the uploaded file (resources only)'),
+        ),
+        migrations.RunPython(rebuild_fts_with_content, migrations.RunPython.noop),
+    ]
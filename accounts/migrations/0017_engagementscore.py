@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_searchdocument_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementScore',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='engagement', serialize=False, to='accounts.searchdocument')),
+                ('rating_avg', models.FloatField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('downloads', models.PositiveIntegerField(default=0)),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('is_verified', models.BooleanField(default=False)),
+                ('score', models.FloatField(default=0, help_text='Engagement score between 0 and 1')),
+                ('is_stale', models.BooleanField(db_index=True, default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.urls import reverse
@@ -185,6 +186,10 @@ class User(AbstractUser):
         db_table = 'accounts_user'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+        indexes = [
+            # Keyset pagination in manage_users
+            models.Index(fields=['date_joined', 'id']),
+        ]
 
     def clean(self):
         super().clean()
@@ -548,6 +553,196 @@ class Notification(models.Model):
             self.save(update_fields=['is_read'])
 
 
+class BroadcastNotification(models.Model):
+    """
+    A notification addressed to a whole audience instead of a single user.
+    Stored once per event and merged with each user's personal notifications
+    at read time (see accounts.services).
+    """
+
+    AUDIENCE_CHOICES = [
+        ('students', 'Students'),
+        ('professors', 'Professors'),
+    ]
+
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES)
+    type = models.CharField(max_length=50, choices=Notification.NOTIFICATION_TYPES)
+    message = models.TextField()
+    url = models.URLField(blank=True, null=True, help_text='Link to related content')
+    sender = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sent_broadcasts',
+        help_text='User who triggered the broadcast (never notified about it)'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    related_object_type = models.CharField(max_length=50, blank=True, null=True)
+    related_object_id = models.PositiveIntegerField(blank=True, null=True)
+
+    # Prefix used to keep broadcast ids apart from personal notification ids in the API
+    ID_PREFIX = 'b'
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['audience', '-created_at']),
+            models.Index(fields=['audience', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_display()} for {self.get_audience_display()}"
+
+    @property
+    def public_id(self):
+        return f"{self.ID_PREFIX}{self.pk}"
+
+
+class BroadcastReceipt(models.Model):
+    """Marks a single broadcast notification as read by a user."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'broadcast']
+
+
+class NotificationReadState(models.Model):
+    """
+    Per-user read watermark for broadcast notifications.
+    Every broadcast created at or before broadcasts_read_until counts as read,
+    so "mark all as read" is a single-row update.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_state')
+    broadcasts_read_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Notification state for {self.user.get_display_name()}"
+
+
+class NotificationCounter(models.Model):
+    """
+    Maintained unread notification counts, so the bell poller reads one row
+    instead of running COUNT(*) over Notification.
+    Personal counts are split by role-visible type group; broadcast_unread
+    covers broadcasts up to broadcast_seq (the last broadcast id counted).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_counter')
+    personal_unread = models.PositiveIntegerField(default=0)
+    student_unread = models.PositiveIntegerField(default=0)
+    professor_unread = models.PositiveIntegerField(default=0)
+    admin_unread = models.PositiveIntegerField(default=0)
+    broadcast_audience = models.CharField(max_length=20, blank=True)
+    broadcast_unread = models.PositiveIntegerField(default=0)
+    broadcast_seq = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Unread counters for {self.user.get_display_name()}"
+
+
+class NotificationJob(models.Model):
+    """
+    Pending notification delivery, processed outside the request by
+    `manage.py run_notification_worker` (see accounts.notification_queue).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50, help_text='Handler name in accounts.notification_queue')
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} job #{self.pk} ({self.status})"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized search row for one Resource, Quiz or Deck, maintained by
+    signals (see accounts.search) and rebuilt by `manage.py rebuild_search_index`.
+    Global search ranks and counts every content type with a single query here.
+    """
+    KIND_CHOICES = [
+        ('resource', 'Resource'),
+        ('quiz', 'Quiz'),
+        ('deck', 'Flashcard Deck'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_documents')
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    author = models.CharField(max_length=150, blank=True, help_text="Owner's username when indexed")
+    content = models.TextField(blank=True, help_text='Text extracted from the uploaded file (resources only)')
+    resource_type = models.CharField(max_length=20, blank=True)
+    is_public = models.BooleanField(default=True)
+    verification_status = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField()
+    # Postgres only; SQLite searches the search_fts FTS5 table kept in sync by triggers
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+        indexes = [
+            models.Index(fields=['is_public', 'kind', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}: {self.title}"
+
+    def get_absolute_url(self):
+        url_names = {
+            'resource': 'resources:resource_detail',
+            'quiz': 'quizzes:quiz_detail',
+            'deck': 'flashcards:deck_detail',
+        }
+        return reverse(url_names[self.kind], args=[self.object_id])
+
+
+class EngagementScore(models.Model):
+    """
+    Precomputed engagement features for one search document, blended with
+    text relevance by accounts.search. Kept apart from SearchDocument so
+    frequent counter updates never rewrite (or re-index) the searchable row.
+    Signals mark rows stale; `manage.py refresh_engagement_scores` recomputes them.
+    """
+    document = models.OneToOneField(
+        SearchDocument, on_delete=models.CASCADE, primary_key=True, related_name='engagement'
+    )
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    views = models.PositiveIntegerField(default=0)
+    downloads = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    is_verified = models.BooleanField(default=False)
+    score = models.FloatField(default=0, help_text='Engagement score between 0 and 1')
+    is_stale = models.BooleanField(default=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Engagement {self.score:.2f} for {self.document}"
+
+
 class PasswordResetToken(models.Model):
     """Model to store password reset tokens for users"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='password_reset_token')
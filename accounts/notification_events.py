@@ -0,0 +1,160 @@
+"""Change events that wake notification streams.
+Whatever changes what a user's bell shows (the worker creating personal
+notifications or a broadcast, a user marking notifications read) publishes
+a small event. On PostgreSQL events go over LISTEN/NOTIFY: pg_notify joins
+the publisher's transaction, so an event is delivered on commit and never
+for rolled-back work, and it reaches every web process, including ones fed
+by the separate notification worker. Each web process runs one listener
+thread on its own connection and wakes only the streams the event concerns
+(a user id, or a broadcast audience). Other databases have no cross-process
+channel; there events are delivered in process after commit, which covers
+runserver with NOTIFICATION_QUEUE_EAGER.
+"""
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+
+from django.db import connection, transaction
+
+__all__ = [
+    "CHANNEL",
+    "Subscription",
+    "publish_users",
+    "publish_audience",
+    "subscribe",
+    "unsubscribe",
+]
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'papertrail_notifications'
+# pg_notify payloads must stay below 8000 bytes
+USER_IDS_PER_EVENT = 500
+LISTEN_RECONNECT_DELAY = 5
+
+_lock = threading.Lock()
+_by_user: Dict[int, Set['Subscription']] = defaultdict(set)
+_by_audience: Dict[str, Set['Subscription']] = defaultdict(set)
+_listener: Optional[threading.Thread] = None
+
+
+class Subscription:
+    """One open stream's interest in a user's notifications."""
+
+    def __init__(self, user_id: int, audience: str):
+        self.user_id = user_id
+        self.audience = audience
+        self._event = threading.Event()
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, timeout: float) -> bool:
+        """Block until an event arrives (True) or `timeout` passes (False)."""
+        woken = self._event.wait(timeout)
+        self._event.clear()
+        return woken
+
+
+# ========================================
+# Publishing
+# ========================================
+
+def _uses_listen_notify() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def _publish(payload: Dict):
+    if _uses_listen_notify():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(payload)])
+    else:
+        transaction.on_commit(lambda: _dispatch(payload))
+
+
+def publish_users(user_ids: Iterable[int]):
+    """Wake these users' streams once the current transaction commits."""
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), USER_IDS_PER_EVENT):
+        _publish({'users': user_ids[start:start + USER_IDS_PER_EVENT]})
+
+
+def publish_audience(audience: str):
+    """Wake every stream of a broadcast audience once the current transaction commits."""
+    _publish({'audience': audience})
+
+
+# ========================================
+# Subscribing
+# ========================================
+
+def _dispatch(payload: Dict):
+    with _lock:
+        woken = set()
+        for user_id in payload.get('users', ()):
+            woken.update(_by_user.get(user_id, ()))
+        if payload.get('audience'):
+            woken.update(_by_audience.get(payload['audience'], ()))
+        if payload.get('all'):
+            woken.update(*_by_user.values())
+    for subscription in woken:
+        subscription.notify()
+
+
+def subscribe(user_id: int, audience: str) -> Subscription:
+    subscription = Subscription(user_id, audience)
+    with _lock:
+        _by_user[user_id].add(subscription)
+        _by_audience[audience].add(subscription)
+    if _uses_listen_notify():
+        _start_listener()
+    return subscription
+
+
+def unsubscribe(subscription: Subscription):
+    with _lock:
+        for index, key in ((_by_user, subscription.user_id), (_by_audience, subscription.audience)):
+            index[key].discard(subscription)
+            if not index[key]:
+                del index[key]
+
+
+def _start_listener():
+    global _listener
+    with _lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, name='notification-listener', daemon=True)
+            _listener.start()
+
+
+def _listen():
+    """Listener thread: LISTEN on its own connection and dispatch notifies."""
+    while True:
+        try:
+            connection.ensure_connection()
+            raw = connection.connection
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            # Events may have been missed while (re)connecting
+            _dispatch({'all': True})
+            while True:
+                if select.select([raw], [], [], 60) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    notify = raw.notifies.pop(0)
+                    try:
+                        _dispatch(json.loads(notify.payload))
+                    except ValueError:
+                        logger.warning(f'Ignoring malformed notification event: {notify.payload!r}')
+        except Exception as e:
+            logger.error(f'Notification listener failed, reconnecting: {e}', exc_info=True)
+            try:
+                connection.close()
+            except Exception:
+                pass
+            time.sleep(LISTEN_RECONNECT_DELAY)
@@ -0,0 +1,233 @@
+"""DB-backed notification delivery queue.
+Signals and views enqueue a compact job row inside the request; the
+`run_notification_worker` management command claims jobs in batches and
+creates the actual Notification / BroadcastNotification rows.
+"""
+import logging
+import uuid
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification, NotificationJob
+from .services import broadcast_notification, record_new_notifications
+
+__all__ = [
+    "enqueue",
+    "enqueue_notification",
+    "enqueue_broadcast",
+    "enqueue_admin_notification",
+    "claim_jobs",
+    "process_job",
+    "run_batch",
+    "release_stale_jobs",
+]
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+STALE_AFTER = timedelta(minutes=10)
+
+User = get_user_model()
+
+
+# ========================================
+# Job handlers
+# ========================================
+
+def _notify_user(payload: Dict):
+    Notification.objects.create(
+        user_id=payload['user_id'],
+        type=payload['type'],
+        message=payload['message'],
+        url=payload.get('url'),
+        related_object_type=payload.get('related_object_type'),
+        related_object_id=payload.get('related_object_id'),
+    )
+    record_new_notifications([payload['user_id']], payload['type'])
+
+
+def _notify_admins(payload: Dict):
+    if payload.get('superusers_only'):
+        admins = User.objects.filter(is_staff=True, is_superuser=True)
+    else:
+        admins = User.objects.filter(Q(is_staff=True) | Q(is_superuser=True))
+    if payload.get('exclude_user_id'):
+        admins = admins.exclude(id=payload['exclude_user_id'])
+    admin_ids = list(admins.values_list('id', flat=True).distinct())
+    Notification.objects.bulk_create([
+        Notification(
+            user_id=admin_id,
+            type=payload['type'],
+            message=payload['message'],
+            url=payload.get('url'),
+            related_object_type=payload.get('related_object_type'),
+            related_object_id=payload.get('related_object_id'),
+        )
+        for admin_id in admin_ids
+    ])
+    record_new_notifications(admin_ids, payload['type'])
+
+
+def _broadcast(payload: Dict):
+    broadcast_notification(
+        audience=payload['audience'],
+        type=payload['type'],
+        message=payload['message'],
+        url=payload.get('url'),
+        sender=User.objects.filter(pk=payload.get('sender_id')).first() if payload.get('sender_id') else None,
+        related_object_type=payload.get('related_object_type'),
+        related_object_id=payload.get('related_object_id'),
+    )
+
+
+HANDLERS: Dict[str, Callable[[Dict], None]] = {
+    'notify_user': _notify_user,
+    'notify_admins': _notify_admins,
+    'broadcast': _broadcast,
+}
+
+
+# ========================================
+# Producers
+# ========================================
+
+def enqueue(kind: str, payload: Dict) -> NotificationJob:
+    """Queue a notification job. The row joins the caller's transaction, so a
+    rolled-back upload never produces a notification.
+    With NOTIFICATION_QUEUE_EAGER the job is delivered right after commit
+    (handy for local development without a worker)."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown notification job kind: {kind}")
+    job = NotificationJob.objects.create(kind=kind, payload=payload)
+    if getattr(settings, 'NOTIFICATION_QUEUE_EAGER', False):
+        transaction.on_commit(lambda: _run_eager(job.pk))
+    return job
+
+
+def enqueue_notification(user, type, message, url=None,
+                         related_object_type=None, related_object_id=None) -> NotificationJob:
+    """Queue a personal notification for a single user."""
+    return enqueue('notify_user', {
+        'user_id': user.pk,
+        'type': type,
+        'message': message,
+        'url': url,
+        'related_object_type': related_object_type,
+        'related_object_id': related_object_id,
+    })
+
+
+def enqueue_broadcast(audience, type, message, url=None, sender=None,
+                      related_object_type=None, related_object_id=None) -> NotificationJob:
+    """Queue a broadcast notification for a whole audience."""
+    return enqueue('broadcast', {
+        'audience': audience,
+        'type': type,
+        'message': message,
+        'url': url,
+        'sender_id': sender.pk if sender else None,
+        'related_object_type': related_object_type,
+        'related_object_id': related_object_id,
+    })
+
+
+def enqueue_admin_notification(type, message, url=None, related_object_type=None,
+                               related_object_id=None, exclude_user=None,
+                               superusers_only=False) -> NotificationJob:
+    """Queue a notification for every admin; the admin lookup happens in the worker."""
+    return enqueue('notify_admins', {
+        'type': type,
+        'message': message,
+        'url': url,
+        'related_object_type': related_object_type,
+        'related_object_id': related_object_id,
+        'exclude_user_id': exclude_user.pk if exclude_user else None,
+        'superusers_only': superusers_only,
+    })
+
+
+# ========================================
+# Worker side
+# ========================================
+
+def claim_jobs(batch_size: int = 100) -> List[NotificationJob]:
+    """Atomically claim up to batch_size due jobs for this worker.
+    Uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports it
+    (Postgres); otherwise (SQLite) relies on the conditional UPDATE, which
+    only succeeds for rows still pending."""
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    with transaction.atomic():
+        due = NotificationJob.objects.filter(status='pending', run_after__lte=now).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        job_ids = list(due.values_list('id', flat=True)[:batch_size])
+        if not job_ids:
+            return []
+        NotificationJob.objects.filter(pk__in=job_ids, status='pending').update(
+            status='processing',
+            claim_token=token,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(NotificationJob.objects.filter(claim_token=token, status='processing'))
+
+
+def process_job(job: NotificationJob) -> bool:
+    """Run a claimed job. Delivered jobs are deleted; failures are retried
+    with exponential backoff until MAX_ATTEMPTS, then kept as 'failed'."""
+    try:
+        with transaction.atomic():
+            HANDLERS[job.kind](job.payload)
+            NotificationJob.objects.filter(pk=job.pk).delete()
+        return True
+    except Exception as e:
+        logger.error(f'Notification job {job.pk} ({job.kind}) failed: {e}', exc_info=True)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+        job.last_error = str(e)
+        job.claim_token = ''
+        job.save(update_fields=['status', 'attempts', 'run_after', 'last_error', 'claim_token'])
+        return False
+
+
+def run_batch(batch_size: int = 100) -> Dict[str, int]:
+    """Claim and process one batch. Returns delivered/failed counts."""
+    delivered = failed = 0
+    for job in claim_jobs(batch_size):
+        if process_job(job):
+            delivered += 1
+        else:
+            failed += 1
+    return {'delivered': delivered, 'failed': failed}
+
+
+def release_stale_jobs(stale_after: timedelta = STALE_AFTER) -> int:
+    """Return jobs stuck in 'processing' (e.g. the worker was killed) to the queue."""
+    return NotificationJob.objects.filter(
+        status='processing', locked_at__lt=timezone.now() - stale_after
+    ).update(status='pending', claim_token='')
+
+
+def _run_eager(job_id):
+    """Deliver one job in this process. It is claimed like claim_jobs() does,
+    so a worker running alongside never delivers it a second time."""
+    token = uuid.uuid4().hex
+    claimed = NotificationJob.objects.filter(pk=job_id, status='pending').update(
+        status='processing',
+        claim_token=token,
+        locked_at=timezone.now(),
+        attempts=F('attempts') + 1,
+    )
+    if claimed:
+        process_job(NotificationJob.objects.get(pk=job_id))
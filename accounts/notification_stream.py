@@ -0,0 +1,157 @@
+"""Server-Sent Events feed for the notification bell.
+One long-lived connection per tab replaces the 30 second unread-count poll.
+Streams block on notification_events and only query the database when the
+worker or another tab changes this user's notifications. Each event id
+encodes the last personal and broadcast notification ids sent
+("<personal_id>:<broadcast_id>") so EventSource can resume via Last-Event-ID.
+"""
+import json
+import threading
+import time
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection
+
+from . import notification_events
+from . import services as notification_services
+from .models import BroadcastNotification
+
+__all__ = [
+    "acquire_slot",
+    "release_slot",
+    "parse_event_id",
+    "current_cursor",
+    "event_stream",
+    "EventStream",
+]
+
+_slot_lock = threading.Lock()
+_open_streams = 0
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def acquire_slot() -> bool:
+    """Reserve one of this worker process's stream slots."""
+    global _open_streams
+    with _slot_lock:
+        if _open_streams >= _setting('NOTIFICATION_STREAM_MAX_CONNECTIONS', 24):
+            return False
+        _open_streams += 1
+        return True
+
+
+def release_slot():
+    global _open_streams
+    with _slot_lock:
+        _open_streams = max(_open_streams - 1, 0)
+
+
+def parse_event_id(value: str) -> Optional[Tuple[int, int]]:
+    """Parse a Last-Event-ID header into (personal_id, broadcast_id)."""
+    try:
+        personal_id, broadcast_id = value.split(':')
+        return int(personal_id), int(broadcast_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def current_cursor(user) -> Tuple[int, int]:
+    """Cursor pointing at the newest notifications, so a fresh stream does not replay history."""
+    personal_id = user.notifications.order_by('-id').values_list('id', flat=True).first() or 0
+    broadcast_id = notification_services.get_user_broadcasts(user).order_by('-id').values_list('id', flat=True).first() or 0
+    return personal_id, broadcast_id
+
+
+def _format_event(event: str, data, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _check(user, personal_id: int, broadcast_id: int, visible_types):
+    """New notifications past the cursor, oldest first."""
+    new_personal = list(
+        user.notifications.filter(id__gt=personal_id, type__in=visible_types).order_by('id')
+    )
+    new_broadcasts = list(
+        notification_services.get_user_broadcasts(user).filter(id__gt=broadcast_id).order_by('id')
+    )
+    return sorted(new_personal + new_broadcasts, key=lambda n: n.created_at)
+
+
+def event_stream(user, cursor: Tuple[int, int]) -> Iterator[str]:
+    """Yield SSE frames until the stream reaches its maximum lifetime.
+    The stream sleeps on a notification_events subscription and queries only
+    when an event for this user or their broadcast audience arrives, emitting
+    `notification` events for new rows and an `unread` event when the count
+    changed. Comment heartbeats keep proxies from closing an idle socket."""
+    heartbeat_interval = _setting('NOTIFICATION_STREAM_HEARTBEAT', 15)
+    max_lifetime = _setting('NOTIFICATION_STREAM_MAX_LIFETIME', 300)
+
+    personal_id, broadcast_id = cursor
+    visible_types = notification_services.get_visible_notification_types(user)
+    subscription = notification_events.subscribe(user.pk, notification_services.get_broadcast_audience(user))
+    started = time.monotonic()
+    last_count = None
+    woken = True  # catch up on anything since the cursor first
+
+    try:
+        # Ask the browser to wait a little before reconnecting after we close
+        yield f"retry: {int(_setting('NOTIFICATION_STREAM_RECONNECT_DELAY', 3) * 1000)}\n\n"
+        while True:
+            if woken:
+                for notification in _check(user, personal_id, broadcast_id, visible_types):
+                    if isinstance(notification, BroadcastNotification):
+                        broadcast_id = notification.pk
+                    else:
+                        personal_id = notification.pk
+                    yield _format_event(
+                        'notification',
+                        notification_services.serialize_notification(notification),
+                        f'{personal_id}:{broadcast_id}',
+                    )
+
+                count = notification_services.count_unread_notifications(user)
+                if count != last_count:
+                    delta = 0 if last_count is None else count - last_count
+                    yield _format_event('unread', {'count': count, 'delta': delta}, f'{personal_id}:{broadcast_id}')
+                    last_count = count
+                # Don't hold a database connection while idle
+                connection.close()
+            else:
+                yield ': heartbeat\n\n'
+
+            remaining = max_lifetime - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            woken = subscription.wait(min(heartbeat_interval, remaining))
+    finally:
+        notification_events.unsubscribe(subscription)
+        connection.close()
+
+
+class EventStream:
+    """Iterable wrapper handed to StreamingHttpResponse.
+    Django calls close() when the response ends or the client disconnects,
+    which releases the connection slot exactly once."""
+
+    def __init__(self, user, cursor: Tuple[int, int]):
+        self._events = event_stream(user, cursor)
+        self._closed = False
+
+    def __iter__(self):
+        return self._events
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._events.close()
+        release_slot()
@@ -0,0 +1,237 @@
+"""Keyset (cursor) pagination for list pages and JSON APIs.
+Pages are ordered newest first on (created_at, id) and fetched with a
+WHERE on the last row seen instead of OFFSET, so every page costs the
+same as the first and no COUNT(*) runs unless a total is requested.
+Cursors are opaque url-safe tokens; a malformed one reads as page one.
+paginate_merged() pages several querysets (e.g. the three bookmark
+types) as one stream with the same cursors.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.db import connection
+from django.db.models import Q, QuerySet
+
+__all__ = [
+    "CursorPage",
+    "get_page_size",
+    "cursor_query",
+    "paginate",
+    "paginate_merged",
+    "approximate_count",
+]
+
+DEFAULT_ORDERING = ('created_at', 'id')
+MAX_PAGE_SIZE = 100
+# Totals are counted exactly up to this many rows, then estimated
+EXACT_COUNT_LIMIT = 1000
+
+
+@dataclass
+class CursorPage:
+    object_list: List
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_exact: bool = True
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self) -> bool:
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def as_json(self) -> Dict:
+        """Pagination fields for JSON responses."""
+        data = {
+            'next_cursor': self.next_cursor,
+            'previous_cursor': self.previous_cursor,
+            'has_next': self.has_next,
+            'has_previous': self.has_previous,
+        }
+        if self.total is not None:
+            data['total'] = self.total
+            data['total_is_exact'] = self.total_is_exact
+        return data
+
+
+def get_page_size(value, default: int) -> int:
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def cursor_query(request) -> str:
+    """The request's query string without `cursor`, for page links."""
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('page', None)
+    return params.urlencode()
+
+
+# ========================================
+# Cursor encoding
+# ========================================
+
+def _encode(direction: str, key: Sequence) -> str:
+    payload = json.dumps([direction, *[_dump(v) for v in key]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _dump(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _decode(token: Optional[str], key_fields) -> Tuple[Optional[str], Optional[List]]:
+    """(direction, key values) from a cursor, or (None, None) for page one."""
+    if not token:
+        return None, None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, *raw = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if direction not in ('next', 'prev') or len(raw) != len(key_fields):
+            return None, None
+        return direction, [f.to_python(v) if f is not None else int(v) for f, v in zip(key_fields, raw)]
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None, None
+
+
+def _model_fields(queryset: QuerySet, names: Sequence[str]):
+    return [queryset.model._meta.get_field(name) for name in names]
+
+
+def _keyset(names: Sequence[str], values: Sequence, older: bool) -> Q:
+    """Rows strictly after `values` in descending (older=True) or ascending order."""
+    op = 'lt' if older else 'gt'
+    condition = Q()
+    equal = {}
+    for name, value in zip(names, values):
+        condition |= Q(**equal, **{f'{name}__{op}': value})
+        equal[name] = value
+    return condition
+
+
+# ========================================
+# Single queryset
+# ========================================
+
+def paginate(queryset: QuerySet, cursor: Optional[str], page_size: int,
+             ordering: Sequence[str] = DEFAULT_ORDERING, with_total: bool = False) -> CursorPage:
+    """One page of `queryset`, newest first on `ordering` (which must end in a
+    unique column). Fetches page_size + 1 rows to know whether more exist."""
+    direction, key = _decode(cursor, _model_fields(queryset, ordering))
+    rows = queryset
+    if key is not None:
+        rows = rows.filter(_keyset(ordering, key, older=direction == 'next'))
+    if direction == 'prev':
+        rows = list(rows.order_by(*ordering)[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        has_newer, has_older = more, True
+    else:
+        rows = list(rows.order_by(*[f'-{name}' for name in ordering])[:page_size + 1])
+        more = len(rows) > page_size
+        rows = rows[:page_size]
+        has_newer, has_older = key is not None, more
+
+    def key_of(obj):
+        return [getattr(obj, name) for name in ordering]
+
+    page = CursorPage(
+        object_list=rows,
+        next_cursor=_encode('next', key_of(rows[-1])) if rows and has_older else None,
+        previous_cursor=_encode('prev', key_of(rows[0])) if rows and has_newer else None,
+    )
+    if with_total:
+        page.total, page.total_is_exact = approximate_count(queryset)
+    return page
+
+
+# ========================================
+# Several querysets as one stream
+# ========================================
+
+def paginate_merged(querysets: Dict[str, QuerySet], cursor: Optional[str], page_size: int,
+                    ordering: Sequence[str] = DEFAULT_ORDERING) -> CursorPage:
+    """One page across several querysets sharing `ordering`, newest first.
+    The source name breaks ties between rows of different querysets, so
+    each object gets a `page_source` attribute naming its queryset."""
+    if not querysets:
+        return CursorPage(object_list=[])
+    names = list(querysets)
+    first = next(iter(querysets.values()))
+    first_field, *rest_fields = _model_fields(first, ordering)
+    direction, key = _decode(cursor, [first_field, None, *rest_fields])
+    older = direction != 'prev'
+
+    candidates = []
+    for rank, (name, queryset) in enumerate(querysets.items()):
+        rows = queryset
+        if key is not None:
+            lead, cursor_rank, *tail = key
+            if rank == cursor_rank:
+                rows = rows.filter(_keyset(ordering, [lead, *tail], older))
+            elif (rank < cursor_rank) == older:
+                # Source rank breaks ties on `lead`, so this source's rows at `lead` are on this side
+                rows = rows.filter(**{f'{ordering[0]}__{"lte" if older else "gte"}': lead})
+            else:
+                rows = rows.filter(**{f'{ordering[0]}__{"lt" if older else "gt"}': lead})
+        order = [f'-{n}' for n in ordering] if older else list(ordering)
+        for obj in rows.order_by(*order)[:page_size + 1]:
+            obj.page_source = name
+            candidates.append(obj)
+
+    def sort_key(obj):
+        return [getattr(obj, ordering[0]), names.index(obj.page_source), *[getattr(obj, n) for n in ordering[1:]]]
+
+    candidates.sort(key=sort_key, reverse=older)
+    more = len(candidates) > page_size
+    rows = candidates[:page_size]
+    if not older:
+        rows.reverse()
+    has_newer, has_older = (key is not None, more) if older else (more, True)
+
+    return CursorPage(
+        object_list=rows,
+        next_cursor=_encode('next', sort_key(rows[-1])) if rows and has_older else None,
+        previous_cursor=_encode('prev', sort_key(rows[0])) if rows and has_newer else None,
+    )
+
+
+# ========================================
+# Totals
+# ========================================
+
+def approximate_count(queryset: QuerySet, limit: int = EXACT_COUNT_LIMIT) -> Tuple[int, bool]:
+    """(count, is_exact). Counts at most `limit` + 1 rows; beyond that Postgres
+    returns the planner's estimate and other databases return `limit`."""
+    counted = queryset.order_by()[:limit + 1].count()
+    if counted <= limit:
+        return counted, True
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]['Plan']['Plan Rows']), limit), False
+    return limit, False
@@ -0,0 +1,162 @@
+"""Engagement scores used to rank global search results.
+Ratings, likes, view/download/attempt counters and verification are folded
+into one EngagementScore row per SearchDocument, so ranking reads a single
+joined float instead of aggregating Rating/QuizRating/DeckRating per query.
+Signals call mark_stale(); refresh_stale() recomputes dirty rows in batches.
+"""
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+
+from .models import EngagementScore, SearchDocument
+
+__all__ = [
+    "ENGAGEMENT_FIELDS",
+    "compute_score",
+    "should_refresh",
+    "mark_stale",
+    "mark_stale_many",
+    "refresh_documents",
+    "refresh_stale",
+]
+
+# Per kind: content model and its view and download counters (ratings and
+# likes come from the counter columns maintained by accounts.counters)
+ENGAGEMENT_SOURCES = {
+    'resource': {'model': 'resources.Resource', 'views': 'views_count', 'downloads': 'download_count'},
+    'quiz': {'model': 'quizzes.Quiz', 'views': 'attempts_count', 'downloads': None},
+    'deck': {'model': 'flashcards.Deck', 'views': None, 'downloads': None},
+}
+
+# Content fields whose changes affect the score
+ENGAGEMENT_FIELDS = {'views_count', 'download_count', 'attempts_count', 'verification_status'}
+
+# Bayesian prior: unrated items behave like PRIOR_WEIGHT votes of PRIOR_RATING stars
+PRIOR_RATING = 3.0
+PRIOR_WEIGHT = 5
+# Weighted activity at which popularity saturates
+POPULARITY_SATURATION = 1000
+RATING_WEIGHT = 0.45
+POPULARITY_WEIGHT = 0.4
+VERIFIED_WEIGHT = 0.15
+
+EMPTY_FEATURES = {
+    'rating_avg': 0.0, 'rating_count': 0, 'views': 0, 'downloads': 0, 'likes': 0, 'is_verified': False,
+}
+
+
+def compute_score(rating_avg: float, rating_count: int, views: int, downloads: int,
+                  likes: int, is_verified: bool) -> float:
+    """Engagement score between 0 and 1."""
+    rating = (PRIOR_RATING * PRIOR_WEIGHT + rating_avg * rating_count) / (PRIOR_WEIGHT + rating_count)
+    rating_component = (rating - 1) / 4
+    activity = views + 3 * downloads + 5 * likes
+    popularity = min(math.log1p(activity) / math.log1p(POPULARITY_SATURATION), 1.0)
+    return (
+        RATING_WEIGHT * rating_component
+        + POPULARITY_WEIGHT * popularity
+        + VERIFIED_WEIGHT * (1.0 if is_verified else 0.0)
+    )
+
+
+def should_refresh(update_fields) -> bool:
+    return update_fields is None or bool(ENGAGEMENT_FIELDS & set(update_fields))
+
+
+def mark_stale(kind: str, object_id: int):
+    """Flag an item's score for recomputation (creating the row if needed)."""
+    if EngagementScore.objects.filter(document__kind=kind, document__object_id=object_id).update(is_stale=True):
+        return
+    document_id = (
+        SearchDocument.objects.filter(kind=kind, object_id=object_id).values_list('id', flat=True).first()
+    )
+    if document_id is None:
+        return
+    try:
+        with transaction.atomic():
+            EngagementScore.objects.create(document_id=document_id, is_stale=True)
+    except IntegrityError:
+        # Created concurrently; that row is stale already
+        pass
+
+
+def mark_stale_many(kind: str, object_ids: Iterable[int]) -> int:
+    """mark_stale() for many items in one UPDATE. Items without a score row
+    are left to refresh_stale(), which scores unscored documents anyway."""
+    return EngagementScore.objects.filter(
+        document__kind=kind, document__object_id__in=list(object_ids)
+    ).update(is_stale=True)
+
+
+def _features(kind: str, object_ids: Iterable[int]) -> Dict[int, Dict]:
+    """Raw engagement features for objects of one kind, in one query."""
+    source = ENGAGEMENT_SOURCES[kind]
+    model = apps.get_model(source['model'])
+
+    counter_fields = [f for f in (source['views'], source['downloads']) if f]
+    objects = model.objects.filter(pk__in=list(object_ids)).values(
+        'pk', 'verification_status', 'rating_sum', 'rating_count', 'likes_count', *counter_fields
+    )
+    return {
+        row['pk']: {
+            'rating_avg': row['rating_sum'] / row['rating_count'] if row['rating_count'] else 0.0,
+            'rating_count': row['rating_count'],
+            'views': row[source['views']] if source['views'] else 0,
+            'downloads': row[source['downloads']] if source['downloads'] else 0,
+            'likes': row['likes_count'],
+            'is_verified': row['verification_status'] == 'verified',
+        }
+        for row in objects
+    }
+
+
+def refresh_documents(documents) -> int:
+    """Recompute scores for the given SearchDocuments. Returns rows written."""
+    by_kind = defaultdict(dict)
+    for document in documents:
+        by_kind[document.kind][document.object_id] = document.pk
+
+    scores = []
+    for kind, document_ids in by_kind.items():
+        features = _features(kind, document_ids.keys())
+        for object_id, document_id in document_ids.items():
+            # Objects deleted since indexing keep an empty score until their document goes
+            values = features.get(object_id, dict(EMPTY_FEATURES))
+            scores.append(EngagementScore(
+                document_id=document_id,
+                score=compute_score(**values),
+                is_stale=False,
+                **values,
+            ))
+    EngagementScore.objects.bulk_create(
+        scores,
+        update_conflicts=True,
+        unique_fields=['document'],
+        update_fields=['rating_avg', 'rating_count', 'views', 'downloads', 'likes',
+                       'is_verified', 'score', 'is_stale', 'updated_at'],
+    )
+    return len(scores)
+
+
+def refresh_stale(batch_size: int = 500, refresh_all: bool = False, max_batches: Optional[int] = None) -> int:
+    """Recompute stale scores (and score documents that have none) in batches."""
+    if refresh_all:
+        EngagementScore.objects.update(is_stale=True)
+    refreshed = batches = 0
+    while max_batches is None or batches < max_batches:
+        documents = list(
+            SearchDocument.objects.filter(engagement__isnull=True).only('id', 'kind', 'object_id')[:batch_size]
+        )
+        if len(documents) < batch_size:
+            documents += list(
+                SearchDocument.objects.filter(engagement__is_stale=True)
+                .only('id', 'kind', 'object_id')[:batch_size - len(documents)]
+            )
+        if not documents:
+            break
+        refreshed += refresh_documents(documents)
+        batches += 1
+    return refreshed
@@ -0,0 +1,319 @@
+"""Full-text index behind global search.
+Every Resource, Quiz and Deck is mirrored into one SearchDocument row by the
+signals in each app. Postgres ranks a weighted tsvector on that row (GIN
+indexed); SQLite ranks the `search_fts` FTS5 table, which triggers keep in
+sync with accounts_searchdocument. search() answers results, cross-type
+ranking and per-type totals with a single query.
+Results can be ordered by text relevance alone, by recency, or (default) by
+relevance blended with the precomputed EngagementScore (accounts.ranking).
+typeahead() serves the search dropdown from prefix/trigram indexes over
+titles, usernames and tag names, behind a short-lived normalized-query cache.
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, QuerySet, Value, When, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, RowNumber
+from django.urls import reverse
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+from .models import SearchDocument
+
+__all__ = [
+    "SEARCH_KINDS",
+    "search_terms",
+    "should_reindex",
+    "document_values",
+    "index_object",
+    "remove_object",
+    "update_search_vectors",
+    "search_documents",
+    "search",
+    "RANKING_MODES",
+    "normalize_query",
+    "typeahead",
+]
+
+SEARCH_CONFIG = 'english'
+MAX_TERMS = 8
+
+# Model label -> (SearchDocument kind, owner foreign key)
+SEARCH_KINDS = {
+    'resources.Resource': ('resource', 'uploader'),
+    'quizzes.Quiz': ('quiz', 'creator'),
+    'flashcards.Deck': ('deck', 'owner'),
+}
+
+# Fields copied into the search document; other saves leave it untouched
+INDEXED_FIELDS = {'title', 'description', 'resource_type', 'is_public', 'visibility', 'verification_status'}
+
+RANKING_MODES = ['blended', 'relevance', 'recent']
+
+# bm25 column weights for (title, description, author, content)
+FTS_WEIGHTS = '10.0, 4.0, 2.0, 1.0'
+
+_fts5_available = None
+
+
+def _uses_postgres() -> bool:
+    return connection.vendor == 'postgresql'
+
+
+def _uses_fts5() -> bool:
+    """True when the SQLite FTS5 table exists (created by accounts migration 0014)."""
+    global _fts5_available
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts5_available is None:
+        _fts5_available = 'search_fts' in connection.introspection.table_names()
+    return _fts5_available
+
+
+def search_terms(query: str) -> List[str]:
+    """Split a user query into index-safe words."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def should_reindex(update_fields) -> bool:
+    """Saves limited to counters leave the search document untouched."""
+    return update_fields is None or bool(INDEXED_FIELDS & set(update_fields))
+
+
+def _extracted_text(instance) -> str:
+    """Text pulled from a resource's file by resources.extraction, if any."""
+    try:
+        return instance.extracted_text.text
+    except ObjectDoesNotExist:
+        return ''
+
+
+def document_values(instance) -> Dict:
+    """SearchDocument field values for a Resource, Quiz or Deck."""
+    kind, owner_field = SEARCH_KINDS[instance._meta.label]
+    if kind == 'deck':
+        is_public = instance.visibility == 'public'
+    else:
+        is_public = instance.is_public
+    return {
+        'owner_id': getattr(instance, f'{owner_field}_id'),
+        'title': instance.title,
+        'description': instance.description or '',
+        'author': getattr(instance, owner_field).username,
+        'content': _extracted_text(instance) if kind == 'resource' else '',
+        'resource_type': getattr(instance, 'resource_type', ''),
+        'is_public': is_public,
+        'verification_status': instance.verification_status or '',
+        'created_at': instance.created_at,
+    }
+
+
+def _vector():
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('author', weight='C', config=SEARCH_CONFIG)
+        + SearchVector('content', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(documents: QuerySet) -> int:
+    """Recompute Postgres tsvectors for documents (no-op elsewhere)."""
+    if not _uses_postgres():
+        return 0
+    return documents.update(search_vector=_vector())
+
+
+def index_object(instance):
+    """Create or refresh the search document for one Resource, Quiz or Deck."""
+    kind, _ = SEARCH_KINDS[instance._meta.label]
+    with transaction.atomic():
+        document, _ = SearchDocument.objects.update_or_create(
+            kind=kind, object_id=instance.pk, defaults=document_values(instance),
+        )
+        update_search_vectors(SearchDocument.objects.filter(pk=document.pk))
+
+
+def remove_object(instance):
+    """Drop a deleted object's search document."""
+    kind, _ = SEARCH_KINDS[instance._meta.label]
+    SearchDocument.objects.filter(kind=kind, object_id=instance.pk).delete()
+
+
+def search_documents(query: str, kinds=None) -> Optional[QuerySet]:
+    """Public documents matching query, annotated with search_rank (higher is
+    better). Every word must match; the last one also matches as a prefix so
+    results update while the user is typing. Returns None when query has no words."""
+    terms = search_terms(query)
+    if not terms:
+        return None
+    documents = SearchDocument.objects.filter(is_public=True)
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+
+    if _uses_postgres():
+        raw = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        search_query = SearchQuery(raw, search_type='raw', config=SEARCH_CONFIG)
+        return documents.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        )
+
+    if _uses_fts5():
+        match = ' '.join([f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*'])
+        # bm25() is only allowed directly inside a MATCH query, so the rank is
+        # a per-hit rowid lookup rather than a column of the outer query
+        return documents.filter(
+            id__in=RawSQL('SELECT rowid FROM search_fts WHERE search_fts MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25(search_fts, {FTS_WEIGHTS}) FROM search_fts '
+            f'WHERE search_fts MATCH %s AND rowid = accounts_searchdocument.id',
+            [match],
+        ))
+
+    # No full-text support on this database: substring match
+    return documents.filter(
+        Q(title__icontains=query) | Q(description__icontains=query) | Q(author__icontains=query)
+    ).annotate(search_rank=RawSQL('0', []))
+
+
+def _ordering(ranking: str):
+    if ranking == 'recent':
+        return [F('created_at').desc()]
+    if ranking == 'relevance':
+        return [F('search_rank').desc(), F('created_at').desc()]
+    # Engagement scales relevance, so a weak text match never outranks a strong one by popularity alone
+    weight = getattr(settings, 'SEARCH_ENGAGEMENT_WEIGHT', 1.0)
+    blended = F('search_rank') * (
+        Value(1.0) + Value(weight) * Coalesce(F('engagement__score'), Value(0.0), output_field=FloatField())
+    )
+    return [blended.desc(), F('created_at').desc()]
+
+
+def _top_per_kind(documents: Optional[QuerySet], limit: int, ranking: str = 'relevance'):
+    all_kinds = [kind for kind, _ in SearchDocument.KIND_CHOICES]
+    results = {kind: [] for kind in all_kinds}
+    totals = dict.fromkeys(all_kinds, 0)
+    if documents is None:
+        return results, totals
+
+    ranked = (
+        documents.select_related('owner')
+        .defer('search_vector', 'content')
+        .annotate(
+            kind_position=Window(
+                RowNumber(),
+                partition_by=[F('kind')],
+                order_by=_ordering(ranking),
+            ),
+            kind_total=Window(Count('id'), partition_by=[F('kind')]),
+        )
+        .filter(kind_position__lte=limit)
+        .order_by('kind', 'kind_position')
+    )
+    for document in ranked:
+        results[document.kind].append(document)
+        totals[document.kind] = document.kind_total
+    return results, totals
+
+
+def search(query: str, limit: int, kinds=None,
+           ranking: Optional[str] = None) -> Tuple[Dict[str, List[SearchDocument]], Dict[str, int]]:
+    """Top `limit` documents per kind plus the true number of matches per kind,
+    fetched in one query with window functions. Returns ({kind: [documents]},
+    {kind: total}); every kind in SearchDocument.KIND_CHOICES is present.
+    ranking is one of RANKING_MODES (default: settings.SEARCH_RANKING)."""
+    if ranking not in RANKING_MODES:
+        ranking = getattr(settings, 'SEARCH_RANKING', 'blended')
+    return _top_per_kind(search_documents(query, kinds), limit, ranking)
+
+
+# ========================================
+# Typeahead
+# ========================================
+
+def normalize_query(query: str) -> str:
+    """Lowercased words joined by single spaces; the typeahead cache key."""
+    return ' '.join(search_terms(query))
+
+
+def _typeahead_documents(query: str) -> QuerySet:
+    """Public documents whose title contains query or whose author starts with it.
+    Uses the trigram indexes from accounts migration 0015 on Postgres and the
+    FTS5 prefix index (title and author columns only) on SQLite."""
+    documents = SearchDocument.objects.filter(is_public=True)
+
+    if _uses_fts5():
+        terms = query.split()
+        match = '{title author} : ' + ' '.join([f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*'])
+        return documents.filter(
+            id__in=RawSQL('SELECT rowid FROM search_fts WHERE search_fts MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25(search_fts, {FTS_WEIGHTS}) FROM search_fts '
+            f'WHERE search_fts MATCH %s AND rowid = accounts_searchdocument.id',
+            [match],
+        ))
+
+    # Titles starting with the query rank above titles merely containing it
+    return documents.filter(
+        Q(title__icontains=query) | Q(author__istartswith=query)
+    ).annotate(search_rank=Case(
+        When(title__istartswith=query, then=Value(2)),
+        When(title__icontains=query, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField(),
+    ))
+
+
+def _typeahead_cache_key(normalized: str) -> str:
+    return 'search:typeahead:' + hashlib.md5(normalized.encode()).hexdigest()
+
+
+def typeahead(query: str, limit: int = 5) -> Dict[str, List[Dict]]:
+    """Dropdown suggestions for a partially typed query, grouped by kind plus
+    matching tag names. Queries shorter than TYPEAHEAD_MIN_LENGTH return
+    nothing; results are public-only, so one cache entry serves every user."""
+    normalized = normalize_query(query)
+    empty = {'resources': [], 'quizzes': [], 'flashcards': [], 'tags': []}
+    if len(normalized) < getattr(settings, 'TYPEAHEAD_MIN_LENGTH', 3):
+        return empty
+
+    key = _typeahead_cache_key(normalized)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    results, _ = _top_per_kind(
+        _typeahead_documents(normalized), limit, getattr(settings, 'SEARCH_RANKING', 'blended')
+    )
+
+    def serialize(document):
+        return {
+            'id': document.object_id,
+            'title': document.title,
+            'description': document.description,
+            'url': document.get_absolute_url(),
+            'is_verified': document.verification_status == 'verified',
+            'author': document.author,
+        }
+
+    Tag = apps.get_model('resources', 'Tag')
+    tags = Tag.objects.filter(name__istartswith=normalized).order_by('name').values_list('name', flat=True)[:limit]
+
+    data = {
+        'resources': [dict(serialize(d), resource_type=d.resource_type) for d in results['resource']],
+        'quizzes': [serialize(d) for d in results['quiz']],
+        'flashcards': [serialize(d) for d in results['deck']],
+        'tags': [
+            {'name': name, 'url': f"{reverse('resources:resource_list')}?{urlencode({'tag': name})}"}
+            for name in tags
+        ],
+    }
+    cache.set(key, data, getattr(settings, 'TYPEAHEAD_CACHE_TIMEOUT', 30))
+    return data
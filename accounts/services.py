@@ -0,0 +1,298 @@
+"""Notification service helpers.
+Merge personal Notification rows with audience-wide BroadcastNotification rows
+so views never need to know which storage a notification came from.
+"""
+import heapq
+from itertools import islice
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, F, OuterRef, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import notification_events
+from .models import (
+    BroadcastNotification,
+    BroadcastReceipt,
+    NotificationCounter,
+    NotificationReadState,
+)
+
+__all__ = [
+    "get_visible_notification_types",
+    "get_broadcast_audience",
+    "get_user_broadcasts",
+    "get_user_notifications",
+    "count_unread_notifications",
+    "record_new_notifications",
+    "record_removed_notifications",
+    "serialize_notification",
+    "mark_notification_read",
+    "mark_all_notifications_read",
+    "broadcast_notification",
+]
+
+# Role-visible notification types
+PERSONAL_TYPES = ['verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
+STUDENT_TYPES = ['new_upload'] + PERSONAL_TYPES
+PROFESSOR_TYPES = ['content_review', 'student_question', 'new_enrollment'] + PERSONAL_TYPES
+ADMIN_TYPES = ['new_user_registration', 'reported_content', 'system_alert', 'password_reset_request'] + PERSONAL_TYPES
+
+# NotificationCounter field holding the unread count for each type group
+TYPE_COUNTER_FIELDS = {t: 'personal_unread' for t in PERSONAL_TYPES}
+TYPE_COUNTER_FIELDS.update({t: 'student_unread' for t in STUDENT_TYPES if t not in PERSONAL_TYPES})
+TYPE_COUNTER_FIELDS.update({t: 'professor_unread' for t in PROFESSOR_TYPES if t not in PERSONAL_TYPES})
+TYPE_COUNTER_FIELDS.update({t: 'admin_unread' for t in ADMIN_TYPES if t not in PERSONAL_TYPES})
+COUNTER_FIELDS = ['personal_unread', 'student_unread', 'professor_unread', 'admin_unread']
+
+# Latest broadcast id per audience is cached briefly; counters catch up incrementally
+LATEST_BROADCAST_CACHE_TIMEOUT = 10
+
+
+def get_visible_notification_types(user) -> List[str]:
+    """Return the notification types shown to this user's role."""
+    if user.is_staff:
+        return ADMIN_TYPES
+    if user.is_professor:
+        return PROFESSOR_TYPES
+    return STUDENT_TYPES
+
+
+def get_role_counter_field(user) -> str:
+    """NotificationCounter field for the role-specific (non-personal) type group."""
+    if user.is_staff:
+        return 'admin_unread'
+    if user.is_professor:
+        return 'professor_unread'
+    return 'student_unread'
+
+
+def get_broadcast_audience(user) -> str:
+    return 'professors' if user.is_professor else 'students'
+
+
+def _get_read_watermark(user):
+    state = NotificationReadState.objects.filter(user=user).first()
+    return state.broadcasts_read_until if state else None
+
+
+def get_user_broadcasts(user, watermark=None):
+    """Broadcasts addressed to this user, annotated with a per-user is_read flag.
+    Only broadcasts sent after the user joined are included, mirroring the old
+    fan-out behaviour where late joiners never received earlier rows."""
+    broadcasts = (
+        BroadcastNotification.objects.filter(
+            audience=get_broadcast_audience(user),
+            type__in=get_visible_notification_types(user),
+            created_at__gte=user.date_joined,
+        )
+        .exclude(sender_id=user.pk)
+    )
+    receipts = BroadcastReceipt.objects.filter(user=user, broadcast=OuterRef('pk'))
+    if watermark is not None:
+        return broadcasts.annotate(
+            is_read=ExpressionWrapper(
+                Exists(receipts) | Q(created_at__lte=watermark),
+                output_field=BooleanField(),
+            )
+        )
+    return broadcasts.annotate(is_read=Exists(receipts))
+
+
+def get_user_notifications(user, limit: Optional[int] = None) -> List:
+    """Return personal and broadcast notifications merged newest-first."""
+    personal = user.notifications.filter(type__in=get_visible_notification_types(user))
+    broadcasts = get_user_broadcasts(user, _get_read_watermark(user))
+    if limit is not None:
+        personal = personal[:limit]
+        broadcasts = broadcasts[:limit]
+    merged = heapq.merge(personal, broadcasts, key=lambda n: n.created_at, reverse=True)
+    return list(islice(merged, limit))
+
+
+def _latest_broadcast_cache_key(audience) -> str:
+    return f'notifications:latest_broadcast:{audience}'
+
+
+def _latest_broadcast_id(audience, fresh=False) -> int:
+    key = _latest_broadcast_cache_key(audience)
+    latest = None if fresh else cache.get(key)
+    if latest is None:
+        latest = (
+            BroadcastNotification.objects.filter(audience=audience)
+            .order_by('-id')
+            .values_list('id', flat=True)
+            .first()
+        ) or 0
+        cache.set(key, latest, LATEST_BROADCAST_CACHE_TIMEOUT)
+    return latest
+
+
+def _count_unread_broadcasts(user, after_id: int = 0, up_to: Optional[int] = None) -> int:
+    broadcasts = get_user_broadcasts(user).filter(id__gt=after_id).exclude(receipts__user=user)
+    if up_to is not None:
+        broadcasts = broadcasts.filter(id__lte=up_to)
+    watermark = _get_read_watermark(user)
+    if watermark is not None:
+        broadcasts = broadcasts.filter(created_at__gt=watermark)
+    return broadcasts.count()
+
+
+def _rebuild_counter(user) -> NotificationCounter:
+    """Recompute a user's counters from the notification tables."""
+    fields = dict.fromkeys(COUNTER_FIELDS, 0)
+    unread = (
+        user.notifications.filter(is_read=False)
+        .values('type')
+        .annotate(total=Count('id'))
+    )
+    for row in unread:
+        field = TYPE_COUNTER_FIELDS.get(row['type'])
+        if field:
+            fields[field] += row['total']
+
+    audience = get_broadcast_audience(user)
+    latest = _latest_broadcast_id(audience, fresh=True)
+    fields.update(
+        broadcast_audience=audience,
+        broadcast_seq=latest,
+        broadcast_unread=_count_unread_broadcasts(user, up_to=latest),
+    )
+    counter, _ = NotificationCounter.objects.update_or_create(user=user, defaults=fields)
+    return counter
+
+
+def _adjust_counter(user_ids, field: str, delta: int):
+    counters = NotificationCounter.objects.filter(user_id__in=user_ids)
+    if delta < 0:
+        counters = counters.filter(**{f'{field}__gte': -delta})
+    counters.update(**{field: F(field) + delta})
+
+
+def count_unread_notifications(user) -> int:
+    """Unread personal + broadcast notifications, read from the user's
+    NotificationCounter row. Broadcasts newer than the counter's sequence are
+    counted incrementally; a missing or stale-audience row is rebuilt."""
+    audience = get_broadcast_audience(user)
+    counter = NotificationCounter.objects.filter(user=user).first()
+    if counter is None or counter.broadcast_audience != audience:
+        counter = _rebuild_counter(user)
+
+    latest = _latest_broadcast_id(audience)
+    if latest > counter.broadcast_seq:
+        new_unread = _count_unread_broadcasts(user, after_id=counter.broadcast_seq, up_to=latest)
+        # Conditional on the old sequence so concurrent polls never double count
+        NotificationCounter.objects.filter(pk=counter.pk, broadcast_seq=counter.broadcast_seq).update(
+            broadcast_unread=F('broadcast_unread') + new_unread,
+            broadcast_seq=latest,
+        )
+        counter.broadcast_unread += new_unread
+        counter.broadcast_seq = latest
+
+    return (
+        counter.personal_unread
+        + getattr(counter, get_role_counter_field(user))
+        + counter.broadcast_unread
+    )
+
+
+def record_new_notifications(user_ids, type):
+    """Bump unread counters after personal notifications were created.
+    Users without a counter row are skipped; theirs is built on first read."""
+    field = TYPE_COUNTER_FIELDS.get(type)
+    if field and user_ids:
+        _adjust_counter(user_ids, field, 1)
+    notification_events.publish_users(user_ids)
+
+
+def record_removed_notifications(user_id, type, count: int):
+    """Decrement unread counters after unread personal notifications were deleted."""
+    field = TYPE_COUNTER_FIELDS.get(type)
+    if field and count:
+        NotificationCounter.objects.filter(user_id=user_id).update(
+            **{field: Greatest(F(field) - count, 0)}
+        )
+        notification_events.publish_users([user_id])
+
+
+def serialize_notification(notification) -> Dict:
+    """JSON-friendly representation used by the notification APIs."""
+    is_broadcast = isinstance(notification, BroadcastNotification)
+    return {
+        'id': notification.public_id if is_broadcast else notification.pk,
+        'type': notification.type,
+        'message': notification.message,
+        'url': notification.url or '',
+        'is_read': bool(notification.is_read),
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def mark_notification_read(user, notification_id) -> bool:
+    """Mark a personal or broadcast notification as read and decrement the
+    matching unread counter. Returns False when the notification does not
+    exist for this user."""
+    notification_id = str(notification_id)
+    if notification_id.startswith(BroadcastNotification.ID_PREFIX):
+        broadcast_id = notification_id[len(BroadcastNotification.ID_PREFIX):]
+        if not broadcast_id.isdigit():
+            return False
+        broadcast = get_user_broadcasts(user, _get_read_watermark(user)).filter(pk=broadcast_id).first()
+        if not broadcast:
+            return False
+        if not broadcast.is_read:
+            _, created = BroadcastReceipt.objects.get_or_create(user=user, broadcast=broadcast)
+            # Broadcasts past the counter's sequence are not counted yet
+            if created:
+                NotificationCounter.objects.filter(
+                    user=user, broadcast_seq__gte=broadcast.pk, broadcast_unread__gt=0
+                ).update(broadcast_unread=F('broadcast_unread') - 1)
+                notification_events.publish_users([user.pk])
+        return True
+
+    if not notification_id.isdigit():
+        return False
+    notification = user.notifications.filter(pk=notification_id).first()
+    if not notification:
+        return False
+    if user.notifications.filter(pk=notification.pk, is_read=False).update(is_read=True):
+        field = TYPE_COUNTER_FIELDS.get(notification.type)
+        if field:
+            _adjust_counter([user.pk], field, -1)
+        notification_events.publish_users([user.pk])
+    return True
+
+
+def mark_all_notifications_read(user):
+    """Mark every notification as read: one UPDATE for personal rows and a
+    watermark bump for broadcasts (individual receipts become redundant)."""
+    # Read the sequence before moving the watermark so nothing slips between them
+    audience = get_broadcast_audience(user)
+    latest = _latest_broadcast_id(audience, fresh=True)
+    user.notifications.filter(is_read=False).update(is_read=True)
+    NotificationReadState.objects.update_or_create(
+        user=user, defaults={'broadcasts_read_until': timezone.now()}
+    )
+    BroadcastReceipt.objects.filter(user=user).delete()
+    fields = dict.fromkeys(COUNTER_FIELDS, 0)
+    fields.update(broadcast_audience=audience, broadcast_unread=0, broadcast_seq=latest)
+    NotificationCounter.objects.update_or_create(user=user, defaults=fields)
+    notification_events.publish_users([user.pk])
+
+
+def broadcast_notification(audience, type, message, url=None, sender=None,
+                           related_object_type=None, related_object_id=None):
+    """Create a single notification row delivered to a whole audience."""
+    broadcast = BroadcastNotification.objects.create(
+        audience=audience,
+        type=type,
+        message=message,
+        url=url,
+        sender=sender,
+        related_object_type=related_object_type,
+        related_object_id=related_object_id,
+    )
+    cache.set(_latest_broadcast_cache_key(audience), broadcast.pk, LATEST_BROADCAST_CACHE_TIMEOUT)
+    notification_events.publish_audience(audience)
+    return broadcast
@@ -7,7 +7,7 @@ from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
-from .models import Notification
+from .notification_queue import enqueue_admin_notification
 
 User = get_user_model()
 
@@ -20,9 +20,6 @@ def notify_admins_new_user_registration(sender, instance, created, **kwargs):
     """
     if created:
         try:
-            # Get all admin users (superusers and staff)
-            admins = User.objects.filter(is_superuser=True) | User.objects.filter(is_staff=True)
-            
             # Determine role display
             if instance.is_superuser or instance.is_staff:
                 role = 'Admin'
@@ -31,20 +28,14 @@ def notify_admins_new_user_registration(sender, instance, created, **kwargs):
             else:
                 role = 'Student'
             
-            # Create notifications for all admins
-            notifications = [
-                Notification(
-                    user=admin,
-                    type='new_user_registration',
-                    message=f"New user registered: {instance.get_display_name()} (Role: {role})",
-                    url=reverse('accounts:manage_users') if admin != instance else reverse('accounts:profile'),
-                    related_object_type='user',
-                    related_object_id=instance.id
-                )
-                for admin in admins.distinct() if admin.id != instance.id
-            ]
-            
-            if notifications:
-                Notification.objects.bulk_create(notifications)
+            # Queue one job; the worker fans it out to all admins (superusers and staff)
+            enqueue_admin_notification(
+                type='new_user_registration',
+                message=f"New user registered: {instance.get_display_name()} (Role: {role})",
+                url=reverse('accounts:manage_users'),
+                related_object_type='user',
+                related_object_id=instance.id,
+                exclude_user=instance,
+            )
         except Exception as e:
             print(f"Failed to create user registration notifications: {e}")
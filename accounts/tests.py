@@ -0,0 +1,640 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from flashcards.models import Deck
+from quizzes.models import Quiz, QuizBookmark, QuizRating
+from resources.models import Like, Rating, Resource, Tag
+
+from . import (
+    counter_buffer,
+    counters,
+    notification_queue,
+    notification_stream,
+    pagination,
+    ranking,
+    search,
+    services,
+    viewer_state,
+)
+from .models import (
+    BroadcastNotification,
+    BroadcastReceipt,
+    EngagementScore,
+    Notification,
+    NotificationJob,
+    SearchDocument,
+)
+
+User = get_user_model()
+
+
+class NotificationServiceTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.professor = User.objects.create_user(username='prof', password='x', is_professor=True)
+        self.student = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+
+    def broadcast(self, message='New upload: Week 1', audience='students', type='new_upload'):
+        return services.broadcast_notification(audience, type, message, sender=self.professor)
+
+    def test_broadcast_is_stored_once_and_merged_newest_first(self):
+        self.broadcast('New upload: Week 1')
+        Notification.objects.create(user=self.student, type='new_comment', message='New comment')
+        second = self.broadcast('New upload: Week 2')
+        late = User.objects.create_user(username='late', password='x')
+
+        self.assertEqual(BroadcastNotification.objects.count(), 2)
+        self.assertEqual(
+            [n.message for n in services.get_user_notifications(self.student)],
+            ['New upload: Week 2', 'New comment', 'New upload: Week 1'],
+        )
+        latest = services.get_user_notifications(self.student, limit=1)
+        self.assertEqual(services.serialize_notification(latest[0])['id'], second.public_id)
+        # Not for the sender, another audience or users who joined afterwards
+        self.assertEqual(services.get_user_notifications(self.professor), [])
+        self.assertEqual(services.get_user_notifications(late), [])
+
+    def test_broadcasts_are_read_per_user(self):
+        other = User.objects.create_user(username='other', password='x')
+        broadcast = self.broadcast()
+        self.assertTrue(services.mark_notification_read(self.student, broadcast.public_id))
+        self.assertTrue(services.get_user_notifications(self.student)[0].is_read)
+        self.assertFalse(services.get_user_notifications(other)[0].is_read)
+        self.assertFalse(services.mark_notification_read(self.professor, broadcast.public_id))
+        self.assertFalse(services.mark_notification_read(self.student, 'bnope'))
+
+    def test_mark_all_read_moves_the_watermark(self):
+        first = self.broadcast('New upload: Week 1')
+        self.broadcast('New upload: Week 2')
+        services.mark_notification_read(self.student, first.public_id)
+        Notification.objects.create(user=self.student, type='new_comment', message='New comment')
+
+        services.mark_all_notifications_read(self.student)
+        self.assertTrue(all(n.is_read for n in services.get_user_notifications(self.student)))
+        self.assertFalse(BroadcastReceipt.objects.filter(user=self.student).exists())
+
+        self.broadcast('New upload: Week 3')
+        unread = [n.message for n in services.get_user_notifications(self.student) if not n.is_read]
+        self.assertEqual(unread, ['New upload: Week 3'])
+
+    def test_unread_count_is_maintained(self):
+        self.assertEqual(services.count_unread_notifications(self.student), 0)
+        broadcast = self.broadcast()
+        comment = Notification.objects.create(user=self.student, type='new_comment', message='New comment')
+        services.record_new_notifications([self.student.pk], 'new_comment')
+        self.assertEqual(services.count_unread_notifications(self.student), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(services.count_unread_notifications(self.student), 2)
+
+        services.mark_notification_read(self.student, broadcast.public_id)
+        services.mark_notification_read(self.student, comment.pk)
+        self.assertEqual(services.count_unread_notifications(self.student), 0)
+
+        self.broadcast('New upload: Week 2')
+        services.mark_all_notifications_read(self.student)
+        self.assertEqual(services.count_unread_notifications(self.student), 0)
+
+    def test_broadcasts_read_before_they_are_counted_are_not_subtracted(self):
+        self.assertEqual(services.count_unread_notifications(self.student), 0)
+        first, second = self.broadcast('New upload: Week 1'), self.broadcast('New upload: Week 2')
+        services.mark_notification_read(self.student, first.public_id)
+        self.assertEqual(services.count_unread_notifications(self.student), 1)
+        services.mark_notification_read(self.student, second.public_id)
+        self.assertEqual(services.count_unread_notifications(self.student), 0)
+
+    def test_counter_is_rebuilt_when_the_role_changes(self):
+        self.broadcast('Resource awaits review', audience='professors', type='content_review')
+        self.assertEqual(services.count_unread_notifications(self.student), 0)
+        User.objects.filter(pk=self.student.pk).update(is_professor=True)
+        self.student.refresh_from_db()
+        self.assertEqual(services.count_unread_notifications(self.student), 1)
+
+
+@override_settings(NOTIFICATION_STREAM_HEARTBEAT=0.01)
+class NotificationStreamTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Streams close their connection while idle, which would end the test transaction
+        patcher = mock.patch.object(notification_stream, 'connection')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.professor = User.objects.create_user(username='prof', password='x', is_professor=True)
+        self.student = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        services.broadcast_notification('students', 'new_upload', 'New upload: Week 1', sender=self.professor)
+        Notification.objects.create(user=self.student, type='new_comment', message='New comment')
+
+    def open(self, cursor):
+        stream = notification_stream.EventStream(self.student, cursor)
+        self.addCleanup(stream.close)
+        self.assertTrue(next(iter(stream)).startswith('retry: '))
+        return iter(stream)
+
+    def frame(self, stream):
+        fields = dict(line.split(': ', 1) for line in next(stream).strip().split('\n'))
+        return fields.get('event'), json.loads(fields['data']), fields.get('id')
+
+    def test_event_ids_round_trip(self):
+        self.assertEqual(notification_stream.parse_event_id('3:7'), (3, 7))
+        for value in ('', '3', 'a:b', None):
+            self.assertIsNone(notification_stream.parse_event_id(value))
+
+    def test_fresh_stream_only_sends_the_count(self):
+        stream = self.open(notification_stream.current_cursor(self.student))
+        self.assertEqual(self.frame(stream)[:2], ('unread', {'count': 2, 'delta': 0}))
+        self.assertEqual(next(stream), ': heartbeat\n\n')
+
+    def test_resumed_stream_replays_missed_notifications(self):
+        stream = self.open((0, 0))
+        event, data, first_id = self.frame(stream)
+        self.assertEqual((event, data['message']), ('notification', 'New upload: Week 1'))
+        event, data, second_id = self.frame(stream)
+        self.assertEqual((event, data['message']), ('notification', 'New comment'))
+        self.assertEqual(self.frame(stream)[0], 'unread')
+
+        stream = self.open(notification_stream.parse_event_id(first_id))
+        self.assertEqual(self.frame(stream)[1]['message'], 'New comment')
+        self.assertEqual(self.frame(stream)[2], second_id)
+
+    def test_published_changes_wake_the_stream(self):
+        stream = self.open(notification_stream.current_cursor(self.student))
+        self.frame(stream)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.broadcast_notification('students', 'new_upload', 'New upload: Week 2', sender=self.professor)
+        self.assertEqual(self.frame(stream)[1]['message'], 'New upload: Week 2')
+        self.assertEqual(self.frame(stream)[:2], ('unread', {'count': 3, 'delta': 1}))
+
+    @override_settings(NOTIFICATION_STREAM_MAX_CONNECTIONS=1)
+    def test_slots_are_released_once(self):
+        self.assertTrue(notification_stream.acquire_slot())
+        self.assertFalse(notification_stream.acquire_slot())
+        stream = notification_stream.EventStream(self.student, (0, 0))
+        stream.close()
+        stream.close()
+        self.assertTrue(notification_stream.acquire_slot())
+        notification_stream.release_slot()
+
+
+class CompactNotificationsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        long_ago = timezone.now() - timedelta(days=365)
+        self.professor = User.objects.create_user(username='prof', password='x', is_professor=True)
+        self.student = User.objects.create_user(
+            username='student', password='x', first_name='S', last_name='T', date_joined=long_ago,
+        )
+
+    def notify(self, days_old=0, **fields):
+        fields = {'type': 'new_comment', 'message': 'New comment', **fields}
+        notification = Notification.objects.create(user=self.student, **fields)
+        services.record_new_notifications([self.student.pk], fields['type'])
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        return notification
+
+    def compact(self, *args):
+        out = StringIO()
+        call_command('compact_notifications', '--sleep', '0', '--batch-size', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_expired_read_notifications_are_archived_and_removed(self):
+        old = [self.notify(days_old=40, is_read=True) for _ in range(3)]
+        recent = self.notify(days_old=5, is_read=True)
+        unread = self.notify(days_old=40)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        archive = os.path.join(directory, 'notifications.jsonl')
+        self.addCleanup(os.remove, archive)
+
+        self.assertIn('Would remove 3 expired read notifications', self.compact('--dry-run'))
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertIn('Removed 3 expired read notifications', self.compact('--archive', archive))
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), {recent.pk, unread.pk})
+        with open(archive) as f:
+            self.assertEqual([json.loads(line)['id'] for line in f], [n.pk for n in old])
+
+    def test_duplicate_unread_notifications_collapse_to_the_newest(self):
+        duplicates = [self.notify(related_object_type='resource', related_object_id=1) for _ in range(3)]
+        other = self.notify(related_object_type='resource', related_object_id=2)
+        self.assertEqual(services.count_unread_notifications(self.student), 4)
+
+        self.assertIn('Removed 2 duplicate unread notifications', self.compact())
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), {duplicates[-1].pk, other.pk})
+        self.assertEqual(services.count_unread_notifications(self.student), 2)
+
+    def test_expired_broadcasts_leave_the_unread_count(self):
+        read, unread = (
+            services.broadcast_notification('students', 'new_upload', message, sender=self.professor)
+            for message in ('New upload: Week 1', 'New upload: Week 2')
+        )
+        services.broadcast_notification('students', 'new_upload', 'New upload: Week 3', sender=self.professor)
+        services.mark_notification_read(self.student, read.public_id)
+        self.assertEqual(services.count_unread_notifications(self.student), 2)
+        BroadcastNotification.objects.filter(pk__in=[read.pk, unread.pk]).update(
+            created_at=timezone.now() - timedelta(days=100)
+        )
+
+        self.assertIn('Removed 2 expired broadcasts', self.compact())
+        self.assertEqual(services.count_unread_notifications(self.student), 1)
+        self.assertEqual(
+            [n.message for n in services.get_user_notifications(self.student)], ['New upload: Week 3'],
+        )
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+
+    def resource(self, title, description='', **fields):
+        fields = {'resource_type': 'link', 'external_url': 'https://example.com', 'is_public': True, **fields}
+        return Resource.objects.create(title=title, description=description, uploader=self.user, **fields)
+
+    def matches(self, query, ranking='relevance'):
+        results, _ = search.search(query, 10, ranking=ranking)
+        return [document.title for document in results['resource']]
+
+    def test_every_word_must_match_and_the_last_is_a_prefix(self):
+        self.resource('Linear algebra review')
+        self.resource('Linear regression')
+        self.assertEqual(self.matches('linear alg'), ['Linear algebra review'])
+        self.assertEqual(sorted(self.matches('LINEAR')), ['Linear algebra review', 'Linear regression'])
+        self.assertEqual(self.matches('linear calculus'), [])
+        self.assertIsNone(search.search_documents('?!'))
+
+    def test_title_matches_outrank_description_matches(self):
+        self.resource('Eigenvalues')
+        self.resource('Week 3 notes', description='Covers eigenvalues in depth')
+        self.assertEqual(self.matches('eigenvalues'), ['Eigenvalues', 'Week 3 notes'])
+
+    def test_private_items_are_not_found(self):
+        self.resource('Eigenvalues', is_public=False)
+        self.assertEqual(self.matches('eigenvalues'), [])
+
+    def test_results_are_limited_per_kind_with_true_totals(self):
+        for n in range(4):
+            self.resource(f'Eigenvalues part {n}')
+        results, totals = search.search('eigenvalues', 2)
+        self.assertEqual(len(results['resource']), 2)
+        self.assertEqual(totals, {'resource': 4, 'quiz': 0, 'deck': 0})
+
+    def test_documents_follow_their_items(self):
+        resource = self.resource('Eigenvalues')
+        quiz = Quiz.objects.create(title='Eigenvalues quiz', creator=self.user)
+        deck = Deck.objects.create(title='Eigenvalues deck', owner=self.user, visibility='private')
+        self.assertEqual(
+            set(SearchDocument.objects.values_list('kind', 'object_id', 'author', 'is_public')),
+            {('resource', resource.pk, 'student', True), ('quiz', quiz.pk, 'student', True),
+             ('deck', deck.pk, 'student', False)},
+        )
+        _, totals = search.search('eigenvalues', 10)
+        self.assertEqual(totals, {'resource': 1, 'quiz': 1, 'deck': 0})
+
+        resource.title = 'Matrix decompositions'
+        resource.save()
+        self.assertEqual(self.matches('eigenvalues'), [])
+        self.assertEqual(self.matches('matrix'), ['Matrix decompositions'])
+
+        quiz.delete()
+        deck.delete()
+        self.assertEqual(list(SearchDocument.objects.values_list('kind', flat=True)), ['resource'])
+
+    def test_counter_saves_leave_the_document_alone(self):
+        resource = self.resource('Eigenvalues')
+        with mock.patch.object(search, 'index_object') as index_object:
+            Resource.objects.get(pk=resource.pk).save(update_fields=['views_count'])
+            index_object.assert_not_called()
+            resource.save(update_fields=['title'])
+            index_object.assert_called_once()
+
+    def test_typeahead_matches_title_and_author_prefixes(self):
+        self.resource('Eigenvalues', description='Also about matrices')
+        self.resource('Hidden eigenvectors', is_public=False)
+        Tag.objects.create(name='eigen-methods')
+        suggestions = search.typeahead('Eigen')
+        self.assertEqual([r['title'] for r in suggestions['resources']], ['Eigenvalues'])
+        self.assertEqual([t['name'] for t in suggestions['tags']], ['eigen-methods'])
+        self.assertEqual(search.typeahead('matrices')['resources'], [])
+        self.assertEqual([r['title'] for r in search.typeahead('stud')['resources']], ['Eigenvalues'])
+        self.assertEqual(search.typeahead('ei'), {'resources': [], 'quizzes': [], 'flashcards': [], 'tags': []})
+
+    def test_typeahead_is_cached_per_normalized_query(self):
+        self.resource('Eigenvalues')
+        first = search.typeahead('eigen')
+        with self.assertNumQueries(0):
+            self.assertEqual(search.typeahead('  EIGEN '), first)
+
+    def test_engagement_scales_relevance(self):
+        popular = self.resource('Eigenvalues explained')
+        self.resource('Eigenvalues summary')
+        self.assertEqual(self.matches('eigenvalues', 'blended')[0], 'Eigenvalues summary')
+
+        Resource.objects.filter(pk=popular.pk).update(views_count=500, download_count=40, likes_count=25)
+        popular.verification_status = 'verified'
+        popular.save()
+        self.assertEqual(ranking.refresh_stale(), 2)
+        score = EngagementScore.objects.get(document__object_id=popular.pk)
+        self.assertEqual((score.views, score.is_verified, score.is_stale), (500, True, False))
+        self.assertEqual(self.matches('eigenvalues', 'blended')[0], 'Eigenvalues explained')
+        self.assertEqual(self.matches('eigenvalues', 'recent')[0], 'Eigenvalues summary')
+        # Engagement multiplies relevance, so a description match cannot outrun an engaged title match
+        weak = self.resource('Spectral methods', description='Eigenvalues appear briefly')
+        Resource.objects.filter(pk=weak.pk).update(views_count=10 ** 6, likes_count=10 ** 4)
+        ranking.refresh_stale()
+        self.assertEqual(self.matches('eigenvalues', 'blended')[0], 'Eigenvalues explained')
+
+    def test_scores_stay_between_zero_and_one(self):
+        self.assertAlmostEqual(ranking.compute_score(**ranking.EMPTY_FEATURES), ranking.RATING_WEIGHT / 2)
+        best = ranking.compute_score(rating_avg=5, rating_count=10 ** 6, views=10 ** 6, downloads=0,
+                                     likes=0, is_verified=True)
+        self.assertAlmostEqual(best, 1.0, places=5)
+
+
+class PaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        now = timezone.now()
+        # Pairs of rows share a timestamp so the id tiebreak matters
+        for n in range(7):
+            resource = Resource.objects.create(
+                title=f'Resource {n}', uploader=self.user, resource_type='link', external_url='https://example.com',
+            )
+            Resource.objects.filter(pk=resource.pk).update(created_at=now - timedelta(hours=n // 2))
+            quiz = Quiz.objects.create(title=f'Quiz {n}', creator=self.user)
+            Quiz.objects.filter(pk=quiz.pk).update(created_at=now - timedelta(hours=n // 2))
+
+    def walk(self, page_of, page_size=3):
+        """Pages forwards to the end, then back to the start."""
+        forward, page = [], page_of(None, page_size)
+        self.assertFalse(page.has_previous)
+        while True:
+            forward.append(list(page))
+            if not page.has_next:
+                break
+            page = page_of(page.next_cursor, page_size)
+        backward = [list(page)]
+        while page.has_previous:
+            page = page_of(page.previous_cursor, page_size)
+            backward.append(list(page))
+        self.assertEqual(backward[::-1], forward)
+        return [obj for rows in forward for obj in rows]
+
+    def test_pages_follow_the_keyset_in_both_directions(self):
+        rows = self.walk(lambda cursor, size: pagination.paginate(Resource.objects.all(), cursor, size))
+        self.assertEqual(rows, list(Resource.objects.order_by('-created_at', '-id')))
+
+    def test_merged_pages_cover_every_source_once(self):
+        querysets = {'resource': Resource.objects.all(), 'quiz': Quiz.objects.all()}
+        rows = self.walk(lambda cursor, size: pagination.paginate_merged(querysets, cursor, size), page_size=4)
+        self.assertEqual(len(rows), 14)
+        self.assertEqual(len({(obj.page_source, obj.pk) for obj in rows}), 14)
+        self.assertEqual([obj.created_at for obj in rows], sorted((obj.created_at for obj in rows), reverse=True))
+
+    def test_bad_cursors_and_sizes_read_as_defaults(self):
+        first = pagination.paginate(Resource.objects.all(), None, 3)
+        for cursor in ('garbage', 'W10', pagination._encode('sideways', [1, 2])):
+            self.assertEqual(list(pagination.paginate(Resource.objects.all(), cursor, 3)), list(first))
+        self.assertEqual(pagination.get_page_size('1000', 20), pagination.MAX_PAGE_SIZE)
+        self.assertEqual(pagination.get_page_size('many', 20), 20)
+
+    def test_totals_are_exact_up_to_the_limit(self):
+        page = pagination.paginate(Resource.objects.all(), None, 3, with_total=True)
+        self.assertEqual(page.as_json()['total'], 7)
+        self.assertEqual(pagination.approximate_count(Resource.objects.all(), limit=5), (5, False))
+
+
+class ViewerStateTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        self.resources = [
+            Resource.objects.create(
+                title=f'Resource {n}', uploader=self.user, resource_type='link', external_url='https://example.com',
+            )
+            for n in range(3)
+        ]
+        self.quiz = Quiz.objects.create(title='Quiz', creator=self.user)
+        self.items = [('resource', r.pk) for r in self.resources] + [('quiz', self.quiz.pk)]
+        Like.objects.create(user=self.user, resource=self.resources[0])
+        Rating.objects.create(user=self.user, resource=self.resources[1], stars=4)
+        QuizBookmark.objects.create(user=self.user, quiz=self.quiz)
+        QuizRating.objects.create(user=self.user, quiz=self.quiz, stars=2)
+
+    def test_one_query_per_kind_and_relation(self):
+        with self.assertNumQueries(6):
+            state = viewer_state.load(self.user, self.items)
+        first, second, third = (r.pk for r in self.resources)
+        self.assertTrue(state.is_liked('resource', first))
+        self.assertFalse(state.is_liked('resource', second))
+        self.assertTrue(state.is_bookmarked('quiz', self.quiz.pk))
+        self.assertEqual(state.ids('rated', 'resource'), {second})
+        self.assertEqual((state.rating('quiz', self.quiz.pk), state.rating('resource', third)), (2, None))
+
+        with self.assertNumQueries(1):
+            state = viewer_state.load(self.user, self.items[:1], relations=('liked',))
+        self.assertEqual(state.liked, {('resource', first)})
+
+    def test_anonymous_and_empty_pages_cost_nothing(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(viewer_state.load(AnonymousUser(), self.items), viewer_state.ViewerState())
+            self.assertEqual(viewer_state.load(self.user, []), viewer_state.ViewerState())
+
+    @override_settings(VIEWER_STATE_CACHE_TIMEOUT=60)
+    def test_cached_state_is_dropped_when_the_viewer_acts(self):
+        viewer_state.load(self.user, self.items)
+        with self.assertNumQueries(0):
+            state = viewer_state.load(self.user, list(reversed(self.items)))
+        self.assertFalse(state.is_liked('resource', self.resources[2].pk))
+
+        Like.objects.create(user=self.user, resource=self.resources[2])
+        self.assertTrue(viewer_state.load(self.user, self.items).is_liked('resource', self.resources[2].pk))
+
+
+@override_settings(COUNTER_BUFFER_FLUSH_INTERVAL=60)
+class CounterBufferTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        self.resource = Resource.objects.create(
+            title='Week 1', uploader=self.user, resource_type='link', external_url='https://example.com',
+        )
+        self.addCleanup(self.discard_pending)
+
+    def discard_pending(self):
+        if counter_buffer._timer is not None:
+            counter_buffer._timer.cancel()
+            counter_buffer._timer = None
+        counter_buffer._take()
+
+    def views(self):
+        return Resource.objects.values_list('views_count', flat=True).get(pk=self.resource.pk)
+
+    def test_hits_are_summed_until_flushed(self):
+        for _ in range(3):
+            self.resource.increment_view_count()
+        self.assertEqual(self.views(), 0)
+        self.assertEqual(counter_buffer.pending(), 1)
+
+        self.assertEqual(counter_buffer.flush(), 1)
+        self.assertEqual(self.views(), 3)
+        self.assertEqual(counter_buffer.pending(), 0)
+
+    def test_latest_touch_wins(self):
+        counter_buffer.touch(Resource, self.resource.pk, title='Draft')
+        counter_buffer.touch(Resource, self.resource.pk, title='Week 1 notes')
+        counter_buffer.flush()
+        self.assertEqual(Resource.objects.get(pk=self.resource.pk).title, 'Week 1 notes')
+
+    def test_failed_flush_keeps_hits(self):
+        self.resource.increment_view_count()
+        with mock.patch.object(counter_buffer, '_write_deltas', side_effect=RuntimeError('database is down')):
+            with self.assertRaises(RuntimeError):
+                counter_buffer.flush()
+        self.resource.increment_view_count()
+        counter_buffer.flush()
+        self.assertEqual(self.views(), 2)
+
+    def test_unsaved_writes_are_logged_at_exit(self):
+        self.resource.increment_view_count()
+        self.resource.increment_view_count()
+        with mock.patch.object(counter_buffer, '_write_deltas', side_effect=RuntimeError('no such table')):
+            with self.assertLogs('accounts.counter_buffer', 'ERROR') as logs:
+                counter_buffer._flush_at_exit()
+        self.assertIn(f'resources.Resource.views_count += 2 (pk {self.resource.pk})', logs.output[-1])
+
+    @override_settings(COUNTER_BUFFER_FLUSH_INTERVAL=0)
+    def test_zero_interval_writes_through(self):
+        self.resource.increment_view_count()
+        self.assertEqual(self.views(), 1)
+        self.assertEqual(counter_buffer.pending(), 0)
+
+
+class CountersMixinTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        self.resource = Resource.objects.create(
+            title='Week 1', uploader=self.user, resource_type='link', external_url='https://example.com',
+        )
+
+    def test_save_keeps_concurrent_counter_and_worker_updates(self):
+        stale = Resource.objects.get(pk=self.resource.pk)
+        counters.increment(Resource, self.resource.pk, likes_count=2)
+        Resource.objects.filter(pk=self.resource.pk).update(thumbnail_url='https://example.com/thumb.webp')
+
+        stale.title = 'Week 1 notes'
+        stale.save()
+        saved = Resource.objects.get(pk=self.resource.pk)
+        self.assertEqual((saved.title, saved.likes_count), ('Week 1 notes', 2))
+        self.assertEqual(saved.thumbnail_url, 'https://example.com/thumb.webp')
+
+    def test_post_save_sees_a_full_save(self):
+        seen = []
+        receiver = lambda sender, update_fields=None, **kwargs: seen.append(update_fields)
+        post_save.connect(receiver, sender=Resource)
+        self.addCleanup(post_save.disconnect, receiver, sender=Resource)
+        self.resource.save()
+        self.resource.save(update_fields=['title'])
+        self.assertEqual(seen, [None, frozenset({'title'})])
+
+    def test_save_after_concurrent_delete_inserts_again(self):
+        Resource.objects.filter(pk=self.resource.pk).delete()
+        self.resource.title = 'Week 1 notes'
+        self.resource.save()
+        self.assertEqual(Resource.objects.get(pk=self.resource.pk).title, 'Week 1 notes')
+
+    def test_explicit_update_fields_write_counters(self):
+        self.resource.views_count = 5
+        self.resource.save(update_fields=['views_count'])
+        self.assertEqual(Resource.objects.get(pk=self.resource.pk).views_count, 5)
+
+
+@override_settings(NOTIFICATION_QUEUE_EAGER=False)
+class NotificationQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        # Registration queues its own admin notifications
+        NotificationJob.objects.all().delete()
+
+    def notify(self, message='Your upload was approved'):
+        return notification_queue.enqueue_notification(self.user, 'verification_approved', message)
+
+    def test_jobs_wait_for_the_worker(self):
+        job = self.notify()
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(notification_queue.run_batch(), {'delivered': 1, 'failed': 0})
+        self.assertEqual(Notification.objects.get().message, 'Your upload was approved')
+        self.assertFalse(NotificationJob.objects.filter(pk=job.pk).exists())
+
+    def test_failed_jobs_back_off_then_fail(self):
+        job = self.notify()
+        failing = mock.patch.dict(notification_queue.HANDLERS, notify_user=mock.Mock(side_effect=RuntimeError('boom')))
+        with failing, self.assertLogs('accounts.notification_queue', 'ERROR'):
+            self.assertEqual(notification_queue.run_batch(), {'delivered': 0, 'failed': 1})
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.last_error), ('pending', 1, 'boom'))
+            self.assertGreater(job.run_after, timezone.now())
+            # Not due yet
+            self.assertEqual(notification_queue.run_batch(), {'delivered': 0, 'failed': 0})
+
+            NotificationJob.objects.filter(pk=job.pk).update(
+                attempts=notification_queue.MAX_ATTEMPTS - 1, run_after=timezone.now()
+            )
+            notification_queue.run_batch()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_claimed_jobs_are_not_claimed_again(self):
+        self.notify()
+        self.assertEqual(len(notification_queue.claim_jobs()), 1)
+        self.assertEqual(notification_queue.claim_jobs(), [])
+
+    def test_stale_claims_are_released(self):
+        job = self.notify()
+        notification_queue.claim_jobs()
+        NotificationJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(notification_queue.release_stale_jobs(), 1)
+        self.assertEqual(notification_queue.run_batch()['delivered'], 1)
+
+    @override_settings(NOTIFICATION_QUEUE_EAGER=True)
+    def test_eager_delivery_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notify()
+            self.assertFalse(Notification.objects.exists())
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(NotificationJob.objects.exists())
+
+    @override_settings(NOTIFICATION_QUEUE_EAGER=True)
+    def test_eager_delivery_skips_jobs_a_worker_claimed(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.notify()
+        self.assertEqual(notification_queue.run_batch()['delivered'], 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_worker_command_drains_the_queue(self):
+        for n in range(3):
+            self.notify(f'Message {n}')
+        out = StringIO()
+        with mock.patch('accounts.management.commands.run_notification_worker.close_old_connections'):
+            call_command('run_notification_worker', '--once', '--batch-size', '2', stdout=out)
+        self.assertEqual(Notification.objects.count(), 3)
+        self.assertIn('3 delivered, 0 failed', out.getvalue())
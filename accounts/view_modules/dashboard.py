@@ -4,7 +4,8 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Count, Avg, Q
+from django.db.models import Count, Avg, Q, F, FloatField
+from django.db.models.functions import Cast, NullIf
 from zoneinfo import ZoneInfo
 from datetime import timedelta
 from collections import defaultdict
@@ -14,6 +15,7 @@ from ..models import User, StudyReminder
 from resources.models import Resource, Bookmark, Tag, Rating, Comment
 from flashcards.models import Deck, Card, DeckBookmark
 from flashcards import services as flashcard_services
+from resources import unique_viewers
 from quizzes.models import QuizAttempt, Quiz, QuizBookmark
 
 
@@ -43,8 +45,7 @@ def student_dashboard(request):
 
     # Top Rated Resources
     top_rated_resources = Resource.objects.annotate(
-        avg_rating=Avg('ratings__stars'),
-        rating_count=Count('ratings')
+        avg_rating=Cast(F('rating_sum'), FloatField()) / NullIf(F('rating_count'), 0)
     ).filter(rating_count__gte=3).order_by('-avg_rating')[:5]
 
     # Upcoming/Explore Quizzes
@@ -401,6 +402,11 @@ def professor_dashboard(request):
     # Total platform resources
     total_platform_resources = Resource.objects.count()
 
+    # Distinct viewers of the professor's own resources, estimated from per-day sketches
+    unique_viewers_30d = unique_viewers.unique_viewers(
+        Resource.objects.filter(uploader=request.user).values_list('id', flat=True)
+    )
+
     # Total pending
     total_pending = pending_verifications.count() + pending_quizzes.count() + pending_decks.count()
 
@@ -444,6 +450,7 @@ def professor_dashboard(request):
         'total_pending': total_pending,
         'total_recently_verified': total_recently_verified,
         'total_platform_resources': total_platform_resources,
+        'unique_viewers_30d': unique_viewers_30d,
     }
     return render(request, 'accounts/professor_dashboard.html', context)
 
@@ -0,0 +1,120 @@
+"""Per-viewer interaction state for list pages.
+load() answers "did this user like / bookmark / rate these items" for a
+page of (kind, id) pairs with at most one query per kind and relation
+(nine in total), however long the page. Results can be cached briefly per
+user (VIEWER_STATE_CACHE_TIMEOUT, off by default, needs a cache shared by
+all workers); the like/bookmark/rating signals call invalidate() so a
+toggle is visible on the next page load.
+"""
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Set, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+__all__ = [
+    "VIEWER_RELATIONS",
+    "ViewerState",
+    "load",
+    "invalidate",
+]
+
+# Kind -> relation -> (model, foreign key)
+VIEWER_RELATIONS = {
+    'resource': {
+        'liked': ('resources.Like', 'resource'),
+        'bookmarked': ('resources.Bookmark', 'resource'),
+        'rated': ('resources.Rating', 'resource'),
+    },
+    'quiz': {
+        'liked': ('quizzes.QuizLike', 'quiz'),
+        'bookmarked': ('quizzes.QuizBookmark', 'quiz'),
+        'rated': ('quizzes.QuizRating', 'quiz'),
+    },
+    'deck': {
+        'liked': ('flashcards.DeckLike', 'deck'),
+        'bookmarked': ('flashcards.DeckBookmark', 'deck'),
+        'rated': ('flashcards.DeckRating', 'deck'),
+    },
+}
+
+
+@dataclass
+class ViewerState:
+    """Sets of (kind, id) the viewer has liked or bookmarked, and their stars."""
+    liked: Set[Tuple[str, int]] = field(default_factory=set)
+    bookmarked: Set[Tuple[str, int]] = field(default_factory=set)
+    ratings: Dict[Tuple[str, int], int] = field(default_factory=dict)
+
+    @property
+    def rated(self) -> Set[Tuple[str, int]]:
+        return set(self.ratings)
+
+    def ids(self, relation: str, kind: str) -> Set[int]:
+        """Ids of one kind in a relation, e.g. ids('liked', 'quiz')."""
+        entries = self.ratings if relation == 'rated' else getattr(self, relation)
+        return {object_id for entry_kind, object_id in entries if entry_kind == kind}
+
+    def is_liked(self, kind: str, object_id: int) -> bool:
+        return (kind, object_id) in self.liked
+
+    def is_bookmarked(self, kind: str, object_id: int) -> bool:
+        return (kind, object_id) in self.bookmarked
+
+    def rating(self, kind: str, object_id: int):
+        return self.ratings.get((kind, object_id))
+
+
+def _version_key(user_id: int) -> str:
+    return f'viewer-state:{user_id}:version'
+
+
+def _cache_key(user_id: int, items) -> str:
+    version = cache.get_or_set(_version_key(user_id), 1, None)
+    digest = hashlib.md5(repr(sorted(items)).encode()).hexdigest()
+    return f'viewer-state:{user_id}:{version}:{digest}'
+
+
+def invalidate(user_id: int):
+    """Drop every cached state of this user (their likes/bookmarks/ratings changed)."""
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        # No version yet, so nothing is cached for this user
+        pass
+
+
+def load(user, items: Iterable[Tuple[str, int]], relations=('liked', 'bookmarked', 'rated'),
+         use_cache: bool = True) -> ViewerState:
+    """Interaction state of `user` for the given (kind, id) pairs."""
+    state = ViewerState()
+    if user is None or not user.is_authenticated:
+        return state
+    by_kind: Dict[str, Set[int]] = {}
+    for kind, object_id in items:
+        by_kind.setdefault(kind, set()).add(object_id)
+    if not by_kind:
+        return state
+
+    timeout = getattr(settings, 'VIEWER_STATE_CACHE_TIMEOUT', 0)
+    key = None
+    if use_cache and timeout:
+        key = _cache_key(user.pk, [(k, sorted(ids)) for k, ids in by_kind.items()] + [tuple(relations)])
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    for kind, object_ids in by_kind.items():
+        for relation in relations:
+            label, fk = VIEWER_RELATIONS[kind][relation]
+            rows = apps.get_model(label).objects.filter(user=user, **{f'{fk}_id__in': object_ids})
+            if relation == 'rated':
+                state.ratings.update(((kind, pk), stars) for pk, stars in rows.values_list(f'{fk}_id', 'stars'))
+            else:
+                getattr(state, relation).update((kind, pk) for pk in rows.values_list(f'{fk}_id', flat=True))
+
+    if key is not None:
+        cache.set(key, state, timeout)
+    return state
@@ -5,13 +5,15 @@ from django.contrib import messages
 from django.urls import reverse_lazy, reverse
 from django.views.generic import CreateView
 from django.utils import timezone
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import JsonResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.db.models import Q
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 import json
+import os
 from .forms import (
     CustomUserCreationForm, 
     CustomAuthenticationForm, 
@@ -22,8 +24,15 @@ from .models import User, UserStats, UserPreferences, UserSession, Notification,
 from resources.models import Resource, Bookmark, Tag, Rating, Comment
 from flashcards.models import Deck, Card
 from flashcards import services as flashcard_services
+from resources import unique_viewers
+from . import services as notification_services
+from .notification_queue import enqueue_admin_notification
+from . import notification_stream
+from . import search as search_index
+from . import pagination
 from quizzes.models import QuizAttempt, Quiz
-from django.db.models import Count, Avg, Q, F, Sum
+from django.db.models import Count, Avg, Q, F, Sum, FloatField
+from django.db.models.functions import Cast, NullIf
 from django.db import models
 from zoneinfo import ZoneInfo
 from datetime import timedelta
@@ -171,8 +180,7 @@ def student_dashboard(request):
         ).exclude(
             id__in=interacted_resource_ids
         ).annotate(
-            avg_rating=Avg('ratings__stars'),
-            rating_count=Count('ratings')
+            avg_rating=Cast(F('rating_sum'), FloatField()) / NullIf(F('rating_count'), 0)
         ).filter(rating_count__gte=2).order_by('-avg_rating', '-created_at')[:3]
         
         recommended_items.extend(subject_resources)
@@ -186,8 +194,7 @@ def student_dashboard(request):
         ).exclude(
             id__in=interacted_resource_ids
         ).annotate(
-            avg_rating=Avg('ratings__stars'),
-            rating_count=Count('ratings')
+            avg_rating=Cast(F('rating_sum'), FloatField()) / NullIf(F('rating_count'), 0)
         ).filter(rating_count__gte=3).order_by('-avg_rating', '-created_at')[:4]
         
         # Add fallback items that aren't already in recommendations
@@ -882,7 +889,7 @@ def manage_users(request):
         return redirect(request.user.get_dashboard_url())
     
     # Get all non-admin users
-    all_users = User.objects.filter(is_staff=False, is_superuser=False).order_by('-date_joined')
+    all_users = User.objects.filter(is_staff=False, is_superuser=False)
     
     # Optional: Add search/filter functionality
     search_query = request.GET.get('search', '')
@@ -903,14 +910,14 @@ def manage_users(request):
     elif role_filter == 'banned':
         all_users = all_users.filter(is_banned=True)
     
-    # Pagination
-    from django.core.paginator import Paginator
-    paginator = Paginator(all_users, 20)  # Show 20 users per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Newest members first, paged by cursor on (date_joined, id)
+    page_obj = pagination.paginate(
+        all_users, request.GET.get('cursor'), 20, ordering=('date_joined', 'id'), with_total=True,
+    )
     
     context = {
         'page_obj': page_obj,
+        'cursor_query': pagination.cursor_query(request),
         'search_query': search_query,
         'role_filter': role_filter,
         'total_users': User.objects.filter(is_staff=False, is_superuser=False).count(),
@@ -1494,7 +1501,8 @@ def analytics_view(request):
     # Calculate statistics
     total_resources = user_resources.count()
     total_bookmarks = user_bookmarks.count()
-    total_views = sum(r.views for r in user_resources)
+    totals = user_resources.aggregate(views=Sum('views_count'), downloads=Sum('download_count'))
+    total_views = totals['views'] or 0
     
     # Resources by type
     resources_by_type = user_resources.values('resource_type').annotate(
@@ -1507,10 +1515,16 @@ def analytics_view(request):
     recent_bookmarks = user_bookmarks.filter(created_at__gte=thirty_days_ago).count()
     
     # Most viewed resources
-    top_resources = user_resources.order_by('-views')[:5]
+    top_resources = list(user_resources.order_by('-views_count')[:5])
+    
+    # Distinct viewers over the last 30 days, estimated from per-day sketches
+    unique_viewers_30d = unique_viewers.unique_viewers(user_resources.values_list('id', flat=True))
+    top_unique = unique_viewers.unique_viewers_by_resource([r.pk for r in top_resources])
+    for resource in top_resources:
+        resource.unique_viewers = top_unique.get(resource.pk, 0)
     
     # Engagement metrics
-    total_downloads = sum(r.downloads for r in user_resources)
+    total_downloads = totals['downloads'] or 0
     avg_views_per_resource = total_views / total_resources if total_resources > 0 else 0
 
     # Get or create UserStats
@@ -1520,6 +1534,7 @@ def analytics_view(request):
         'total_resources': total_resources,
         'total_bookmarks': total_bookmarks,
         'total_views': total_views,
+        'unique_viewers_30d': unique_viewers_30d,
         'total_downloads': total_downloads,
         'avg_views_per_resource': round(avg_views_per_resource, 1),
         'resources_by_type': resources_by_type,
@@ -1829,95 +1844,19 @@ def cancel_deletion(request):
 @login_required
 @require_http_methods(["GET"])
 def global_search_api(request):
-    """Expanded global search across Resources, Quizzes, and Flashcard Decks.
-    Matches against title, description, and creator username.
+    """Typeahead for the global search dropdown across Resources, Quizzes,
+    Flashcard Decks and tag names. Served from prefix/trigram indexes behind
+    a short-lived normalized-query cache (accounts.search.typeahead).
     Returns grouped JSON or 500 with error message on failure."""
     query = request.GET.get('q', '').strip()
-    if not query:
-        return JsonResponse({'resources': [], 'quizzes': [], 'flashcards': []})
-
-    limit = 5  # per category
 
     try:
-        # Resources: title / description / uploader username
-        resources = (
-            Resource.objects.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(uploader__username__icontains=query)
-            )
-            .filter(is_public=True)
-            .select_related('uploader')
-            .order_by('-created_at')[:limit]
-        )
-        resources_data = [
-            {
-                'id': r.pk,
-                'title': r.title,
-                'description': r.description or '',
-                'url': reverse('resources:resource_detail', args=[r.pk]),
-                'resource_type': r.resource_type,
-                'is_verified': r.verification_status == 'verified',
-                'author': r.uploader.username,
-            }
-            for r in resources
-        ]
-
-        # Quizzes: title / description / creator username
-        quizzes = (
-            Quiz.objects.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(creator__username__icontains=query)
-            )
-            .filter(is_public=True)
-            .select_related('creator')
-            .order_by('-created_at')[:limit]
-        )
-        quizzes_data = [
-            {
-                'id': q.pk,
-                'title': q.title,
-                'description': q.description or '',
-                'url': reverse('quizzes:quiz_detail', args=[q.pk]),
-                'is_verified': q.verification_status == 'verified',
-                'author': q.creator.username,
-            }
-            for q in quizzes
-        ]
-
-        # Flashcard Decks: title / description / owner username
-        decks = (
-            Deck.objects.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(owner__username__icontains=query)
-            )
-            .filter(visibility='public')
-            .select_related('owner')
-            .order_by('-created_at')[:limit]
-        )
-        flashcards_data = [
-            {
-                'id': d.pk,
-                'title': d.title,
-                'description': d.description or '',
-                'url': reverse('flashcards:deck_detail', args=[d.pk]),
-                'is_verified': d.verification_status == 'verified',
-                'author': d.owner.username,
-            }
-            for d in decks
-        ]
-
-        return JsonResponse(
-            {
-                'resources': resources_data,
-                'quizzes': quizzes_data,
-                'flashcards': flashcards_data,
-            }
-        )
+        response = JsonResponse(search_index.typeahead(query, limit=5))
     except Exception as e:
         return JsonResponse({'error': 'Server error', 'detail': str(e)}, status=500)
+    # Results are public-only; let the browser reuse them while the user edits the query
+    response['Cache-Control'] = f"private, max-age={settings.TYPEAHEAD_CACHE_TIMEOUT}"
+    return response
 
 
 @login_required
@@ -1929,27 +1868,21 @@ def notifications_unread_count_api(request):
     - Students: new_upload, verification_approved, verification_rejected, new_rating, new_comment
     - Professors: content_review, student_question, new_enrollment + personal notifications
     - Admins: new_user_registration, reported_content, system_alert, password_reset_request + personal notifications
+    Broadcast notifications (uploads, review requests) are merged in at read time.
+    Served from the user's NotificationCounter row with an ETag, so unchanged
+    polls get 304 Not Modified.
     """
-    notifications = request.user.notifications.filter(is_read=False)
-    
-    # Role-based filtering
-    if request.user.is_staff:
-        # Admins see admin notifications + personal notifications
-        admin_types = ['new_user_registration', 'reported_content', 'system_alert', 'password_reset_request']
-        personal_types = ['verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=admin_types + personal_types)
-    elif request.user.is_professor:
-        # Professors see professor notifications + personal notifications
-        prof_types = ['content_review', 'student_question', 'new_enrollment']
-        personal_types = ['verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=prof_types + personal_types)
-    else:
-        # Students see student notifications
-        student_types = ['new_upload', 'verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=student_types)
+    count = notification_services.count_unread_notifications(request.user)
     
-    count = notifications.count()
-    return JsonResponse({'count': count})
+    # The count is read from a maintained counter row; let pollers revalidate cheaply
+    etag = f'"unread-{count}"'
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse({'count': count})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 
 @login_required
@@ -1957,43 +1890,44 @@ def notifications_unread_count_api(request):
 def notifications_list_api(request):
     """
     API endpoint to get user's notifications (latest 20, role-aware).
-    Filters notifications based on user role:
-    - Students: new_upload, verification_approved, verification_rejected, new_rating, new_comment
-    - Professors: content_review, student_question, new_enrollment + personal notifications
-    - Admins: new_user_registration, reported_content, system_alert + personal notifications
+    Personal and broadcast notifications are merged newest-first; broadcast
+    ids are prefixed with "b" so mark-read can tell them apart.
     """
-    notifications = request.user.notifications.all()
-    
-    # Role-based filtering
-    if request.user.is_staff:
-        # Admins see admin notifications + personal notifications
-        admin_types = ['new_user_registration', 'reported_content', 'system_alert', 'password_reset_request']
-        personal_types = ['verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=admin_types + personal_types)
-    elif request.user.is_professor:
-        # Professors see professor notifications + personal notifications
-        prof_types = ['content_review', 'student_question', 'new_enrollment']
-        personal_types = ['verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=prof_types + personal_types)
-    else:
-        # Students see student notifications
-        student_types = ['new_upload', 'verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=student_types)
-    
-    notifications = notifications[:20]
-    
-    notifications_data = [{
-        'id': n.pk,
-        'type': n.type,
-        'message': n.message,
-        'url': n.url or '',
-        'is_read': n.is_read,
-        'created_at': n.created_at.isoformat()
-    } for n in notifications]
+    notifications = notification_services.get_user_notifications(request.user, limit=20)
+    notifications_data = [notification_services.serialize_notification(n) for n in notifications]
     
     return JsonResponse({'notifications': notifications_data})
 
 
+@login_required
+@require_http_methods(["GET"])
+def notifications_stream_api(request):
+    """
+    Server-Sent Events stream of new notifications and unread-count changes.
+    Resumes from the Last-Event-ID header after a reconnect. Each worker
+    process serves a bounded number of streams; beyond that the client gets
+    503 and falls back to polling notifications_unread_count_api.
+    """
+    if not notification_stream.acquire_slot():
+        response = JsonResponse({'error': 'Too many open notification streams'}, status=503)
+        response['Retry-After'] = '30'
+        return response
+    
+    try:
+        cursor = notification_stream.parse_event_id(request.META.get('HTTP_LAST_EVENT_ID', ''))
+        if cursor is None:
+            cursor = notification_stream.current_cursor(request.user)
+        stream = notification_stream.EventStream(request.user, cursor)
+    except Exception:
+        notification_stream.release_slot()
+        raise
+    
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
 @login_required
 @require_http_methods(["POST"])
 def notifications_mark_read_api(request):
@@ -2007,13 +1941,9 @@ def notifications_mark_read_api(request):
         if not notification_id:
             return JsonResponse({'success': False, 'message': 'No notification ID provided'}, status=400)
         
-        notification = request.user.notifications.filter(pk=notification_id).first()
-        
-        if not notification:
+        if not notification_services.mark_notification_read(request.user, notification_id):
             return JsonResponse({'success': False, 'message': 'Notification not found'}, status=404)
         
-        notification.mark_as_read()
-        
         return JsonResponse({'success': True})
         
     except json.JSONDecodeError:
@@ -2029,41 +1959,40 @@ def notifications_mark_all_read_api(request):
     API endpoint to mark all user notifications as read.
     """
     try:
-        request.user.notifications.filter(is_read=False).update(is_read=True)
+        notification_services.mark_all_notifications_read(request.user)
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=500)
 
 
+@login_required
+@require_http_methods(["GET"])
+def http_client_metrics_api(request):
+    """
+    API endpoint with this worker process's storage connection pool metrics
+    (requests, pool hit rate, retries, latency per host) and local storage
+    cache stats - admin only.
+    """
+    from papertrail import http_client
+    from resources import storage_cache
+    
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({'error': 'Admin privileges required.'}, status=403)
+    return JsonResponse({
+        'pid': os.getpid(),
+        'hosts': http_client.metrics(),
+        'storage_cache': storage_cache.get_cache().stats() if storage_cache.is_enabled() else None,
+    })
+
+
 @login_required
 def notifications_page(request):
     """
     View all notifications page (role-aware).
-    Filters notifications based on user role:
-    - Students: new_upload, verification_approved, verification_rejected, new_rating, new_comment
-    - Professors: content_review, student_question, new_enrollment + personal notifications
-    - Admins: new_user_registration, reported_content, system_alert + personal notifications
+    Shows the same merged personal + broadcast feed as the dropdown.
     """
-    notifications = request.user.notifications.all()
-    
-    # Role-based filtering
-    if request.user.is_staff:
-        # Admins see admin notifications + personal notifications
-        admin_types = ['new_user_registration', 'reported_content', 'system_alert', 'password_reset_request']
-        personal_types = ['verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=admin_types + personal_types)
-    elif request.user.is_professor:
-        # Professors see professor notifications + personal notifications
-        prof_types = ['content_review', 'student_question', 'new_enrollment']
-        personal_types = ['verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=prof_types + personal_types)
-    else:
-        # Students see student notifications
-        student_types = ['new_upload', 'verification_approved', 'verification_rejected', 'new_rating', 'new_comment']
-        notifications = notifications.filter(type__in=student_types)
-    
     context = {
-        'notifications': notifications
+        'notifications': notification_services.get_user_notifications(request.user)
     }
     
     return render(request, 'accounts/notifications.html', context)
@@ -2072,59 +2001,33 @@ def notifications_page(request):
 @login_required
 def global_search_page(request):
     """Full-page global search results view.
-    Provides expanded result lists beyond dropdown preview.
+    Provides expanded result lists beyond dropdown preview. Results and true
+    per-type totals come from one ranked SearchDocument query; ?sort= picks
+    blended (relevance + engagement), relevance or recent ordering.
     """
     query = request.GET.get('q', '').strip()
+    sort = request.GET.get('sort', '')
+    if sort not in search_index.RANKING_MODES:
+        sort = settings.SEARCH_RANKING
     resources_data = quizzes_data = flashcards_data = []
     total_counts = {'resources': 0, 'quizzes': 0, 'flashcards': 0}
 
-    if query:
+    if search_index.search_terms(query):
         # Larger limit for full page
         limit = 50
-        # Resources
-        resources = (
-            Resource.objects.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(uploader__username__icontains=query)
-            )
-            .filter(is_public=True)
-            .select_related('uploader')
-            .order_by('-created_at')[:limit]
-        )
-        resources_data = resources
-        total_counts['resources'] = resources.count()
-
-        # Quizzes
-        quizzes = (
-            Quiz.objects.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(creator__username__icontains=query)
-            )
-            .filter(is_public=True)
-            .select_related('creator')
-            .order_by('-created_at')[:limit]
-        )
-        quizzes_data = quizzes
-        total_counts['quizzes'] = quizzes.count()
-
-        # Flashcards (Decks)
-        decks = (
-            Deck.objects.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(owner__username__icontains=query)
-            )
-            .filter(visibility='public')
-            .select_related('owner')
-            .order_by('-created_at')[:limit]
-        )
-        flashcards_data = decks
-        total_counts['flashcards'] = decks.count()
+        results, totals = search_index.search(query, limit, ranking=sort)
+        resources_data = results['resource']
+        quizzes_data = results['quiz']
+        flashcards_data = results['deck']
+        total_counts = {
+            'resources': totals['resource'],
+            'quizzes': totals['quiz'],
+            'flashcards': totals['deck'],
+        }
 
     context = {
         'query': query,
+        'sort': sort,
         'resources': resources_data,
         'quizzes': quizzes_data,
         'flashcards': flashcards_data,
@@ -2275,17 +2178,15 @@ PaperTrail Team'''
                     status='pending'
                 )
                 
-                # Create notification for all admins
-                admin_users = User.objects.filter(is_staff=True, is_superuser=True)
-                for admin in admin_users:
-                    Notification.objects.create(
-                        user=admin,
-                        type='password_reset_request',
-                        message=f'{user.get_display_name()} ({user.stud_id}) has requested a password reset.',
-                        url=reverse('accounts:admin_dashboard'),
-                        related_object_type='PasswordResetRequest',
-                        related_object_id=reset_request.id
-                    )
+                # Queue a notification for all admins (delivered by the notification worker)
+                enqueue_admin_notification(
+                    type='password_reset_request',
+                    message=f'{user.get_display_name()} ({user.stud_id}) has requested a password reset.',
+                    url=reverse('accounts:admin_dashboard'),
+                    related_object_type='PasswordResetRequest',
+                    related_object_id=reset_request.id,
+                    superusers_only=True,
+                )
                 
                 request.session['reset_user_id'] = user.id
                 request.session['reset_method'] = 'admin'
@@ -47,8 +47,10 @@ unban_user = parent_views.unban_user
 global_search_api = parent_views.global_search_api
 notifications_unread_count_api = parent_views.notifications_unread_count_api
 notifications_list_api = parent_views.notifications_list_api
+notifications_stream_api = parent_views.notifications_stream_api
 notifications_mark_read_api = parent_views.notifications_mark_read_api
 notifications_mark_all_read_api = parent_views.notifications_mark_all_read_api
+http_client_metrics_api = parent_views.http_client_metrics_api
 notifications_page = parent_views.notifications_page
 global_search_page = parent_views.global_search_page
 dashboard = parent_views.dashboard
@@ -77,7 +79,9 @@ __all__ = [
     'ban_user', 'unban_requests', 'unban_user',
     # API
     'global_search_api', 'notifications_unread_count_api', 'notifications_list_api',
+    'notifications_stream_api',
     'notifications_mark_read_api', 'notifications_mark_all_read_api',
+    'http_client_metrics_api',
     # Pages
     'notifications_page', 'global_search_page', 'dashboard',
     # Password Reset
@@ -6,14 +6,17 @@ from django.contrib import messages
 from resources.models import Resource, Bookmark
 from flashcards.models import Deck, DeckBookmark
 from quizzes.models import QuizBookmark
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q, prefetch_related_objects
 from django.http import JsonResponse
 from django.utils.timesince import timesince
 
+from accounts import pagination, viewer_state
+
 
 @login_required
 def bookmark_list(request):
-    """List user's bookmarks with optional search, tag filter, and pagination."""
+    """List user's bookmarks with optional search, tag filter, and pagination.
+    All three bookmark types are paged together, newest first, by cursor."""
     # Top-level bookmark type filter: resources | quizzes | flashcards | ''(all)
     btype = request.GET.get("btype", "").strip()
     q = request.GET.get("q", "").strip()
@@ -22,7 +25,6 @@ def bookmark_list(request):
     res_qs = (
         Bookmark.objects.filter(user=request.user)
         .select_related("resource", "resource__uploader")
-        .prefetch_related("resource__tags")
     )
     if q:
         res_qs = res_qs.filter(
@@ -37,12 +39,29 @@ def bookmark_list(request):
     if q:
         deck_bm_qs = deck_bm_qs.filter(Q(deck__title__icontains=q) | Q(deck__description__icontains=q))
 
+    sources = {}
+    if btype in ("", "resources"):
+        sources['resource'] = res_qs
+    if btype in ("", "quizzes"):
+        sources['quiz'] = quiz_qs
+    if btype in ("", "flashcards"):
+        sources['deck'] = deck_bm_qs
+    page_obj = pagination.paginate_merged(sources, request.GET.get('cursor'), 24)
+
+    # Likes by this user on this page, one query per type (counts come from the counter columns)
+    state = viewer_state.load(
+        request.user,
+        [(b.page_source, getattr(b, f'{b.page_source}_id')) for b in page_obj],
+        relations=('liked',),
+    )
+
     # Build unified items
     items = []
-    if btype in ("", "resources"):
-        for b in res_qs:
+    for bookmark in page_obj:
+        if bookmark.page_source == 'resource':
+            b = bookmark
             r = b.resource
-            user_has_liked = r.likes.filter(user=request.user).exists() if request.user.is_authenticated else False
+            user_has_liked = state.is_liked('resource', r.id)
             items.append({
                 'type': 'resource',
                 'id': r.id,
@@ -54,20 +73,20 @@ def bookmark_list(request):
                 'views': r.views_count,
                 'downloads': r.download_count,
                 'rating': r.get_average_rating(),
-                'likes_count': r.likes.count(),
+                'likes_count': r.likes_count,
                 'user_has_liked': user_has_liked,
                 'author': getattr(r.uploader, 'get_full_name', lambda: r.uploader.username)() or r.uploader.username,
                 'detail_url': reverse('resources:resource_detail', args=[r.id]),
                 'remove_url': reverse('bookmarks:toggle', args=[r.id]),
                 'created_at': b.created_at,
             })
-    if btype in ("", "quizzes"):
-        for qb in quiz_qs:
+        elif bookmark.page_source == 'quiz':
+            qb = bookmark
             qz = qb.quiz
             # get_display_name may be method; fallback to username
             author = getattr(qz.creator, 'get_display_name', None)
             author_str = author() if callable(author) else (getattr(qz.creator, 'get_full_name', lambda: qz.creator.username)() or qz.creator.username)
-            user_has_liked = qz.likes.filter(user=request.user).exists() if request.user.is_authenticated else False
+            user_has_liked = state.is_liked('quiz', qz.id)
             items.append({
                 'type': 'quiz',
                 'id': qz.id,
@@ -77,19 +96,19 @@ def bookmark_list(request):
                 'verification_status': qz.verification_status,
                 'questions': qz.total_questions,
                 'attempts': qz.attempts_count,
-                'likes_count': qz.likes.count(),
+                'likes_count': qz.likes_count,
                 'user_has_liked': user_has_liked,
                 'author': author_str,
                 'detail_url': reverse('quizzes:quiz_detail', args=[qz.id]),
                 'remove_url': reverse('quizzes:toggle_quiz_bookmark', args=[qz.id]),
                 'created_at': qb.created_at,
             })
-    if btype in ("", "flashcards"):
-        for deck_bm in deck_bm_qs:
+        else:
+            deck_bm = bookmark
             d = deck_bm.deck
             owner = d.owner
             author_str = getattr(owner, 'get_full_name', lambda: owner.username)() or owner.username
-            user_has_liked = d.likes.filter(user=request.user).exists() if request.user.is_authenticated else False
+            user_has_liked = state.is_liked('deck', d.id)
             items.append({
                 'type': 'flashcard',
                 'id': d.id,
@@ -98,7 +117,7 @@ def bookmark_list(request):
                 'is_private': d.visibility == 'private',
                 'verification_status': d.verification_status,
                 'cards': d.cards_count,
-                'likes_count': d.likes.count(),
+                'likes_count': d.likes_count,
                 'user_has_liked': user_has_liked,
                 'author': author_str,
                 'detail_url': reverse('flashcards:deck_detail', args=[d.id]),
@@ -106,9 +125,6 @@ def bookmark_list(request):
                 'created_at': deck_bm.created_at,
             })
 
-    # Sort by most recent bookmark/time
-    items.sort(key=lambda x: x['created_at'], reverse=True)
-
     # Filter options for component
     filter_options = [
         {'value': 'resources', 'label': 'Resources'},
@@ -122,6 +138,8 @@ def bookmark_list(request):
         {
             "btype": btype,
             "items": items,
+            "page_obj": page_obj,
+            "cursor_query": pagination.cursor_query(request),
             "filter_options": filter_options,
         },
     )
@@ -149,11 +167,11 @@ def toggle_bookmark(request, resource_id):
 
 @login_required
 def bookmark_list_api(request):
-    """Reactive JSON listing for user's bookmarked resources."""
+    """Reactive JSON listing for user's bookmarked resources.
+    Paged by ?cursor= (newest first); ?include_total=1 adds an approximate total."""
     qs = (
         Bookmark.objects.filter(user=request.user)
         .select_related("resource", "resource__uploader")
-        .prefetch_related("resource__tags")
     )
 
     # Filters
@@ -163,20 +181,24 @@ def bookmark_list_api(request):
     if resource_type:
         qs = qs.filter(resource__resource_type=resource_type)
     if search:
+        # EXISTS instead of a tag join, so no DISTINCT is needed
+        tag_match = Resource.tags.through.objects.filter(
+            resource_id=OuterRef('resource_id'), tag__name__icontains=search
+        )
         qs = qs.filter(
             Q(resource__title__icontains=search) |
             Q(resource__description__icontains=search) |
-            Q(resource__tags__name__icontains=search)
-        ).distinct()
-
-    qs = qs.order_by('-id')  # Most recently bookmarked first
+            Exists(tag_match)
+        )
 
-    # Pagination
-    from django.core.paginator import Paginator
-    page_size = int(request.GET.get('page_size', 12))
-    page_number = request.GET.get('page', 1)
-    paginator = Paginator(qs, page_size)
-    page_obj = paginator.get_page(page_number)
+    # Most recently bookmarked first
+    page_obj = pagination.paginate(
+        qs,
+        request.GET.get('cursor'),
+        pagination.get_page_size(request.GET.get('page_size'), 12),
+        with_total=request.GET.get('include_total') == '1',
+    )
+    prefetch_related_objects(page_obj.object_list, 'resource__tags')
 
     results = []
     for b in page_obj.object_list:
@@ -190,7 +212,7 @@ def bookmark_list_api(request):
             'download_count': r.download_count,
             'average_rating': r.get_average_rating(),
             'tags': [t.name for t in r.tags.all()[:4]],
-            'tags_extra': max(r.tags.count() - 4, 0),
+            'tags_extra': max(len(r.tags.all()) - 4, 0),
             'uploader': getattr(r.uploader, 'get_full_name', lambda: r.uploader.username)() or r.uploader.username,
             'created_since': timesince(r.created_at) + ' ago',
         })
@@ -198,9 +220,5 @@ def bookmark_list_api(request):
     return JsonResponse({
         'success': True,
         'results': results,
-        'page': page_obj.number,
-        'num_pages': paginator.num_pages,
-        'has_next': page_obj.has_next(),
-        'has_previous': page_obj.has_previous(),
-        'total': paginator.count,
+        **page_obj.as_json(),
     })
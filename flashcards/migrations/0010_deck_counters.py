@@ -0,0 +1,67 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:26
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Counter field -> model counted (all reference Deck through `deck`)
+COUNTED = {
+    'rating_count': 'DeckRating',
+    'likes_count': 'DeckLike',
+    'bookmarks_count': 'DeckBookmark',
+    'comments_count': 'DeckComment',
+    'cards_count': 'Card',
+}
+
+
+def _total(model, aggregate):
+    rows = model.objects.filter(deck=OuterRef('pk')).order_by().values('deck')
+    return Coalesce(Subquery(rows.annotate(total=aggregate).values('total')[:1]), Value(0),
+                    output_field=IntegerField())
+
+
+def backfill_counters(apps, schema_editor):
+    counts = {field: _total(apps.get_model('flashcards', name), Count('pk')) for field, name in COUNTED.items()}
+    counts['rating_sum'] = _total(apps.get_model('flashcards', 'DeckRating'), Sum('stars'))
+    apps.get_model('flashcards', 'Deck').objects.update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0009_remove_deck_is_bookmarked_deckbookmark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deck',
+            name='bookmarks_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='cards_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='deck',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
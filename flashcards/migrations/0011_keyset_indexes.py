@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flashcards', '0010_deck_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['visibility', 'verification_status', 'created_at', 'id'], name='flashcards__visibil_13d810_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deck',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='flashcards__owner_i_fc0671_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deckbookmark',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='flashcards__user_id_82155d_idx'),
+        ),
+    ]
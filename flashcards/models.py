@@ -1,8 +1,10 @@
 from django.conf import settings
 from django.db import models
 
+from accounts.counters import CountersMixin
 
-class Deck(models.Model):
+
+class Deck(CountersMixin, models.Model):
 	owner = models.ForeignKey(
 		settings.AUTH_USER_MODEL,
 		on_delete=models.CASCADE,
@@ -37,31 +39,40 @@ class Deck(models.Model):
 	last_studied_at = models.DateTimeField(null=True, blank=True)
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
+	# Engagement counters maintained by signals (see accounts/counters.py)
+	rating_sum = models.PositiveIntegerField(default=0)
+	rating_count = models.PositiveIntegerField(default=0)
+	likes_count = models.PositiveIntegerField(default=0)
+	bookmarks_count = models.PositiveIntegerField(default=0)
+	comments_count = models.PositiveIntegerField(default=0)
+	cards_count = models.PositiveIntegerField(default=0)
 
 	class Meta:
 		ordering = ["-updated_at", "-created_at"]
+		# Keyset pagination walks (created_at, id) within these filters
+		indexes = [
+			models.Index(fields=["visibility", "verification_status", "created_at", "id"]),
+			models.Index(fields=["owner", "created_at", "id"]),
+		]
 
 	def __str__(self) -> str:
 		return self.title
 
-	@property
-	def cards_count(self) -> int:
-		return self.cards.count()
-
 	def mark_studied(self):
-		"""Update last studied timestamp. Caller should save the instance."""
+		"""Update last studied timestamp (written to the database by accounts.counter_buffer)."""
 		from django.utils import timezone
-		self.last_studied_at = timezone.now()
+		from accounts import counter_buffer
+		self.last_studied_at = self.updated_at = timezone.now()
+		counter_buffer.touch(Deck, self.pk, last_studied_at=self.last_studied_at, updated_at=self.updated_at)
 
 	def get_average_rating(self):
 		"""Return average rating (float) or 0 if none."""
-		ratings = self.ratings.all()
-		if not ratings:
+		if not self.rating_count:
 			return 0
-		return round(sum(r.stars for r in ratings) / len(ratings), 1)
+		return round(self.rating_sum / self.rating_count, 1)
 
 	def get_rating_count(self):
-		return self.ratings.count()
+		return self.rating_count
 
 
 class Card(models.Model):
@@ -158,6 +169,7 @@ class DeckBookmark(models.Model):
 		ordering = ['-created_at']
 		indexes = [
 			models.Index(fields=['deck', 'created_at']),
+			models.Index(fields=['user', 'created_at', 'id']),
 		]
 	
 	def __str__(self):
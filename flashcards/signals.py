@@ -1,15 +1,17 @@
 """
 Signals for Flashcards app notifications
 Handles: new uploads, verification status changes, ratings, and comments
+Also keeps the global search index, engagement scores, counters and cached viewer state in sync
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Deck, DeckRating, DeckComment
-from accounts.models import Notification
+from .models import Deck, DeckRating, DeckComment, DeckLike, DeckBookmark, Card
+from accounts.notification_queue import enqueue_notification, enqueue_broadcast
+from accounts import counters, ranking, search, viewer_state
 
 User = get_user_model()
 
@@ -23,43 +25,30 @@ def notify_new_deck_upload(sender, instance, created, **kwargs):
     """
     if created:
         try:
-            # Notify students if public
+            url = reverse('flashcards:deck_detail', args=[instance.id])
+
+            # Notify students if public (delivered by the notification worker)
             if instance.visibility == 'public':
-                # Get all users except the owner
-                students = User.objects.filter(is_professor=False).exclude(id=instance.owner.id)
-                
-                # Create bulk notifications for students
-                notifications = [
-                    Notification(
-                        user=student,
-                        type='new_upload',
-                        message=f"New Flashcard Deck uploaded: '{instance.title}' on {instance.created_at.strftime('%Y-%m-%d at %I:%M %p')}",
-                        url=reverse('flashcards:deck_detail', args=[instance.id]),
-                        related_object_type='flashcard',
-                        related_object_id=instance.id
-                    )
-                    for student in students
-                ]
-                Notification.objects.bulk_create(notifications)
+                enqueue_broadcast(
+                    audience='students',
+                    type='new_upload',
+                    message=f"New Flashcard Deck uploaded: '{instance.title}' on {instance.created_at.strftime('%Y-%m-%d at %I:%M %p')}",
+                    url=url,
+                    sender=instance.owner,
+                    related_object_type='flashcard',
+                    related_object_id=instance.id
+                )
             
             # Notify professors if pending review
             if instance.verification_status == 'pending':
-                professors = User.objects.filter(is_professor=True)
-                
-                # Create bulk notifications for professors
-                prof_notifications = [
-                    Notification(
-                        user=professor,
-                        type='content_review',
-                        message=f"New Flashcard Deck submitted by {instance.owner.get_display_name()} for review: '{instance.title}'",
-                        url=reverse('flashcards:deck_detail', args=[instance.id]),
-                        related_object_type='flashcard',
-                        related_object_id=instance.id
-                    )
-                    for professor in professors
-                ]
-                if prof_notifications:
-                    Notification.objects.bulk_create(prof_notifications)
+                enqueue_broadcast(
+                    audience='professors',
+                    type='content_review',
+                    message=f"New Flashcard Deck submitted by {instance.owner.get_display_name()} for review: '{instance.title}'",
+                    url=url,
+                    related_object_type='flashcard',
+                    related_object_id=instance.id
+                )
         except Exception as e:
             print(f"Failed to create upload notifications for Deck {instance.id}: {e}")
 
@@ -81,7 +70,7 @@ def notify_deck_verification_status_change(sender, instance, **kwargs):
                 try:
                     message = f"Your Flashcard Deck '{instance.title}' has been accepted and is now public."
                     
-                    Notification.objects.create(
+                    enqueue_notification(
                         user=instance.owner,
                         type='verification_approved',
                         message=message,
@@ -105,7 +94,7 @@ def notify_new_deck_rating(sender, instance, created, **kwargs):
         # Don't notify if user rates their own content
         if instance.user.id != instance.deck.owner.id:
             try:
-                Notification.objects.create(
+                enqueue_notification(
                     user=instance.deck.owner,
                     type='new_rating',
                     message=f"Someone rated your Flashcard Deck '{instance.deck.title}'.",
@@ -127,7 +116,7 @@ def notify_new_deck_comment(sender, instance, created, **kwargs):
         # Don't notify if user comments on their own content
         if instance.user.id != instance.deck.owner.id:
             try:
-                Notification.objects.create(
+                enqueue_notification(
                     user=instance.deck.owner,
                     type='new_comment',
                     message=f"Someone commented on your Flashcard Deck '{instance.deck.title}'.",
@@ -137,3 +126,103 @@ def notify_new_deck_comment(sender, instance, created, **kwargs):
                 )
             except Exception as e:
                 print(f"Failed to create comment notification for Deck {instance.deck.id}: {e}")
+
+
+@receiver(post_save, sender=Deck)
+def index_deck_for_search(sender, instance, update_fields=None, **kwargs):
+    """Re-index the deck when its title or description may have changed."""
+    if search.should_reindex(update_fields):
+        try:
+            search.index_object(instance)
+        except Exception as e:
+            print(f"Failed to index Deck {instance.id} for search: {e}")
+
+
+@receiver(post_delete, sender=Deck)
+def remove_deck_from_search(sender, instance, **kwargs):
+    """Remove a deleted deck from the search index."""
+    try:
+        search.remove_object(instance)
+    except Exception as e:
+        print(f"Failed to remove Deck {instance.id} from search index: {e}")
+
+
+@receiver(post_save, sender=Deck)
+def mark_deck_engagement_stale(sender, instance, update_fields=None, **kwargs):
+    """Queue a score refresh when counters or verification may have changed."""
+    if ranking.should_refresh(update_fields):
+        try:
+            ranking.mark_stale('deck', instance.pk)
+        except Exception as e:
+            print(f"Failed to mark engagement score stale for Deck {instance.id}: {e}")
+
+
+@receiver([post_save, post_delete], sender=DeckRating)
+@receiver([post_save, post_delete], sender=DeckLike)
+def mark_deck_engagement_stale_on_feedback(sender, instance, **kwargs):
+    """Ratings and likes change the deck's engagement score."""
+    try:
+        ranking.mark_stale('deck', instance.deck_id)
+    except Exception as e:
+        print(f"Failed to mark engagement score stale for Deck {instance.deck_id}: {e}")
+
+
+@receiver(pre_save, sender=DeckRating)
+def remember_previous_deck_rating(sender, instance, **kwargs):
+    counters.remember_stars(instance)
+
+
+@receiver(post_save, sender=DeckRating)
+def count_deck_rating(sender, instance, created, **kwargs):
+    """Keep Deck.rating_sum/rating_count in step with ratings."""
+    try:
+        counters.rating_saved(Deck, instance.deck_id, instance, created)
+    except Exception as e:
+        print(f"Failed to update rating counters for Deck {instance.deck_id}: {e}")
+
+
+@receiver(post_delete, sender=DeckRating)
+def uncount_deck_rating(sender, instance, **kwargs):
+    try:
+        counters.rating_deleted(Deck, instance.deck_id, instance)
+    except Exception as e:
+        print(f"Failed to update rating counters for Deck {instance.deck_id}: {e}")
+
+
+# Related model -> Deck counter it feeds
+DECK_COUNTERS = {DeckLike: 'likes_count', DeckBookmark: 'bookmarks_count', DeckComment: 'comments_count', Card: 'cards_count'}
+
+
+@receiver(post_save, sender=DeckLike)
+@receiver(post_save, sender=DeckBookmark)
+@receiver(post_save, sender=DeckComment)
+@receiver(post_save, sender=Card)
+def count_deck_child(sender, instance, created, **kwargs):
+    """Count new likes, bookmarks, comments and cards on the deck."""
+    if created:
+        try:
+            counters.increment(Deck, instance.deck_id, **{DECK_COUNTERS[sender]: 1})
+        except Exception as e:
+            print(f"Failed to update {DECK_COUNTERS[sender]} for Deck {instance.deck_id}: {e}")
+
+
+@receiver(post_delete, sender=DeckLike)
+@receiver(post_delete, sender=DeckBookmark)
+@receiver(post_delete, sender=DeckComment)
+@receiver(post_delete, sender=Card)
+def uncount_deck_child(sender, instance, **kwargs):
+    try:
+        counters.increment(Deck, instance.deck_id, **{DECK_COUNTERS[sender]: -1})
+    except Exception as e:
+        print(f"Failed to update {DECK_COUNTERS[sender]} for Deck {instance.deck_id}: {e}")
+
+
+@receiver([post_save, post_delete], sender=DeckRating)
+@receiver([post_save, post_delete], sender=DeckLike)
+@receiver([post_save, post_delete], sender=DeckBookmark)
+def invalidate_deck_viewer_state(sender, instance, **kwargs):
+    """Drop the user's cached like/bookmark/rating state for list pages."""
+    try:
+        viewer_state.invalidate(instance.user_id)
+    except Exception as e:
+        print(f"Failed to invalidate viewer state for User {instance.user_id}: {e}")
@@ -11,6 +11,7 @@ from django.contrib import messages
 from django.core.mail import send_mail
 from django.views.decorators.http import require_http_methods
 from .forms import DeckForm, CardForm, DeckCommentForm
+from accounts import pagination, viewer_state
 
 
 @login_required
@@ -20,13 +21,11 @@ def deck_list(request: HttpRequest) -> HttpResponse:
     - All: public decks from all users
     - My: user's own decks (any visibility)
     """
-    from .models import DeckBookmark
-    
     scope = request.GET.get('scope', 'all')
     if scope == 'mine':
-        decks = Deck.objects.filter(owner=request.user).prefetch_related("cards")
+        decks = Deck.objects.filter(owner=request.user).select_related("owner")
     else:
-        decks = Deck.objects.filter(visibility='public', verification_status='verified').prefetch_related("cards")
+        decks = Deck.objects.filter(visibility='public', verification_status='verified').select_related("owner")
 
     # Filters
     q = request.GET.get("q", "").strip()
@@ -36,21 +35,16 @@ def deck_list(request: HttpRequest) -> HttpResponse:
     if category:
         decks = decks.filter(category=category)
 
-    # Get user's bookmarked decks for this view
-    bookmarked_deck_ids = set()
-    if request.user.is_authenticated:
-        bookmarked_deck_ids = set(
-            DeckBookmark.objects.filter(user=request.user, deck__in=decks).values_list('deck_id', flat=True)
-        )
+    # Newest first, paged by cursor on (created_at, id)
+    page_obj = pagination.paginate(decks, request.GET.get("cursor"), 12)
+    decks = page_obj.object_list
 
     # Add like status and bookmark status for each deck
+    state = viewer_state.load(request.user, [('deck', deck.pk) for deck in decks], relations=('liked', 'bookmarked'))
+    bookmarked_deck_ids = state.ids('bookmarked', 'deck')
     for deck in decks:
-        if request.user.is_authenticated:
-            deck.user_has_liked = deck.likes.filter(user=request.user).exists()
-            deck.user_bookmarked = deck.pk in bookmarked_deck_ids
-        else:
-            deck.user_has_liked = False
-            deck.user_bookmarked = False
+        deck.user_has_liked = state.is_liked('deck', deck.pk)
+        deck.user_bookmarked = state.is_bookmarked('deck', deck.pk)
 
     # Category filter options for component
     category_options = [
@@ -66,6 +60,8 @@ def deck_list(request: HttpRequest) -> HttpResponse:
         "flashcards/deck_list.html",
         {
             "decks": decks,
+            "page_obj": page_obj,
+            "cursor_query": pagination.cursor_query(request),
             "query": q,
             "selected_category": category,
             "scope": scope,
@@ -313,7 +309,6 @@ def study(request: HttpRequest, pk: int) -> HttpResponse:
         return redirect('flashcards:deck_list')
     # Mark last studied timestamp
     deck.mark_studied()
-    deck.save(update_fields=["last_studied_at", "updated_at"])
     cards = list(
         deck.cards.values("id", "front_text", "back_text")
     )
@@ -369,8 +364,9 @@ def toggle_like(request: HttpRequest, pk: int) -> HttpResponse:
     else:
         is_liked = True
     
-    # Get updated like count
-    like_count = deck.likes.count()
+    # Get updated like count (maintained by the like signals)
+    deck.refresh_from_db(fields=['likes_count'])
+    like_count = deck.likes_count
     
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
         return JsonResponse({"liked": is_liked, "like_count": like_count})
@@ -431,6 +427,7 @@ def rate_deck(request: HttpRequest, pk: int) -> HttpResponse:
         
         action = 'rated' if created else 'updated your rating for'
         message = f'You {action} "{deck.title}" with {stars_int} star' + ('s' if stars_int != 1 else '') + '!'
+        deck.refresh_from_db(fields=['rating_sum', 'rating_count'])
         
         if is_ajax:
             return JsonResponse({
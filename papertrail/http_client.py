@@ -0,0 +1,161 @@
+"""Process-wide pooled HTTP client for storage and other outbound requests.
+Every storage read and write (downloads, previews, text extraction,
+thumbnails, uploads, deletes, signed URLs) goes through one requests
+Session, so connections to the storage host are kept alive and reused
+instead of paying a TCP and TLS handshake per call. The pool keeps up to
+HTTP_POOL_MAXSIZE connections per host; idempotent requests (and any
+request that failed to connect) are retried HTTP_RETRIES times with
+exponential backoff on connection errors and 502/503/504 responses.
+Requests without an explicit timeout get HTTP_CONNECT_TIMEOUT and
+HTTP_READ_TIMEOUT.
+Per-host metrics (requests, new vs reused connections, retries, errors and
+time to response headers) are kept in process; metrics() returns them and a
+summary is logged every HTTP_METRICS_LOG_EVERY requests.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+__all__ = [
+    "IDENTITY_ENCODING",
+    "get_session",
+    "metrics",
+    "reset_metrics",
+]
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (502, 503, 504)
+
+# requests asks for gzip/deflate/br/zstd by default and iter_content() decodes
+# them. Send these headers to get the stored bytes as-is, e.g. when relaying
+# Content-Length or Range offsets or caching the body.
+IDENTITY_ENCODING = {'Accept-Encoding': 'identity'}
+
+_session = None
+_session_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_metrics: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+_requests_since_log = 0
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ========================================
+# Metrics
+# ========================================
+
+def _record(host: str, seconds: float, new_connection: bool, retries: int, failed: bool):
+    global _requests_since_log
+    with _metrics_lock:
+        stats = _metrics[host]
+        stats['requests'] += 1
+        stats['retries'] += retries
+        stats['errors'] += failed
+        kind = 'new' if new_connection else 'reused'
+        stats[f'{kind}_connections'] += 1
+        stats[f'{kind}_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        _requests_since_log += 1
+        log_now = _requests_since_log >= _setting('HTTP_METRICS_LOG_EVERY', 500)
+        if log_now:
+            _requests_since_log = 0
+    if log_now:
+        for host, summary in metrics().items():
+            logger.info(f'HTTP pool {host}: {summary}')
+
+
+def metrics() -> Dict[str, Dict[str, float]]:
+    """Per-host counters since the process started (or reset_metrics()).
+    pool_hit_rate is the share of requests that reused a kept-alive
+    connection; the avg_*_ms latencies are time to response headers, so
+    avg_new_ms - avg_reused_ms approximates the handshake cost saved per hit."""
+    with _metrics_lock:
+        snapshot = {host: dict(stats) for host, stats in _metrics.items()}
+    result = {}
+    for host, stats in snapshot.items():
+        total = stats.get('requests', 0)
+        new = stats.get('new_connections', 0)
+        reused = stats.get('reused_connections', 0)
+        result[host] = {
+            'requests': int(total),
+            'new_connections': int(new),
+            'reused_connections': int(reused),
+            'pool_hit_rate': round(reused / total, 3) if total else 0.0,
+            'retries': int(stats.get('retries', 0)),
+            'errors': int(stats.get('errors', 0)),
+            'avg_new_ms': round(stats.get('new_seconds', 0) * 1000 / new, 1) if new else None,
+            'avg_reused_ms': round(stats.get('reused_seconds', 0) * 1000 / reused, 1) if reused else None,
+            'max_ms': round(stats.get('max_seconds', 0) * 1000, 1),
+        }
+    return result
+
+
+def reset_metrics():
+    global _requests_since_log
+    with _metrics_lock:
+        _metrics.clear()
+        _requests_since_log = 0
+
+
+# ========================================
+# Session
+# ========================================
+
+class _MeteredAdapter(HTTPAdapter):
+    """HTTPAdapter that applies default timeouts and records metrics."""
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if timeout is None:
+            timeout = (_setting('HTTP_CONNECT_TIMEOUT', 5), _setting('HTTP_READ_TIMEOUT', 30))
+        host = urlparse(request.url).netloc
+        try:
+            pool = self.get_connection(request.url, proxies)
+            connections_before = pool.num_connections
+        except Exception:
+            pool, connections_before = None, 0
+        started = time.perf_counter()
+        response, failed = None, True
+        try:
+            response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            # Under concurrency another thread may open the new connection; good enough for rates
+            new_connection = pool is None or pool.num_connections > connections_before
+            history = getattr(getattr(getattr(response, 'raw', None), 'retries', None), 'history', ())
+            _record(host, time.perf_counter() - started, new_connection, len(history or ()), failed)
+
+
+def get_session() -> requests.Session:
+    """The pooled HTTP session (one per process)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=_setting('HTTP_RETRIES', 3),
+                    backoff_factor=_setting('HTTP_RETRY_BACKOFF', 0.3),
+                    status_forcelist=RETRY_STATUSES,
+                    raise_on_status=False,
+                )
+                adapter = _MeteredAdapter(
+                    pool_connections=_setting('HTTP_POOL_HOSTS', 10),
+                    pool_maxsize=_setting('HTTP_POOL_MAXSIZE', 10),
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
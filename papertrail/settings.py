@@ -1,6 +1,8 @@
 from decouple import config
 from pathlib import Path
 import os
+import sys
+import tempfile
 from dotenv import load_dotenv
 import dj_database_url
  
@@ -17,6 +19,7 @@ if not ON_RENDER:
 # Core settings from environment (fall back only for dev convenience)
 SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY") or os.environ.get("SECRET_KEY") or "unsafe-dev-key"
 DEBUG = os.environ.get("DJANGO_DEBUG", os.environ.get("DEBUG", "True")).lower() == "true"
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'  # running `manage.py test`
 RENDER_EXTERNAL_HOSTNAME = os.environ.get('RENDER_EXTERNAL_HOSTNAME')
  
 ALLOWED_HOSTS = [h.strip() for h in os.environ.get("DJANGO_ALLOWED_HOSTS", os.environ.get("ALLOWED_HOSTS", "localhost,127.0.0.1,localhost:8000")).split(',') if h.strip()]
@@ -158,6 +161,88 @@ FILE_UPLOAD_PERMISSIONS = 0o644
  
 SESSION_COOKIE_AGE = 86400
 SESSION_SAVE_EVERY_REQUEST = True
+
+# Notification delivery queue (see accounts/notification_queue.py)
+# Jobs are delivered by `python manage.py run_notification_worker`.
+# NOTIFICATION_QUEUE_EAGER delivers right after commit instead, for when no worker is running;
+# it defaults to DEBUG, so runserver delivers without a worker.
+NOTIFICATION_QUEUE_EAGER = os.environ.get('NOTIFICATION_QUEUE_EAGER', str(DEBUG)).lower() == 'true'
+
+# Notification SSE stream (see accounts/notification_stream.py)
+# Each open stream holds a worker thread (idle, with no database connection, until an event
+# arrives), so keep the per-process bound below gunicorn's --threads.
+NOTIFICATION_STREAM_MAX_CONNECTIONS = int(os.environ.get('NOTIFICATION_STREAM_MAX_CONNECTIONS', 24))
+NOTIFICATION_STREAM_RECONNECT_DELAY = 3  # seconds the browser waits before reconnecting
+NOTIFICATION_STREAM_HEARTBEAT = 15  # seconds of silence before a keep-alive comment
+NOTIFICATION_STREAM_MAX_LIFETIME = 300  # seconds before the client is asked to reconnect
+
+# Notification retention (see `python manage.py compact_notifications`)
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 30))  # read personal notifications
+NOTIFICATION_BROADCAST_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_BROADCAST_RETENTION_DAYS', 90))
+
+# Global search typeahead (see accounts/search.py)
+TYPEAHEAD_MIN_LENGTH = 3  # shorter queries return no suggestions (trigram indexes need 3 characters)
+TYPEAHEAD_CACHE_TIMEOUT = 30  # seconds a normalized query's suggestions are cached
+
+# Uploaded file text extraction for search (see resources/extraction.py)
+TEXT_EXTRACTION_WORKERS = int(os.environ.get('TEXT_EXTRACTION_WORKERS', 2))  # threads per process
+TEXT_EXTRACTION_TIMEOUT = 60  # seconds to download a file
+TEXT_EXTRACTION_MAX_BYTES = 20 * 1024 * 1024  # larger files are not downloaded for extraction
+TEXT_EXTRACTION_MAX_CHARS = 200000  # characters stored and indexed per file
+
+# Thumbnails of uploaded images, PDFs and slides (see resources/thumbnails.py)
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 1))  # threads per process
+THUMBNAIL_TIMEOUT = 60  # seconds to download a file
+THUMBNAIL_SIZE = 480  # longest side in pixels
+THUMBNAIL_QUALITY = 80  # WebP quality
+
+# Search result ranking (see accounts/search.py and accounts/ranking.py)
+SEARCH_RANKING = os.environ.get('SEARCH_RANKING', 'blended')  # 'blended', 'relevance' or 'recent'
+SEARCH_ENGAGEMENT_WEIGHT = float(os.environ.get('SEARCH_ENGAGEMENT_WEIGHT', 1.0))  # 0 disables the engagement boost
+
+# Per-user like/bookmark/rating state on list pages (see accounts/viewer_state.py)
+# Only enable with a cache shared by every worker process (Redis or the database). The default
+# per-process LocMemCache would let other workers show a stale like/bookmark after a toggle.
+VIEWER_STATE_CACHE_TIMEOUT = int(os.environ.get('VIEWER_STATE_CACHE_TIMEOUT', 0))  # seconds; 0 disables the cache
+
+# Buffered view/download/attempt counters (see accounts/counter_buffer.py)
+# Tests write through: hits buffered in the test process would outlive the test database
+COUNTER_BUFFER_FLUSH_INTERVAL = 0 if TESTING else int(os.environ.get('COUNTER_BUFFER_FLUSH_INTERVAL', 10))  # seconds; 0 writes through
+COUNTER_BUFFER_MAX_PENDING = 1000  # dirty rows that force an early flush
+UNIQUE_VIEWER_RETENTION_DAYS = int(os.environ.get('UNIQUE_VIEWER_RETENTION_DAYS', 90))  # days of per-resource viewer sketches kept
+
+# Shared pooled HTTP client for storage requests (see papertrail/http_client.py)
+HTTP_POOL_HOSTS = 10  # hosts with a kept-alive connection pool
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))  # kept-alive connections per host per process
+HTTP_CONNECT_TIMEOUT = 5  # seconds, when the caller sets no timeout
+HTTP_READ_TIMEOUT = 30  # seconds, when the caller sets no timeout
+HTTP_RETRIES = 3  # retries of connection errors and 502/503/504 (idempotent requests)
+HTTP_RETRY_BACKOFF = 0.3  # seconds, doubled per retry
+HTTP_METRICS_LOG_EVERY = 500  # requests between pool metrics log lines
+
+# Browser uploads straight to storage (see resources/direct_uploads.py)
+DIRECT_UPLOADS_ENABLED = os.environ.get('DIRECT_UPLOADS_ENABLED', 'True').lower() == 'true'  # False: files always go through the upload form
+DIRECT_UPLOAD_TICKET_EXPIRES = 900  # seconds between issuing an upload ticket and confirming it
+DIRECT_UPLOAD_MAX_BYTES = 5 * 1024 * 1024  # same limit as the upload form
+
+# Resource file downloads (see resources/downloads.py)
+DOWNLOAD_STRATEGY = os.environ.get('DOWNLOAD_STRATEGY', 'stream')  # 'proxy', 'stream' or 'redirect'
+DOWNLOAD_REDIRECT_EXPIRES = 60  # seconds a signed redirect URL stays valid
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # bytes per streamed chunk
+DOWNLOAD_CONNECT_TIMEOUT = 5  # seconds
+DOWNLOAD_READ_TIMEOUT = 30  # seconds between chunks from storage
+
+# Local disk cache of rendered file previews (see resources/previews.py)
+PREVIEW_CACHE_DIR = os.environ.get('PREVIEW_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'papertrail', 'previews'))
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get('PREVIEW_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # LRU eviction above this
+PREVIEW_CACHE_MAX_ENTRY_BYTES = 10 * 1024 * 1024  # larger previews are served but not cached
+PREVIEW_BROWSER_MAX_AGE = 300  # seconds browsers reuse a preview before revalidating its ETag
+
+# Local disk cache of stored files in front of downloads (see resources/storage_cache.py)
+STORAGE_CACHE_DIR = os.environ.get('STORAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'papertrail', 'storage'))
+STORAGE_CACHE_MAX_BYTES = int(os.environ.get('STORAGE_CACHE_MAX_BYTES', 1024 * 1024 * 1024))  # LRU eviction above this; 0 disables
+STORAGE_CACHE_MAX_ENTRY_BYTES = 100 * 1024 * 1024  # larger files are always streamed from storage
+STORAGE_CACHE_ETAG_TTL = 60  # seconds the storage ETag of a file uploaded before deduplication is trusted before another HEAD
  
 # ============================================================================
 # EMAIL CONFIGURATION (Gmail SMTP)
@@ -3,9 +3,96 @@ from django.core.files.storage import Storage
 from django.core.files.base import ContentFile
 from django.conf import settings
 from django.utils.deconstruct import deconstructible
-from supabase import create_client, Client
+from typing import BinaryIO, List, Optional, Union
+from urllib.parse import quote, urlencode
 import mimetypes
 
+from papertrail.http_client import get_session
+
+
+class StorageError(Exception):
+    """Supabase Storage answered with an error status."""
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class SupabaseBucket:
+    """
+    Minimal Supabase Storage REST client for one bucket.
+    Requests go through the shared pooled session (papertrail.http_client)
+    instead of a separate client per storage class.
+    Uploads stream from the file object in one request, so a worker never
+    holds a whole file in memory.
+    """
+    def __init__(self, supabase_url: str, key: str, bucket_name: str):
+        self.base_url = f"{supabase_url.rstrip('/')}/storage/v1"
+        self.bucket_name = bucket_name
+        self.headers = {'apikey': key, 'Authorization': f'Bearer {key}'}
+
+    def _url(self, *parts: str) -> str:
+        return '/'.join([self.base_url, *(quote(part) for part in parts)])
+
+    def _request(self, method: str, url: str, **kwargs):
+        headers = {**self.headers, **kwargs.pop('headers', {})}
+        response = get_session().request(method, url, headers=headers, **kwargs)
+        if response.status_code >= 400:
+            raise StorageError(
+                f"Supabase Storage {method} failed ({response.status_code}): {response.text[:200]}",
+                response.status_code,
+            )
+        return response
+
+    def upload(self, path: str, content: Union[bytes, BinaryIO], content_type: str, upsert: bool = False):
+        """One-request upload; a file object is streamed, not read into memory."""
+        return self._request(
+            'POST', self._url('object', self.bucket_name, path), data=content,
+            headers={'Content-Type': content_type, 'cache-control': 'max-age=3600', 'x-upsert': str(upsert).lower()},
+        ).json()
+
+    def upload_stream(self, path: str, file: BinaryIO, size: int, content_type: str, upsert: bool = False):
+        """Upload `size` bytes read from `file` (from its start) in one streamed request."""
+        file.seek(0)
+        return self._request(
+            'POST', self._url('object', self.bucket_name, path), data=file,
+            headers={
+                'Content-Type': content_type, 'Content-Length': str(size),
+                'cache-control': 'max-age=3600', 'x-upsert': str(upsert).lower(),
+            },
+        ).json()
+
+    def remove(self, paths: List[str]) -> list:
+        return self._request('DELETE', self._url('object', self.bucket_name), json={'prefixes': paths}).json()
+
+    def list(self, path: str = '') -> list:
+        body = {'prefix': path, 'limit': 100, 'offset': 0, 'sortBy': {'column': 'name', 'order': 'asc'}}
+        return self._request('POST', self._url('object', 'list', self.bucket_name), json=body).json()
+
+    def signed_url(self, path: str, expires_in: int, download: Optional[str] = None) -> str:
+        """Time-limited URL for an object; `download` makes storage send it as an
+        attachment with that name (a query parameter of the signed URL)."""
+        data = self._request('POST', self._url('object', 'sign', self.bucket_name, path),
+                             json={'expiresIn': expires_in}).json()
+        url = f"{self.base_url}/{data['signedURL'].lstrip('/')}"
+        if download:
+            separator = '&' if '?' in url else '?'
+            url = f"{url}{separator}{urlencode({'download': download}, quote_via=quote)}"
+        return url
+
+    def signed_upload_url(self, path: str, upsert: bool = False) -> str:
+        """URL a client can PUT one file to at `path` without our key (valid for two hours)."""
+        data = self._request('POST', self._url('object', 'upload', 'sign', self.bucket_name, path),
+                             headers={'x-upsert': str(upsert).lower()}).json()
+        return f"{self.base_url}/{data['url'].lstrip('/')}"
+
+    def download(self, path: str):
+        """Streamed response for an object (authenticated, so private buckets work too)."""
+        return self._request('GET', self._url('object', self.bucket_name, path), stream=True)
+
+    def public_url(self, path: str) -> str:
+        return self._url('object', 'public', self.bucket_name, path)
+
+
 @deconstructible
 class SupabaseMediaStorage(Storage):
     """
@@ -22,7 +109,7 @@ class SupabaseMediaStorage(Storage):
         self.bucket_name = getattr(settings, 'SUPABASE_BUCKET', 'papertrail-storage')
         
         if self.supabase_url and self.supabase_key:
-            self.supabase: Client = create_client(self.supabase_url, self.supabase_key)
+            self.supabase = SupabaseBucket(self.supabase_url, self.supabase_key, self.bucket_name)
         else:
             self.supabase = None
 
@@ -42,23 +129,14 @@ class SupabaseMediaStorage(Storage):
         # Clean the name (remove leading slashes)
         name = name.lstrip('/')
         
-        # Read content
-        content_bytes = content.read()
-        
         # Guess mime type
         content_type, _ = mimetypes.guess_type(name)
         if not content_type:
             content_type = 'application/octet-stream'
-            
-        file_options = {"content-type": content_type}
-
-        # Upload
-        # Note: upsert=True overwrites existing files with same name
-        res = self.supabase.storage.from_(self.bucket_name).upload(
-            path=name,
-            file=content_bytes,
-            file_options=file_options
-        )
+
+        # Upload, streamed from the (possibly on-disk) file in parts
+        # Note: upsert=True would overwrite existing files with same name
+        self.supabase.upload_stream(name, content, content.size, content_type)
         
         return name
 
@@ -77,7 +155,7 @@ class SupabaseMediaStorage(Storage):
         filename = os.path.basename(name)
         
         try:
-            files = self.supabase.storage.from_(self.bucket_name).list(directory)
+            files = self.supabase.list(directory)
             for f in files:
                 if f['name'] == filename:
                     return True
@@ -94,7 +172,7 @@ class SupabaseMediaStorage(Storage):
             return name
             
         name = name.lstrip('/')
-        return self.supabase.storage.from_(self.bucket_name).get_public_url(name)
+        return self.supabase.public_url(name)
 
     def delete(self, name):
         """
@@ -104,4 +182,4 @@ class SupabaseMediaStorage(Storage):
             return
             
         name = name.lstrip('/')
-        self.supabase.storage.from_(self.bucket_name).remove([name])
+        self.supabase.remove([name])
@@ -73,8 +73,10 @@ urlpatterns = [
     path('api/notifications/unread-count/', accounts_views.notifications_unread_count_api, name='notifications_unread_count_api'),
     path('api/notifications/unread/', accounts_views.notifications_unread_count_api, name='notifications_unread_api'),
     path('api/notifications/list/', accounts_views.notifications_list_api, name='notifications_list_api'),
+    path('api/notifications/stream/', accounts_views.notifications_stream_api, name='notifications_stream_api'),
     path('api/notifications/mark-read/', accounts_views.notifications_mark_read_api, name='notifications_mark_read_api'),
     path('api/notifications/mark-all-read/', accounts_views.notifications_mark_all_read_api, name='notifications_mark_all_read_api'),
+    path('api/http-client/metrics/', accounts_views.http_client_metrics_api, name='http_client_metrics_api'),
     # Full-page search route
     path('search/', accounts_views.global_search_page, name='global_search_page'),
     
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:26
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Counter field -> model counted (all reference Quiz through `quiz`)
+COUNTED = {
+    'rating_count': 'QuizRating',
+    'likes_count': 'QuizLike',
+    'bookmarks_count': 'QuizBookmark',
+    'comments_count': 'QuizComment',
+    'questions_count': 'Question',
+}
+
+
+def _total(model, aggregate):
+    rows = model.objects.filter(quiz=OuterRef('pk')).order_by().values('quiz')
+    return Coalesce(Subquery(rows.annotate(total=aggregate).values('total')[:1]), Value(0),
+                    output_field=IntegerField())
+
+
+def backfill_counters(apps, schema_editor):
+    counts = {field: _total(apps.get_model('quizzes', name), Count('pk')) for field, name in COUNTED.items()}
+    counts['rating_sum'] = _total(apps.get_model('quizzes', 'QuizRating'), Sum('stars'))
+    apps.get_model('quizzes', 'Quiz').objects.update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0006_quizlike_alter_quizcomment_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='bookmarks_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='questions_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
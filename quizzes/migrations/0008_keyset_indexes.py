@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0007_quiz_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['is_public', 'verification_status', 'created_at', 'id'], name='quizzes_qui_is_publ_f51b7b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['creator', 'created_at', 'id'], name='quizzes_qui_creator_393c57_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizbookmark',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='quizzes_qui_user_id_7e3ec7_idx'),
+        ),
+    ]
@@ -2,10 +2,12 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
+from accounts.counters import CountersMixin
+
 User = get_user_model()
 
 
-class Quiz(models.Model):
+class Quiz(CountersMixin, models.Model):
     """Quiz model with verification status similar to Resource"""
     
     VERIFICATION_STATUS = [
@@ -43,31 +45,44 @@ class Quiz(models.Model):
     # Statistics
     attempts_count = models.PositiveIntegerField(default=0)
     
+    # Engagement counters maintained by signals (see accounts/counters.py)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0)
+    bookmarks_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    questions_count = models.PositiveIntegerField(default=0)
+    
     class Meta:
         ordering = ['-created_at']
+        # Keyset pagination walks (created_at, id) within these filters
+        indexes = [
+            models.Index(fields=['is_public', 'verification_status', 'created_at', 'id']),
+            models.Index(fields=['creator', 'created_at', 'id']),
+        ]
     
     def __str__(self):
         return self.title
     
     @property
     def total_questions(self):
-        return self.questions.count()
+        return self.questions_count
     
     def increment_attempts_count(self):
-        """Increment attempts count"""
+        """Increment attempts count (written to the database by accounts.counter_buffer)"""
+        from accounts import counter_buffer
         self.attempts_count += 1
-        self.save(update_fields=['attempts_count'])
+        counter_buffer.add(Quiz, self.pk, 'attempts_count')
     
     def get_average_rating(self):
         """Return average rating (float) or 0 if none."""
-        ratings = self.ratings.all()
-        if not ratings:
+        if not self.rating_count:
             return 0
-        return round(sum(r.stars for r in ratings) / len(ratings), 1)
+        return round(self.rating_sum / self.rating_count, 1)
     
     def get_rating_count(self):
         """Return total number of ratings."""
-        return self.ratings.count()
+        return self.rating_count
 
 
 class Question(models.Model):
@@ -157,6 +172,9 @@ class QuizBookmark(models.Model):
     class Meta:
         unique_together = ['user', 'quiz']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id']),
+        ]
 
 
 class QuizRating(models.Model):
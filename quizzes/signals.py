@@ -1,15 +1,17 @@
 """
 Signals for Quiz app notifications
 Handles: new uploads, verification status changes, ratings, and comments
+Also keeps the global search index, engagement scores, counters and cached viewer state in sync
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Quiz, QuizRating, QuizComment
-from accounts.models import Notification
+from .models import Quiz, QuizRating, QuizComment, QuizLike, QuizBookmark, Question
+from accounts.notification_queue import enqueue_notification, enqueue_broadcast
+from accounts import counters, ranking, search, viewer_state
 
 User = get_user_model()
 
@@ -23,43 +25,30 @@ def notify_new_quiz_upload(sender, instance, created, **kwargs):
     """
     if created:
         try:
-            # Notify students if public
+            url = reverse('quizzes:quiz_detail', args=[instance.id])
+
+            # Notify students if public (delivered by the notification worker)
             if instance.is_public:
-                # Get all users except the creator
-                students = User.objects.filter(is_professor=False).exclude(id=instance.creator.id)
-                
-                # Create bulk notifications for students
-                notifications = [
-                    Notification(
-                        user=student,
-                        type='new_upload',
-                        message=f"New Quiz uploaded: '{instance.title}' on {instance.created_at.strftime('%Y-%m-%d at %I:%M %p')}",
-                        url=reverse('quizzes:quiz_detail', args=[instance.id]),
-                        related_object_type='quiz',
-                        related_object_id=instance.id
-                    )
-                    for student in students
-                ]
-                Notification.objects.bulk_create(notifications)
+                enqueue_broadcast(
+                    audience='students',
+                    type='new_upload',
+                    message=f"New Quiz uploaded: '{instance.title}' on {instance.created_at.strftime('%Y-%m-%d at %I:%M %p')}",
+                    url=url,
+                    sender=instance.creator,
+                    related_object_type='quiz',
+                    related_object_id=instance.id
+                )
             
             # Notify professors if pending review
             if instance.verification_status == 'pending':
-                professors = User.objects.filter(is_professor=True)
-                
-                # Create bulk notifications for professors
-                prof_notifications = [
-                    Notification(
-                        user=professor,
-                        type='content_review',
-                        message=f"New Quiz submitted by {instance.creator.get_display_name()} for review: '{instance.title}'",
-                        url=reverse('quizzes:quiz_detail', args=[instance.id]),
-                        related_object_type='quiz',
-                        related_object_id=instance.id
-                    )
-                    for professor in professors
-                ]
-                if prof_notifications:
-                    Notification.objects.bulk_create(prof_notifications)
+                enqueue_broadcast(
+                    audience='professors',
+                    type='content_review',
+                    message=f"New Quiz submitted by {instance.creator.get_display_name()} for review: '{instance.title}'",
+                    url=url,
+                    related_object_type='quiz',
+                    related_object_id=instance.id
+                )
         except Exception as e:
             print(f"Failed to create upload notifications for Quiz {instance.id}: {e}")
 
@@ -86,7 +75,7 @@ def notify_quiz_verification_status_change(sender, instance, **kwargs):
                         message = f"Your Quiz '{instance.title}' was rejected. Please check for feedback or contact a moderator."
                         notif_type = 'verification_rejected'
                     
-                    Notification.objects.create(
+                    enqueue_notification(
                         user=instance.creator,
                         type=notif_type,
                         message=message,
@@ -110,7 +99,7 @@ def notify_new_quiz_rating(sender, instance, created, **kwargs):
         # Don't notify if user rates their own content
         if instance.user.id != instance.quiz.creator.id:
             try:
-                Notification.objects.create(
+                enqueue_notification(
                     user=instance.quiz.creator,
                     type='new_rating',
                     message=f"Someone rated your Quiz '{instance.quiz.title}'.",
@@ -132,7 +121,7 @@ def notify_new_quiz_comment(sender, instance, created, **kwargs):
         # Don't notify if user comments on their own content
         if instance.user.id != instance.quiz.creator.id:
             try:
-                Notification.objects.create(
+                enqueue_notification(
                     user=instance.quiz.creator,
                     type='new_comment',
                     message=f"Someone commented on your Quiz '{instance.quiz.title}'.",
@@ -142,3 +131,103 @@ def notify_new_quiz_comment(sender, instance, created, **kwargs):
                 )
             except Exception as e:
                 print(f"Failed to create comment notification for Quiz {instance.quiz.id}: {e}")
+
+
+@receiver(post_save, sender=Quiz)
+def index_quiz_for_search(sender, instance, update_fields=None, **kwargs):
+    """Re-index the quiz when its title or description may have changed."""
+    if search.should_reindex(update_fields):
+        try:
+            search.index_object(instance)
+        except Exception as e:
+            print(f"Failed to index Quiz {instance.id} for search: {e}")
+
+
+@receiver(post_delete, sender=Quiz)
+def remove_quiz_from_search(sender, instance, **kwargs):
+    """Remove a deleted quiz from the search index."""
+    try:
+        search.remove_object(instance)
+    except Exception as e:
+        print(f"Failed to remove Quiz {instance.id} from search index: {e}")
+
+
+@receiver(post_save, sender=Quiz)
+def mark_quiz_engagement_stale(sender, instance, update_fields=None, **kwargs):
+    """Queue a score refresh when counters or verification may have changed."""
+    if ranking.should_refresh(update_fields):
+        try:
+            ranking.mark_stale('quiz', instance.pk)
+        except Exception as e:
+            print(f"Failed to mark engagement score stale for Quiz {instance.id}: {e}")
+
+
+@receiver([post_save, post_delete], sender=QuizRating)
+@receiver([post_save, post_delete], sender=QuizLike)
+def mark_quiz_engagement_stale_on_feedback(sender, instance, **kwargs):
+    """Ratings and likes change the quiz's engagement score."""
+    try:
+        ranking.mark_stale('quiz', instance.quiz_id)
+    except Exception as e:
+        print(f"Failed to mark engagement score stale for Quiz {instance.quiz_id}: {e}")
+
+
+@receiver(pre_save, sender=QuizRating)
+def remember_previous_quiz_rating(sender, instance, **kwargs):
+    counters.remember_stars(instance)
+
+
+@receiver(post_save, sender=QuizRating)
+def count_quiz_rating(sender, instance, created, **kwargs):
+    """Keep Quiz.rating_sum/rating_count in step with ratings."""
+    try:
+        counters.rating_saved(Quiz, instance.quiz_id, instance, created)
+    except Exception as e:
+        print(f"Failed to update rating counters for Quiz {instance.quiz_id}: {e}")
+
+
+@receiver(post_delete, sender=QuizRating)
+def uncount_quiz_rating(sender, instance, **kwargs):
+    try:
+        counters.rating_deleted(Quiz, instance.quiz_id, instance)
+    except Exception as e:
+        print(f"Failed to update rating counters for Quiz {instance.quiz_id}: {e}")
+
+
+# Related model -> Quiz counter it feeds
+QUIZ_COUNTERS = {QuizLike: 'likes_count', QuizBookmark: 'bookmarks_count', QuizComment: 'comments_count', Question: 'questions_count'}
+
+
+@receiver(post_save, sender=QuizLike)
+@receiver(post_save, sender=QuizBookmark)
+@receiver(post_save, sender=QuizComment)
+@receiver(post_save, sender=Question)
+def count_quiz_child(sender, instance, created, **kwargs):
+    """Count new likes, bookmarks, comments and questions on the quiz."""
+    if created:
+        try:
+            counters.increment(Quiz, instance.quiz_id, **{QUIZ_COUNTERS[sender]: 1})
+        except Exception as e:
+            print(f"Failed to update {QUIZ_COUNTERS[sender]} for Quiz {instance.quiz_id}: {e}")
+
+
+@receiver(post_delete, sender=QuizLike)
+@receiver(post_delete, sender=QuizBookmark)
+@receiver(post_delete, sender=QuizComment)
+@receiver(post_delete, sender=Question)
+def uncount_quiz_child(sender, instance, **kwargs):
+    try:
+        counters.increment(Quiz, instance.quiz_id, **{QUIZ_COUNTERS[sender]: -1})
+    except Exception as e:
+        print(f"Failed to update {QUIZ_COUNTERS[sender]} for Quiz {instance.quiz_id}: {e}")
+
+
+@receiver([post_save, post_delete], sender=QuizRating)
+@receiver([post_save, post_delete], sender=QuizLike)
+@receiver([post_save, post_delete], sender=QuizBookmark)
+def invalidate_quiz_viewer_state(sender, instance, **kwargs):
+    """Drop the user's cached like/bookmark/rating state for list pages."""
+    try:
+        viewer_state.invalidate(instance.user_id)
+    except Exception as e:
+        print(f"Failed to invalidate viewer state for User {instance.user_id}: {e}")
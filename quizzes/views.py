@@ -9,6 +9,7 @@ from django.db.models import Q
 from django.urls import reverse
 from .models import Quiz, Question, Option, QuizAttempt, QuizAttemptAnswer, QuizBookmark, QuizRating, QuizComment, QuizLike
 from .forms import QuizForm, QuestionForm, QuizAttemptForm
+from accounts import pagination, viewer_state
 from django.core.mail import send_mail
 import json
 
@@ -26,33 +27,28 @@ def quiz_list(request):
     status_filter = request.GET.get('status', '').strip()
     
     if scope == 'mine':
-        quizzes = Quiz.objects.filter(creator=request.user).order_by('-created_at')
+        quizzes = Quiz.objects.filter(creator=request.user)
     else:
         if getattr(request.user, 'is_professor', False):
             quizzes = Quiz.objects.filter(is_public=True).filter(
                 Q(verification_status='verified') | Q(verification_status='pending')
-            ).order_by('-created_at')
+            )
         else:
-            quizzes = Quiz.objects.filter(verification_status='verified', is_public=True).order_by('-created_at')
+            quizzes = Quiz.objects.filter(verification_status='verified', is_public=True)
     
     if q:
         quizzes = quizzes.filter(Q(title__icontains=q) | Q(description__icontains=q))
     
     if status_filter:
         quizzes = quizzes.filter(verification_status=status_filter)
-    # Bookmarks for current user
-    bookmarked_ids = set()
-    if request.user.is_authenticated:
-        bookmarked_ids = set(
-            QuizBookmark.objects.filter(user=request.user, quiz__in=quizzes).values_list('quiz_id', flat=True)
-        )
-    
-    # Add like status for each quiz
+    # Newest first, paged by cursor on (created_at, id)
+    page_obj = pagination.paginate(quizzes.select_related('creator'), request.GET.get('cursor'), 12)
+    quizzes = page_obj.object_list
+    # Likes and bookmarks of the current user on this page
+    state = viewer_state.load(request.user, [('quiz', quiz.pk) for quiz in quizzes], relations=('liked', 'bookmarked'))
+    bookmarked_ids = state.ids('bookmarked', 'quiz')
     for quiz in quizzes:
-        if request.user.is_authenticated:
-            quiz.user_has_liked = quiz.likes.filter(user=request.user).exists()
-        else:
-            quiz.user_has_liked = False
+        quiz.user_has_liked = state.is_liked('quiz', quiz.pk)
 
     # Status filter options for component
     status_filter_options = [
@@ -64,6 +60,8 @@ def quiz_list(request):
 
     context = {
         'quizzes': quizzes,
+        'page_obj': page_obj,
+        'cursor_query': pagination.cursor_query(request),
         'scope': scope,
         'query': q,
         'bookmarked_ids': bookmarked_ids,
@@ -783,6 +781,7 @@ def rate_quiz(request, pk):
         
         action = 'rated' if created else 'updated your rating for'
         message = f'You {action} "{quiz.title}" with {stars_int} star' + ('s' if stars_int != 1 else '') + '!'
+        quiz.refresh_from_db(fields=['rating_sum', 'rating_count'])
         
         if is_ajax:
             return JsonResponse({
@@ -820,10 +819,12 @@ def toggle_like(request, pk):
         # Like
         liked = True
     
+    # Like count is maintained by the like signals
+    quiz.refresh_from_db(fields=['likes_count'])
     return JsonResponse({
         'success': True,
         'liked': liked,
-        'like_count': quiz.likes.count()
+        'like_count': quiz.likes_count
     })
 
 
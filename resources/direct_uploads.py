@@ -0,0 +1,206 @@
+"""Resource files uploaded by the browser straight to storage.
+Files sent with the upload form pass through a worker twice (in from the
+browser, out to storage). Instead, the upload page asks for a ticket:
+issue_ticket() checks the declared name, size and SHA-256 and returns a
+signed upload URL for a fresh staging path plus a ticket, a signed token
+valid for DIRECT_UPLOAD_TICKET_EXPIRES seconds that records what was
+declared. The browser PUTs the file to storage and posts the form with the
+ticket; confirm() reads the object back, checks its size, type (by magic
+bytes) and hash against the ticket and hands it to the StoredFile index, so
+identical content is still stored once. Objects that fail are deleted. A
+ticket is confirmed at most once: confirm() first claims its path with a
+DirectUploadClaim row, so a replayed or concurrent second confirm gets 409.
+"""
+import hashlib
+import os
+import re
+import uuid
+from datetime import timedelta
+from typing import Dict
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import DirectUploadClaim
+from .supabase_storage import supabase_storage
+
+__all__ = [
+    "EXTENSIONS",
+    "DirectUploadError",
+    "is_enabled",
+    "issue_ticket",
+    "read_ticket",
+    "confirm",
+]
+
+STAGING_FOLDER = 'uploads'
+TICKET_SALT = 'resources.direct_uploads'
+
+OLE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ZIP = b'PK\x03\x04'
+# Extensions the upload form accepts -> leading bytes their files start with
+# (None: plain text, checked for NUL bytes instead)
+EXTENSIONS = {
+    '.pdf': (b'%PDF-',),
+    '.ppt': (OLE,),
+    '.pptx': (ZIP,),
+    '.doc': (OLE,),
+    '.docx': (ZIP,),
+    '.txt': None,
+    '.jpg': (b'\xff\xd8\xff',),
+    '.jpeg': (b'\xff\xd8\xff',),
+    '.png': (b'\x89PNG\r\n\x1a\n',),
+}
+SNIFF_BYTES = 1024
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class DirectUploadError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'DIRECT_UPLOADS_ENABLED', True) and supabase_storage.supabase is not None
+
+
+def _max_bytes() -> int:
+    return getattr(settings, 'DIRECT_UPLOAD_MAX_BYTES', 5 * 1024 * 1024)
+
+
+def _ticket_expires() -> int:
+    return getattr(settings, 'DIRECT_UPLOAD_TICKET_EXPIRES', 900)
+
+
+# ========================================
+# Tickets
+# ========================================
+
+def issue_ticket(user, filename: str, size, sha256: str) -> Dict:
+    """Check a declared upload and sign a staging path for it.
+    Returns the ticket, the URL to PUT the file to and the headers to send."""
+    if not is_enabled():
+        raise DirectUploadError('Direct uploads are not available.', status=503)
+    filename = os.path.basename(str(filename or '')).strip()
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in EXTENSIONS:
+        raise DirectUploadError('This file type is not supported.')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise DirectUploadError('Invalid file size.')
+    if size <= 0:
+        raise DirectUploadError('The file is empty.')
+    if size > _max_bytes():
+        raise DirectUploadError(f'File size must not exceed {_max_bytes() // (1024 * 1024)}MB.')
+    sha256 = str(sha256 or '').lower()
+    if not SHA256_RE.match(sha256):
+        raise DirectUploadError('Invalid file hash.')
+
+    path = f'{STAGING_FOLDER}/{user.pk}/{uuid.uuid4().hex}{extension}'
+    upload_url = supabase_storage.signed_upload_url(path)
+    if not upload_url:
+        raise DirectUploadError('Could not prepare the upload, please try again.', status=503)
+    ticket = signing.dumps(
+        {'user': user.pk, 'path': path, 'name': filename, 'size': size, 'sha256': sha256},
+        salt=TICKET_SALT, compress=True,
+    )
+    return {
+        'ticket': ticket,
+        'upload_url': upload_url,
+        'method': 'PUT',
+        'headers': {'x-upsert': 'false'},
+        'expires_in': _ticket_expires(),
+    }
+
+
+def read_ticket(user, ticket: str) -> Dict:
+    """The declaration signed into a ticket, if it is valid, unexpired and this user's."""
+    try:
+        data = signing.loads(ticket, salt=TICKET_SALT, max_age=_ticket_expires())
+    except signing.SignatureExpired:
+        raise DirectUploadError('The upload ticket has expired, please upload the file again.')
+    except signing.BadSignature:
+        raise DirectUploadError('Invalid upload ticket.')
+    if data.get('user') != user.pk:
+        raise DirectUploadError('This upload ticket belongs to another user.', status=403)
+    return data
+
+
+# ========================================
+# Confirmation
+# ========================================
+
+def _claim(path: str):
+    """Record that this staged path is being confirmed. In the caller's
+    transaction a concurrent claim waits for it and fails once it commits;
+    if it rolls back the ticket can be confirmed again."""
+    # Claims older than a ticket's lifetime guard nothing any more
+    DirectUploadClaim.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=_ticket_expires())
+    ).delete()
+    try:
+        with transaction.atomic():
+            DirectUploadClaim.objects.create(object_path=path)
+    except IntegrityError:
+        raise DirectUploadError('This upload was already confirmed.', status=409)
+
+
+def _check_type(extension: str, head: bytes) -> bool:
+    signatures = EXTENSIONS[extension]
+    if signatures is None:
+        return b'\x00' not in head
+    return head.startswith(signatures)
+
+
+def _verify(data: Dict):
+    """Stream the staged object and compare it with the ticket."""
+    try:
+        response = supabase_storage.supabase.download(data['path'])
+    except Exception:
+        raise DirectUploadError('The uploaded file was not found, please upload it again.')
+    hasher = hashlib.sha256()
+    size = 0
+    head = b''
+    try:
+        for chunk in response.iter_content(chunk_size=getattr(settings, 'DOWNLOAD_CHUNK_SIZE', 64 * 1024)):
+            size += len(chunk)
+            if size > data['size']:
+                raise DirectUploadError('The uploaded file does not match the declared size.')
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+            hasher.update(chunk)
+    finally:
+        response.close()
+    if size != data['size']:
+        raise DirectUploadError('The uploaded file does not match the declared size.')
+    if not _check_type(os.path.splitext(data['path'])[1], head):
+        raise DirectUploadError('The uploaded file is not a valid file of its type.')
+    if hasher.hexdigest() != data['sha256']:
+        raise DirectUploadError('The uploaded file is corrupted (checksum mismatch), please upload it again.')
+
+
+def confirm(user, ticket: str) -> Dict:
+    """Verify a direct upload and index it. Returns file_url, original_filename
+    and file_size for the Resource; call inside the transaction that saves it,
+    and release_file() the URL like one from upload_file()."""
+    if not is_enabled():
+        raise DirectUploadError('Direct uploads are not available.', status=503)
+    data = read_ticket(user, ticket)
+    _claim(data['path'])
+
+    try:
+        _verify(data)
+    except DirectUploadError:
+        supabase_storage.delete_file(data['path'])
+        raise
+
+    success, file_url, error = supabase_storage.adopt_upload(data['path'], data['sha256'], data['size'])
+    if not success:
+        raise DirectUploadError(f'File upload failed: {error}', status=502)
+    return {'file_url': file_url, 'original_filename': data['name'], 'file_size': data['size']}
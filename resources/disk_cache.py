@@ -0,0 +1,283 @@
+"""Size-capped LRU cache of byte blobs in a local directory.
+Each entry is one file: a JSON metadata line followed by the raw bytes.
+Reads bump the file's mtime, and a write that takes the directory over
+`max_bytes` deletes least recently used entries down to 90% of the cap.
+Writes add their size to a running total, so the directory is only
+scanned when that total passes the cap; the scan resets the total to
+what is actually on disk.
+Writes go through a temporary file and os.replace(), so concurrent
+workers never read a half-written entry. Entries are named
+"<prefix>-<digest>", so everything for one prefix (e.g. a resource id)
+can be dropped together. The running total and fill and eviction counts
+are kept in a stats file in the directory, so every worker (and
+`manage.py storage_cache`) sees the same totals; hits and misses are
+counted per process.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: stats updates are not locked
+    fcntl = None
+
+__all__ = [
+    "DiskCache",
+    "EntryWriter",
+]
+
+SUFFIX = '.entry'
+STATS_FILE = 'stats.json'
+
+
+class EntryWriter:
+    """Writes one entry as its content arrives (e.g. teed from a download).
+    Nothing is visible to readers until commit(); content over the entry
+    size limit is dropped."""
+
+    def __init__(self, cache: 'DiskCache', prefix, key: str, meta: Dict):
+        self.cache = cache
+        self.prefix = prefix
+        self.key = key
+        self.size = 0
+        self.committed = False
+        os.makedirs(cache.directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=cache.directory, suffix='.tmp')
+        self.file = os.fdopen(fd, 'wb')
+        header = json.dumps({**meta, 'key': key}).encode() + b'\n'
+        self.file.write(header)
+        self.header_size = len(header)
+
+    def write(self, chunk: bytes):
+        if self.file is None:
+            return
+        self.size += len(chunk)
+        if self.size > self.cache.max_entry_bytes:
+            self.discard()
+            return
+        self.file.write(chunk)
+
+    def commit(self) -> bool:
+        if self.file is None:
+            return False
+        try:
+            self.file.close()
+            self.file = None
+            os.replace(self.tmp_path, self.cache._path(self.prefix, self.key))
+        except OSError:
+            self.discard()
+            return False
+        self.committed = True
+        self.cache._filled(self.size, self.header_size + self.size)
+        return True
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class DiskCache:
+    def __init__(self, directory: str, max_bytes: int, max_entry_bytes: Optional[int] = None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 10
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def _path(self, prefix, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return os.path.join(self.directory, f'{prefix}-{digest}{SUFFIX}')
+
+    def get(self, prefix, key: str) -> Optional[Tuple[Dict, bytes]]:
+        """(metadata, content) of an entry, or None on a miss."""
+        opened = self.open(prefix, key)
+        if opened is None:
+            return None
+        meta, f = opened
+        with f:
+            return meta, f.read()
+
+    def open(self, prefix, key: str) -> Optional[Tuple[Dict, BinaryIO]]:
+        """(metadata, file positioned at the content) of an entry, or None on
+        a miss. The caller closes the file; an entry evicted meanwhile stays
+        readable through it."""
+        path = self._path(prefix, key)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            meta = json.loads(f.readline())
+            os.utime(path)
+        except (OSError, ValueError):
+            meta = {}
+        if meta.get('key') != key:
+            f.close()
+            self.misses += 1
+            return None
+        self.hits += 1
+        return meta, f
+
+    def put(self, prefix, key: str, content: bytes, **meta) -> bool:
+        """Store an entry; entries over max_entry_bytes are skipped."""
+        if len(content) > self.max_entry_bytes:
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        header = json.dumps({**meta, 'key': key, 'size': len(content)}).encode() + b'\n'
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(content)
+            os.replace(tmp_path, self._path(prefix, key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self._filled(len(content), len(header) + len(content))
+        return True
+
+    def writer(self, prefix, key: str, **meta) -> EntryWriter:
+        """Incremental put(): write() chunks, then commit() or discard()."""
+        return EntryWriter(self, prefix, key, meta)
+
+    def _filled(self, size: int, file_size: int):
+        stats = self._bump_stats(fills=1, filled_bytes=size, total_bytes=file_size)
+        # No scan yet (a new or pre-existing directory): the total is unknown
+        if 'scanned_at' not in stats or stats['total_bytes'] > self.max_bytes:
+            self.evict()
+
+    def delete(self, prefix, keep_key: Optional[str] = None) -> int:
+        """Remove every entry of `prefix` (except `keep_key`). Returns files removed."""
+        keep = os.path.basename(self._path(prefix, keep_key)) if keep_key else None
+        removed = removed_bytes = 0
+        for entry in self._entries():
+            if entry.name.startswith(f'{prefix}-') and entry.name != keep:
+                try:
+                    size = entry.stat().st_size
+                except FileNotFoundError:
+                    continue
+                if self._remove(entry.path):
+                    removed += 1
+                    removed_bytes += size
+        if removed_bytes:
+            self._bump_stats(total_bytes=-removed_bytes)
+        return removed
+
+    def _entries(self):
+        try:
+            return [entry for entry in os.scandir(self.directory) if entry.name.endswith(SUFFIX)]
+        except FileNotFoundError:
+            return []
+
+    @staticmethod
+    def _remove(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            # Evicted by another worker
+            return 0
+
+    def usage(self) -> Tuple[int, int]:
+        """(entries, bytes) currently stored."""
+        sizes = []
+        for entry in self._entries():
+            try:
+                sizes.append(entry.stat().st_size)
+            except FileNotFoundError:
+                pass
+        return len(sizes), sum(sizes)
+
+    def evict(self, target_bytes: Optional[int] = None) -> int:
+        """Delete least recently used entries until the cache fits, and reset the
+        running total to the bytes left on disk. Returns files removed."""
+        stats = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            stats.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in stats)
+        if target_bytes is None:
+            target_bytes = total if total <= self.max_bytes else int(self.max_bytes * 0.9)
+        removed = removed_bytes = 0
+        for _, size, path in sorted(stats):
+            if total <= target_bytes:
+                break
+            if self._remove(path):
+                removed += 1
+                removed_bytes += size
+            total -= size
+        values = {'total_bytes': total, 'scanned_at': time.time()}
+        if removed:
+            values['last_eviction_at'] = values['scanned_at']
+            self._bump_stats(values, evictions=removed, evicted_bytes=removed_bytes)
+        else:
+            self._bump_stats(values)
+        return removed
+
+    def clear(self) -> int:
+        return self.evict(target_bytes=0)
+
+    # ========================================
+    # Stats
+    # ========================================
+
+    def _read_stats(self) -> Dict:
+        try:
+            with open(os.path.join(self.directory, STATS_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _bump_stats(self, values: Optional[Dict] = None, **deltas: int) -> Dict:
+        """Add to the shared counters (and set `values`); locked across workers
+        where flock exists. Returns the updated stats, or {} on failure."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with self._stats_lock, open(os.path.join(self.directory, STATS_FILE + '.lock'), 'w') as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                stats = self._read_stats()
+                for name, delta in deltas.items():
+                    stats[name] = stats.get(name, 0) + delta
+                stats.update(values or {})
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(stats, f)
+                os.replace(tmp_path, os.path.join(self.directory, STATS_FILE))
+                return stats
+        except OSError:
+            return {}
+
+    def stats(self) -> Dict:
+        """Disk usage, shared fill/eviction totals and this process's hits and misses."""
+        entries, size = self.usage()
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'max_entry_bytes': self.max_entry_bytes,
+            'fills': 0,
+            'filled_bytes': 0,
+            'evictions': 0,
+            'evicted_bytes': 0,
+            'last_eviction_at': None,
+            **self._read_stats(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
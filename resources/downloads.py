@@ -0,0 +1,278 @@
+"""Serving uploaded resource files from storage.
+DOWNLOAD_STRATEGY picks how bytes reach the browser once the view has
+checked access:
+- 'stream' pipes DOWNLOAD_CHUNK_SIZE chunks over the shared pooled HTTP
+  session (papertrail.http_client), so a large PDF costs a worker one
+  chunk of RSS. Range, If-None-Match and If-Range are forwarded and
+  Content-Length, Content-Range and ETag passed back, so browsers can
+  resume downloads and revalidate.
+- 'redirect' sends public, verified files straight to storage with a
+  short-lived URL carrying the download filename, so no worker time is
+  spent on the bytes; other files are streamed.
+- 'proxy' reads the whole file and returns it in one response.
+With STORAGE_CACHE_MAX_BYTES set, 'stream' and 'proxy' first look in the
+local storage cache (resources.storage_cache) and send hits with
+FileResponse; streamed misses are written to the cache on the way out.
+serve_bytes() answers conditional and Range requests for small content
+loaded in memory (e.g. cached previews).
+"""
+import re
+from typing import Callable, Optional, Tuple
+from urllib.parse import quote, urlencode, urlparse
+
+import requests
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header
+
+from papertrail.http_client import IDENTITY_ENCODING, get_session
+
+from . import storage_cache
+from .supabase_storage import supabase_storage
+
+__all__ = [
+    "STRATEGIES",
+    "download_filename",
+    "counts_as_download",
+    "get_strategy",
+    "redirect_url",
+    "redirect_file",
+    "cached_file",
+    "stream_file",
+    "proxy_file",
+    "serve_bytes",
+]
+
+STRATEGIES = ['proxy', 'stream', 'redirect']
+
+# Client request headers forwarded to storage
+FORWARDED_REQUEST_HEADERS = ['Range', 'If-Range', 'If-None-Match', 'If-Modified-Since']
+# Storage response headers passed back to the client
+FORWARDED_RESPONSE_HEADERS = ['Content-Length', 'Content-Range', 'ETag', 'Last-Modified', 'Accept-Ranges']
+
+EXTENSIONS = {
+    'pdf': '.pdf',
+    'ppt': '.ppt',
+    'pptx': '.pptx',
+    'docx': '.docx',
+    'txt': '.txt',
+    'image': '.jpg',
+    'link': '',
+}
+
+def download_filename(resource) -> str:
+    """Name the browser saves the file as: the uploaded name when known."""
+    if resource.original_filename and resource.original_filename.strip():
+        return resource.original_filename
+    path_parts = urlparse(resource.file_url).path.split('/')
+    filename_from_url = path_parts[-1] if path_parts else None
+    # Storage names are UUIDs; fall back to the title with the type's extension
+    if filename_from_url and len(filename_from_url) == 36 and filename_from_url.count('-') == 4:
+        return f"{resource.title}{EXTENSIONS.get(resource.resource_type, '')}"
+    return filename_from_url or f"{resource.title}.bin"
+
+
+def counts_as_download(request) -> bool:
+    """False for follow-up Range requests, so a resumed download counts once."""
+    range_header = request.headers.get('Range', '')
+    return not range_header or range_header.replace(' ', '').startswith('bytes=0-')
+
+
+def get_strategy(resource) -> str:
+    """Configured strategy; redirects only ever expose public, verified files."""
+    strategy = getattr(settings, 'DOWNLOAD_STRATEGY', 'stream')
+    if strategy not in STRATEGIES:
+        strategy = 'stream'
+    if strategy == 'redirect' and not (resource.is_public and resource.verification_status == 'verified'):
+        return 'stream'
+    return strategy
+
+
+def redirect_url(resource, filename: str) -> str:
+    """Storage URL that downloads the file as `filename`: signed for
+    DOWNLOAD_REDIRECT_EXPIRES seconds when the bucket client is configured,
+    else the public URL with storage's `download` override."""
+    signed = supabase_storage.signed_download_url(
+        resource.file_url, filename, getattr(settings, 'DOWNLOAD_REDIRECT_EXPIRES', 60)
+    )
+    if signed:
+        return signed
+    separator = '&' if urlparse(resource.file_url).query else '?'
+    return f"{resource.file_url}{separator}{urlencode({'download': filename}, quote_via=quote)}"
+
+
+def redirect_file(request, resource, filename: str) -> HttpResponse:
+    response = HttpResponseRedirect(redirect_url(resource, filename))
+    # The target expires, so the redirect itself must not be cached
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+def _chunks(upstream: requests.Response, chunk_size: int):
+    try:
+        yield from upstream.iter_content(chunk_size=chunk_size)
+    finally:
+        # Hands the connection back to the pool even if the client disconnects
+        upstream.close()
+
+
+def cached_file(request, resource, filename: str, as_attachment: bool = True) -> Optional[HttpResponse]:
+    """Response from the local storage cache (a 304 when the client's copy
+    is current), or None to fetch from storage."""
+    if not storage_cache.is_enabled() or 'Range' in request.headers:
+        return None
+    etag = storage_cache.current_etag(resource.file_url)
+    if etag is None:
+        return None
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+    else:
+        cached = storage_cache.open_file(resource.file_url, etag)
+        if cached is None:
+            return None
+        meta, f = cached
+        # Served with the server's sendfile where available (wsgi.file_wrapper)
+        response = FileResponse(f, as_attachment=as_attachment, filename=filename,
+                                content_type=meta.get('content_type', 'application/octet-stream'))
+    response['ETag'] = etag
+    return response
+
+
+def _cache_writer(request, upstream: requests.Response, resource):
+    """Cache entry writer for a complete 200 response that fits (else None),
+    and the ETag the cached copy is served with."""
+    if not storage_cache.is_enabled() or upstream.status_code != 200 or 'Range' in request.headers:
+        return None, None
+    size = int(upstream.headers.get('Content-Length') or 0)
+    if size > storage_cache.get_cache().max_entry_bytes:
+        return None, None
+    content_type = upstream.headers.get('Content-Type', 'application/octet-stream')
+    etag = storage_cache.content_etag(resource.file_url)
+    if etag:
+        return storage_cache.writer_for(resource.file_url, etag, content_type, immutable=True), etag
+    etag = upstream.headers.get('ETag')
+    if not etag:
+        return None, None
+    storage_cache.remember_etag(resource.file_url, etag)
+    return storage_cache.writer_for(resource.file_url, etag, content_type), etag
+
+
+def stream_file(request, resource, filename: str, as_attachment: bool = True) -> Optional[HttpResponse]:
+    """Streaming response for a resource's stored file (from the local cache
+    when it holds it), or None when storage does not return it."""
+    response = cached_file(request, resource, filename, as_attachment)
+    if response is not None:
+        return response
+    headers = {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+    headers.update(IDENTITY_ENCODING)
+    upstream = get_session().get(
+        resource.file_url,
+        headers=headers,
+        stream=True,
+        timeout=(getattr(settings, 'DOWNLOAD_CONNECT_TIMEOUT', 5), getattr(settings, 'DOWNLOAD_READ_TIMEOUT', 30)),
+    )
+
+    etag = None
+    if upstream.status_code in (304, 416):
+        upstream.close()
+        response = HttpResponse(status=upstream.status_code)
+    elif upstream.status_code in (200, 206):
+        chunks = _chunks(upstream, getattr(settings, 'DOWNLOAD_CHUNK_SIZE', 64 * 1024))
+        writer, etag = _cache_writer(request, upstream, resource)
+        if writer is not None:
+            chunks = storage_cache.tee(chunks, writer)
+        response = StreamingHttpResponse(
+            chunks,
+            status=upstream.status_code,
+            content_type=upstream.headers.get('Content-Type', 'application/octet-stream'),
+        )
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    else:
+        upstream.close()
+        return None
+
+    # A storage that encodes anyway: the body is decoded, so its length is unknown
+    encoded = upstream.headers.get('Content-Encoding', 'identity') != 'identity'
+    for name in FORWARDED_RESPONSE_HEADERS:
+        if name in upstream.headers and not (encoded and name == 'Content-Length'):
+            response[name] = upstream.headers[name]
+    if etag:
+        # The ETag cache hits are served with
+        response['ETag'] = etag
+    return response
+
+
+def proxy_file(request, resource, filename: str) -> Optional[HttpResponse]:
+    """Whole-file response for a resource's stored file (from the local cache
+    when it holds it), or None when storage does not return it."""
+    response = cached_file(request, resource, filename)
+    if response is not None:
+        return response
+    upstream = get_session().get(
+        resource.file_url,
+        headers=IDENTITY_ENCODING,
+        timeout=(getattr(settings, 'DOWNLOAD_CONNECT_TIMEOUT', 5), getattr(settings, 'DOWNLOAD_READ_TIMEOUT', 30)),
+    )
+    if upstream.status_code != 200:
+        return None
+    writer, _ = _cache_writer(request, upstream, resource)
+    if writer is not None:
+        writer.write(upstream.content)
+        writer.commit()
+    response = HttpResponse(upstream.content, content_type=upstream.headers.get('Content-Type', 'application/octet-stream'))
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['Content-Length'] = len(upstream.content)
+    return response
+
+
+# ========================================
+# In-memory content
+# ========================================
+
+def _byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single-range header; None to send the whole
+    body; (-1, -1) when the range cannot be satisfied."""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        # Malformed or multi-range: ignore the header, as RFC 9110 allows
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first, last = int(first), min(int(last), size - 1) if last else size - 1
+    if first >= size or first > last:
+        return -1, -1
+    return first, last
+
+
+def serve_bytes(request, load: Callable[[], Tuple[str, bytes]], etag: str, filename: str,
+                max_age: int = 0) -> HttpResponse:
+    """Inline response honouring If-None-Match and Range. load() returns
+    (content type, content) and is skipped for 304s; `etag` must change
+    whenever the content does."""
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=304)
+    else:
+        content_type, content = load()
+        size = len(content)
+        byte_range = None
+        if 'Range' in request.headers and request.headers.get('If-Range', etag) == etag:
+            byte_range = _byte_range(request.headers['Range'], size)
+        if byte_range == (-1, -1):
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range:
+            first, last = byte_range
+            response = HttpResponse(content[first:last + 1], status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = content_disposition_header(False, filename)
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    # Access is checked per user, so only the browser may cache; ETag revalidates after max_age
+    patch_cache_control(response, private=True, max_age=max_age)
+    return response
@@ -0,0 +1,191 @@
+"""Text extraction for uploaded resource files.
+Each file is downloaded and parsed once, off the request path, in a small
+thread pool; the text is stored in ResourceText and copied into the search
+index. Downloads are read in DOWNLOAD_CHUNK_SIZE chunks and files over
+TEXT_EXTRACTION_MAX_BYTES are skipped, so a worker never holds more than
+that. `manage.py extract_resource_text` backfills or retries from the shell.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from papertrail.http_client import get_session
+
+from .models import Resource, ResourceText
+
+__all__ = [
+    "EXTRACTORS",
+    "FileTooLarge",
+    "extract_text",
+    "needs_extraction",
+    "schedule_extraction",
+    "extract_resource_text",
+]
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+_executor = None
+
+
+class FileTooLarge(Exception):
+    """The file is over TEXT_EXTRACTION_MAX_BYTES, so its text is not extracted."""
+
+
+# ========================================
+# Extractors (bytes -> text)
+# ========================================
+
+def _extract_txt(content: bytes) -> str:
+    return content.decode('utf-8', errors='ignore')
+
+
+def _extract_docx(content: bytes) -> str:
+    from docx import Document
+
+    doc = Document(io.BytesIO(content))
+    text_content = [para.text for para in doc.paragraphs if para.text.strip()]
+    for table in doc.tables:
+        for row in table.rows:
+            text_content.append(' | '.join(cell.text.strip() for cell in row.cells))
+    return '\n'.join(text_content)
+
+
+def _extract_pptx(content: bytes) -> str:
+    from pptx import Presentation
+
+    prs = Presentation(io.BytesIO(content))
+    slide_texts = []
+    for slide_num, slide in enumerate(prs.slides, 1):
+        slide_text = [shape.text for shape in slide.shapes if hasattr(shape, 'text') and shape.text.strip()]
+        if slide_text:
+            slide_texts.append(f"--- Slide {slide_num} ---\n" + '\n'.join(slide_text))
+    return '\n\n'.join(slide_texts)
+
+
+def _extract_pdf(content: bytes) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    pages = [(page.extract_text() or '').strip() for page in reader.pages]
+    return '\n\n'.join(page for page in pages if page)
+
+
+EXTRACTORS: Dict[str, Callable[[bytes], str]] = {
+    'txt': _extract_txt,
+    'docx': _extract_docx,
+    'pptx': _extract_pptx,
+    'pdf': _extract_pdf,
+}
+
+
+def extract_text(resource_type: str, content: bytes) -> Optional[str]:
+    """Text of a file's content, or None when the type has no extractor."""
+    extractor = EXTRACTORS.get(resource_type)
+    if extractor is None:
+        return None
+    return extractor(content)
+
+
+# ========================================
+# Pipeline
+# ========================================
+
+def needs_extraction(resource: Resource) -> bool:
+    """True when the resource has a file whose text has not been extracted yet."""
+    if not resource.file_url or resource.resource_type not in EXTRACTORS:
+        return False
+    return not ResourceText.objects.filter(resource=resource, source_url=resource.file_url).exists()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'TEXT_EXTRACTION_WORKERS', 2),
+            thread_name_prefix='text-extraction',
+        )
+    return _executor
+
+
+def _run_in_thread(resource_id: int):
+    try:
+        extract_resource_text(resource_id)
+    except Exception as e:
+        logger.error(f'Text extraction for Resource {resource_id} failed: {e}', exc_info=True)
+    finally:
+        close_old_connections()
+
+
+def schedule_extraction(resource: Resource):
+    """Queue extraction once the current transaction commits."""
+    fields = {'source_url': resource.file_url, 'status': 'pending', 'error': '', 'attempts': 0}
+    # UPDATE before INSERT avoids SQLite's read-to-write lock upgrade while extraction threads write
+    if not ResourceText.objects.filter(resource=resource).update(**fields):
+        ResourceText.objects.create(resource=resource, **fields)
+    resource_id = resource.pk
+    transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, resource_id))
+
+
+def _download(url: str) -> bytes:
+    """A file's content, read in chunks up to TEXT_EXTRACTION_MAX_BYTES."""
+    max_bytes = getattr(settings, 'TEXT_EXTRACTION_MAX_BYTES', 20 * 1024 * 1024)
+    too_large = FileTooLarge(f'File is larger than {max_bytes} bytes')
+    response = get_session().get(url, stream=True, timeout=getattr(settings, 'TEXT_EXTRACTION_TIMEOUT', 60))
+    try:
+        response.raise_for_status()
+        if int(response.headers.get('Content-Length') or 0) > max_bytes:
+            raise too_large
+        content = bytearray()
+        for chunk in response.iter_content(chunk_size=getattr(settings, 'DOWNLOAD_CHUNK_SIZE', 64 * 1024)):
+            content += chunk
+            if len(content) > max_bytes:
+                raise too_large
+        return bytes(content)
+    finally:
+        response.close()
+
+
+def extract_resource_text(resource_id: int) -> Optional[ResourceText]:
+    """Download, parse and store one resource's text, then refresh its search
+    document. Returns the ResourceText row (None if the resource is gone)."""
+    from accounts import search
+
+    resource = Resource.objects.select_related('uploader').filter(pk=resource_id).first()
+    if resource is None or not resource.file_url:
+        return None
+    source_url = resource.file_url
+    record, _ = ResourceText.objects.get_or_create(resource=resource, defaults={'source_url': source_url})
+    record.attempts += 1
+
+    error = ''
+    try:
+        text = extract_text(resource.resource_type, _download(source_url))
+    except FileTooLarge as e:
+        # Skipped for good: recorded as unsupported, so backfills do not retry it
+        text, error = None, str(e)
+    except Exception as e:
+        record.status = 'failed'
+        record.error = str(e)
+        record.save(update_fields=['status', 'error', 'attempts'])
+        logger.warning(f'Could not extract text from Resource {resource_id}: {e}')
+        return record
+
+    max_chars = getattr(settings, 'TEXT_EXTRACTION_MAX_CHARS', 200000)
+    record.source_url = source_url
+    record.text = (text or '')[:max_chars]
+    record.status = 'unsupported' if text is None else 'done'
+    record.error = error
+    record.extracted_at = timezone.now()
+    with transaction.atomic():
+        # The file may have been replaced while we were downloading
+        if Resource.objects.filter(pk=resource_id, file_url=source_url).exists():
+            record.save()
+            search.index_object(resource)
+    return record
@@ -14,6 +14,9 @@ class ResourceUploadForm(forms.ModelForm):
         })
     )
     
+    # Set by the upload page after sending the file straight to storage
+    upload_ticket = forms.CharField(required=False, widget=forms.HiddenInput())
+    
     tags = forms.ModelMultipleChoiceField(
         queryset=Tag.objects.all(),
         required=False,
@@ -53,6 +56,7 @@ class ResourceUploadForm(forms.ModelForm):
         """Validate that either file or external URL is provided"""
         cleaned_data = super().clean()
         file = cleaned_data.get('file')
+        upload_ticket = cleaned_data.get('upload_ticket')
         external_url = cleaned_data.get('external_url')
         # If editing an existing resource that already has content (file_url or external_url),
         # allow submitting without providing these again.
@@ -66,7 +70,7 @@ class ResourceUploadForm(forms.ModelForm):
             external_url = None
         
         # At least one must be provided when creating new resources
-        if not file and not external_url and not has_existing_content:
+        if not file and not upload_ticket and not external_url and not has_existing_content:
             raise forms.ValidationError(
                 'Please either upload a file or provide an external URL.'
             )
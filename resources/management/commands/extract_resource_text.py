@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Q
+
+from resources import extraction
+from resources.models import Resource, ResourceText
+
+
+class Command(BaseCommand):
+    help = 'Extract searchable text from uploaded resource files (backfill or retry)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-extract every file, even if already done')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry failed extractions')
+        parser.add_argument('--resource', type=int, help='Only this resource id')
+
+    def handle(self, *args, **options):
+        resources = Resource.objects.filter(
+            file_url__isnull=False, resource_type__in=list(extraction.EXTRACTORS),
+        ).exclude(file_url='')
+        if options['resource']:
+            resources = resources.filter(pk=options['resource'])
+
+        if not options['all']:
+            # Missing, stale (file replaced) or still pending from a lost thread
+            statuses = ['done', 'unsupported']
+            if not options['retry_failed']:
+                statuses.append('failed')
+            finished = ResourceText.objects.filter(
+                resource=OuterRef('pk'), source_url=OuterRef('file_url'), status__in=statuses,
+            )
+            failed_too_often = Q(extracted_text__status='failed',
+                                 extracted_text__attempts__gte=extraction.MAX_ATTEMPTS)
+            resources = resources.exclude(Exists(finished))
+            if options['retry_failed']:
+                resources = resources.exclude(failed_too_often)
+
+        counts = {'done': 0, 'unsupported': 0, 'failed': 0}
+        for resource_id in resources.order_by('pk').values_list('pk', flat=True):
+            record = extraction.extract_resource_text(resource_id)
+            if record is None:
+                continue
+            counts[record.status] = counts.get(record.status, 0) + 1
+            if record.status == 'failed':
+                self.stdout.write(self.style.WARNING(f'Resource {resource_id}: {record.error}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Extracted {counts['done']} files ({counts['unsupported']} unsupported, {counts['failed']} failed)"
+        ))
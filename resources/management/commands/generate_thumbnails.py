@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from resources import thumbnails
+from resources.models import Resource
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnails of uploaded images, PDFs and slides (backfill or retry)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every file, even if it has a thumbnail')
+        parser.add_argument('--resource', type=int, help='Only this resource id')
+
+    def handle(self, *args, **options):
+        resources = Resource.objects.filter(
+            file_url__isnull=False, resource_type__in=list(thumbnails.RENDERERS),
+        ).exclude(file_url='')
+        if options['resource']:
+            resources = resources.filter(pk=options['resource'])
+        if not options['all']:
+            # Never rendered, or rendered from a file that has since been replaced
+            resources = resources.filter(Q(thumbnail_source_url__isnull=True) | ~Q(thumbnail_source_url=F('file_url')))
+
+        counts = {'done': 0, 'none': 0, 'failed': 0}
+        for resource_id in resources.order_by('pk').values_list('pk', flat=True):
+            try:
+                thumbnail_url = thumbnails.generate_thumbnail(resource_id, force=options['all'])
+            except Exception as e:
+                counts['failed'] += 1
+                self.stdout.write(self.style.WARNING(f'Resource {resource_id}: {e}'))
+                continue
+            counts['done' if thumbnail_url else 'none'] += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {counts['done']} thumbnails ({counts['none']} files with nothing to show, {counts['failed']} failed)"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from resources import unique_viewers
+from resources.models import ResourceViewSketch
+
+
+class Command(BaseCommand):
+    help = 'Delete per-day unique viewer sketches older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep this many days (default UNIQUE_VIEWER_RETENTION_DAYS)')
+
+    def handle(self, *args, **options):
+        deleted = unique_viewers.prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} view sketches ({ResourceViewSketch.objects.count()} remaining)'
+        ))
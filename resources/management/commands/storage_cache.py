@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from resources import storage_cache
+from resources.models import Resource
+
+
+class Command(BaseCommand):
+    help = 'Inspect, warm or purge the local on-disk cache of stored files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['stats', 'warm', 'purge'])
+        parser.add_argument('--resource', type=int, help='Only this resource id')
+        parser.add_argument('--limit', type=int, default=50,
+                            help='warm: the most downloaded N public, verified files (default 50)')
+
+    def handle(self, *args, **options):
+        if options['action'] != 'stats' and not storage_cache.is_enabled():
+            raise CommandError('The storage cache is disabled (STORAGE_CACHE_MAX_BYTES is 0)')
+        getattr(self, f"handle_{options['action']}")(options)
+
+    def _resources(self, options):
+        resources = Resource.objects.filter(file_url__isnull=False).exclude(file_url='')
+        if options['resource']:
+            return resources.filter(pk=options['resource'])
+        return resources
+
+    def handle_stats(self, options):
+        stats = storage_cache.get_cache().stats()
+        mb = 1024 * 1024
+        self.stdout.write(f"Directory:  {storage_cache.get_cache().directory}")
+        self.stdout.write(f"Entries:    {stats['entries']} ({stats['bytes'] / mb:.1f} of {stats['max_bytes'] / mb:.0f} MB)")
+        self.stdout.write(f"Filled:     {stats['fills']} files ({stats['filled_bytes'] / mb:.1f} MB)")
+        self.stdout.write(f"Evicted:    {stats['evictions']} files ({stats['evicted_bytes'] / mb:.1f} MB)")
+        if stats['last_eviction_at']:
+            self.stdout.write(f"Last evict: {datetime.fromtimestamp(stats['last_eviction_at']):%Y-%m-%d %H:%M:%S}")
+        self.stdout.write(self.style.SUCCESS('OK'))
+
+    def handle_warm(self, options):
+        resources = self._resources(options)
+        if not options['resource']:
+            resources = resources.filter(is_public=True, verification_status='verified').order_by('-download_count')
+            resources = resources[:options['limit']]
+        cached = failed = 0
+        for resource_id, file_url in resources.values_list('pk', 'file_url'):
+            try:
+                if storage_cache.warm(file_url):
+                    cached += 1
+                    continue
+                reason = 'not cacheable (no ETag, missing or too large)'
+            except Exception as e:
+                reason = str(e)
+            failed += 1
+            self.stdout.write(self.style.WARNING(f'Resource {resource_id}: {reason}'))
+        self.stdout.write(self.style.SUCCESS(f'{cached} files cached ({failed} skipped)'))
+
+    def handle_purge(self, options):
+        if options['resource']:
+            removed = sum(storage_cache.purge(url) for url in self._resources(options).values_list('file_url', flat=True))
+        else:
+            removed = storage_cache.purge()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} cached files'))
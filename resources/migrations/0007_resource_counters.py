@@ -0,0 +1,61 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:26
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Counter field -> model counted (all reference Resource through `resource`)
+COUNTED = {
+    'rating_count': 'Rating',
+    'likes_count': 'Like',
+    'bookmarks_count': 'Bookmark',
+    'comments_count': 'Comment',
+}
+
+
+def _total(model, aggregate):
+    rows = model.objects.filter(resource=OuterRef('pk')).order_by().values('resource')
+    return Coalesce(Subquery(rows.annotate(total=aggregate).values('total')[:1]), Value(0),
+                    output_field=IntegerField())
+
+
+def backfill_counters(apps, schema_editor):
+    counts = {field: _total(apps.get_model('resources', name), Count('pk')) for field, name in COUNTED.items()}
+    counts['rating_sum'] = _total(apps.get_model('resources', 'Rating'), Sum('stars'))
+    apps.get_model('resources', 'Resource').objects.update(**counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0006_resourcetext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='bookmarks_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
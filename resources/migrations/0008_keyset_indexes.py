@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0007_resource_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='resources_b_user_id_d4253b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['is_public', 'verification_status', 'created_at', 'id'], name='resources_r_is_publ_d75d01_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['uploader', 'created_at', 'id'], name='resources_r_uploade_0f344f_idx'),
+        ),
+    ]
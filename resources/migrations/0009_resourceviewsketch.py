@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0008_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceViewSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_sketches', to='resources.resource')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='resources_r_day_2ca251_idx')],
+                'unique_together': {('resource', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0009_resourceviewsketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='thumbnail_source_url',
+            field=models.URLField(blank=True, help_text='file_url the thumbnail was rendered from', null=True),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='thumbnail_url',
+            field=models.URLField(blank=True, help_text='WebP thumbnail rendered after upload (see resources.thumbnails)', null=True),
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 
+from accounts.counters import CountersMixin
+
 User = get_user_model()
 
 class Tag(models.Model):
@@ -10,7 +12,7 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
-class Resource(models.Model):
+class Resource(CountersMixin, models.Model):
     """Resources uploaded by users"""
     
     RESOURCE_TYPES = [
@@ -42,6 +44,8 @@ class Resource(models.Model):
     external_url = models.URLField(blank=True, null=True, help_text='External link URL')
     original_filename = models.CharField(max_length=255, blank=True)
     file_size = models.PositiveIntegerField(null=True, blank=True, help_text='File size in bytes')
+    thumbnail_url = models.URLField(blank=True, null=True, help_text='WebP thumbnail rendered after upload (see resources.thumbnails)')
+    thumbnail_source_url = models.URLField(blank=True, null=True, help_text='file_url the thumbnail was rendered from')
     
     # Metadata
     tags = models.ManyToManyField(Tag, blank=True, related_name='resources')
@@ -72,6 +76,13 @@ class Resource(models.Model):
     views_count = models.PositiveIntegerField(default=0)
     download_count = models.PositiveIntegerField(default=0)
     
+    # Engagement counters maintained by signals (see accounts/counters.py)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0)
+    bookmarks_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    
     def clean(self):
         """Validate that either file_url or external_url is provided, but not both"""
         # Handle N/A values in external_url
@@ -89,19 +100,30 @@ class Resource(models.Model):
             # Prefer file upload, ignore external URL
             self.external_url = None
     
+    # Written by resources.thumbnails, never by a (possibly stale) save()
+    WORKER_FIELDS = ('thumbnail_url', 'thumbnail_source_url')
+    
     def save(self, *args, **kwargs):
         self.clean()
         super().save(*args, **kwargs)
     
+    def get_thumbnail_url(self):
+        """Thumbnail of the current file, or None while it is missing or being regenerated"""
+        if self.thumbnail_url and self.thumbnail_source_url == self.file_url:
+            return self.thumbnail_url
+        return None
+    
     def increment_view_count(self):
-        """Increment view count"""
+        """Increment view count (written to the database by accounts.counter_buffer)"""
+        from accounts import counter_buffer
         self.views_count += 1
-        self.save(update_fields=['views_count'])
+        counter_buffer.add(Resource, self.pk, 'views_count')
     
     def increment_download_count(self):
-        """Increment download count"""
+        """Increment download count (written to the database by accounts.counter_buffer)"""
+        from accounts import counter_buffer
         self.download_count += 1
-        self.save(update_fields=['download_count'])
+        counter_buffer.add(Resource, self.pk, 'download_count')
     
     def get_verification_badge(self):
         """Return verification status badge"""
@@ -112,22 +134,94 @@ class Resource(models.Model):
         return 'pending'
     
     def get_average_rating(self):
-        """Calculate and return average rating"""
-        ratings = self.ratings.all()
-        if not ratings:
+        """Return average rating from the maintained rating counters"""
+        if not self.rating_count:
             return 0
-        total = sum(r.stars for r in ratings)
-        return round(total / len(ratings), 1)
+        return round(self.rating_sum / self.rating_count, 1)
     
     def get_rating_count(self):
         """Return total number of ratings"""
-        return self.ratings.count()
+        return self.rating_count
     
     def __str__(self):
         return self.title
     
     class Meta:
         ordering = ['-created_at']
+        # Keyset pagination walks (created_at, id) within these filters
+        indexes = [
+            models.Index(fields=['is_public', 'verification_status', 'created_at', 'id']),
+            models.Index(fields=['uploader', 'created_at', 'id']),
+        ]
+
+
+class ResourceText(models.Model):
+    """Text extracted once from an uploaded file (see resources.extraction).
+    Kept out of Resource so list queries never load document bodies."""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('unsupported', 'Unsupported'),
+        ('failed', 'Failed'),
+    ]
+    
+    resource = models.OneToOneField(Resource, on_delete=models.CASCADE, related_name='extracted_text')
+    source_url = models.URLField(blank=True, help_text='file_url the text was extracted from')
+    text = models.TextField(blank=True)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    extracted_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Text for {self.resource} ({self.status})"
+
+
+class ResourceViewSketch(models.Model):
+    """HyperLogLog registers of one resource's viewers on one day (see
+    resources.unique_viewers). Fixed size whatever the number of viewers."""
+    
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='view_sketches')
+    day = models.DateField()
+    registers = models.BinaryField()
+    
+    class Meta:
+        unique_together = ['resource', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+    
+    def __str__(self):
+        return f"Viewers of {self.resource_id} on {self.day}"
+
+
+class StoredFile(models.Model):
+    """One uploaded object in storage, found by the SHA-256 of its content
+    (see SupabaseStorage.upload_file). ref_count is the number of resources
+    pointing at it; the object is deleted when it drops to zero."""
+    
+    sha256 = models.CharField(max_length=64, unique=True)
+    object_path = models.CharField(max_length=500)
+    file_url = models.URLField(max_length=500, db_index=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.object_path} ({self.ref_count} refs)"
+
+
+class DirectUploadClaim(models.Model):
+    """A direct upload that has been confirmed (see resources.direct_uploads).
+    The unique path makes confirming a ticket a one-time claim, also when two
+    confirms race; rows are pruned once their ticket can no longer be read."""
+    
+    object_path = models.CharField(max_length=500, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"Claim on {self.object_path}"
 
 class Bookmark(models.Model):
     """User bookmarks for resources"""
@@ -138,6 +232,9 @@ class Bookmark(models.Model):
     class Meta:
         unique_together = ['user', 'resource']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id']),
+        ]
 
 
 class Rating(models.Model):
@@ -0,0 +1,123 @@
+"""Previews of uploaded resource files, cached on local disk.
+A preview (the text of a document, or the bytes of an image or PDF) is
+built once per stored file and kept in a DiskCache keyed by resource id and
+file_url, so repeat previews cost a disk read instead of a storage fetch
+and a parse. Replacing a file changes file_url, and the Resource signals
+drop that resource's old entries. Images and PDFs are sent as raw bytes by
+the preview file endpoint; files too large to cache are streamed instead.
+"""
+import hashlib
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+from papertrail.http_client import get_session
+
+from . import extraction
+from .disk_cache import DiskCache
+from .models import ResourceText
+
+__all__ = [
+    "PREVIEW_TYPES",
+    "FILE_PREVIEW_TYPES",
+    "PreviewError",
+    "get_cache",
+    "get_preview",
+    "preview_etag",
+    "is_cacheable",
+    "invalidate",
+]
+
+TEXT_TYPES = ('txt', 'docx', 'pptx')
+# Previewed as raw bytes by resource_preview_file
+FILE_PREVIEW_TYPES = ('image', 'pdf')
+PREVIEW_TYPES = TEXT_TYPES + FILE_PREVIEW_TYPES
+# Characters of document text shown in a preview
+PREVIEW_TEXT_LENGTH = 10000
+TRUNCATED_NOTE = '\n\n... (truncated, download to see full content)'
+
+_cache = None
+
+
+class PreviewError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def get_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(
+            settings.PREVIEW_CACHE_DIR,
+            max_bytes=getattr(settings, 'PREVIEW_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+            max_entry_bytes=getattr(settings, 'PREVIEW_CACHE_MAX_ENTRY_BYTES', 10 * 1024 * 1024),
+        )
+    return _cache
+
+
+def _truncate(text: str) -> str:
+    if len(text) > PREVIEW_TEXT_LENGTH:
+        return text[:PREVIEW_TEXT_LENGTH] + TRUNCATED_NOTE
+    return text
+
+
+def _build(resource) -> Tuple[Dict, bytes]:
+    """Fetch and render a preview: (metadata, content)."""
+    if resource.resource_type in TEXT_TYPES:
+        # Text extracted at upload time saves the download
+        stored = ResourceText.objects.filter(
+            resource=resource, source_url=resource.file_url, status='done'
+        ).values_list('text', flat=True).first()
+        if stored is not None:
+            return {'type': 'text'}, _truncate(stored).encode()
+
+    response = get_session().get(resource.file_url, timeout=getattr(settings, 'DOWNLOAD_READ_TIMEOUT', 30))
+    if response.status_code != 200:
+        raise PreviewError('File not found on storage server.', status=404)
+
+    if resource.resource_type in TEXT_TYPES:
+        try:
+            text = extraction.extract_text(resource.resource_type, response.content)
+        except Exception as e:
+            label = 'text' if resource.resource_type == 'txt' else resource.resource_type.upper()
+            raise PreviewError(f'Could not read {label} file: {str(e)}')
+        return {'type': 'text'}, _truncate(text or '').encode()
+
+    default_mime = 'application/pdf' if resource.resource_type == 'pdf' else 'image/jpeg'
+    meta = {
+        'type': resource.resource_type,
+        'mime_type': response.headers.get('Content-Type', default_mime),
+        'etag': response.headers.get('ETag', ''),
+    }
+    return meta, response.content
+
+
+def get_preview(resource) -> Tuple[Dict, bytes]:
+    """(metadata, content) of a resource's preview, from the cache when possible.
+    metadata['type'] is 'text' (content is UTF-8), 'image' or 'pdf'."""
+    if resource.resource_type not in PREVIEW_TYPES:
+        raise PreviewError(f'Preview not available for {resource.resource_type} files.')
+    cached = get_cache().get(resource.pk, resource.file_url)
+    if cached is not None:
+        return cached
+    meta, content = _build(resource)
+    get_cache().put(resource.pk, resource.file_url, content, **meta)
+    return meta, content
+
+
+def preview_etag(resource) -> str:
+    """Strong ETag of a preview; stored files are never rewritten in place,
+    so it only changes when file_url does."""
+    return '"%s"' % hashlib.sha256(f'{resource.pk}:{resource.file_url}'.encode()).hexdigest()[:32]
+
+
+def is_cacheable(resource) -> bool:
+    """False for files known to be larger than a cache entry may be."""
+    return resource.file_size is None or resource.file_size <= get_cache().max_entry_bytes
+
+
+def invalidate(resource_id: int, file_url: Optional[str] = None) -> int:
+    """Drop a resource's cached previews, except the one for `file_url`."""
+    return get_cache().delete(resource_id, keep_key=file_url)
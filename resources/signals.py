@@ -1,17 +1,25 @@
 """
 Signals for Resource app notifications
 Handles: new uploads, verification status changes, ratings, and comments
+Also keeps the global search index, engagement scores, counters, cached viewer state, file previews and the local storage cache in sync, releases stored files and schedules file text extraction and thumbnails
 """
-from django.db.models.signals import post_save, pre_save
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Resource, Rating, Comment
-from accounts.models import Notification
+from .models import Resource, Rating, Comment, Like, Bookmark, StoredFile
+from accounts.notification_queue import enqueue_notification, enqueue_broadcast
+from accounts import counters, ranking, search, viewer_state
+from . import extraction, previews, storage_cache, thumbnails
+from .supabase_storage import supabase_storage
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Resource)
@@ -23,43 +31,30 @@ def notify_new_resource_upload(sender, instance, created, **kwargs):
     """
     if created:
         try:
-            # Notify students if public
+            url = reverse('resources:resource_detail', args=[instance.id])
+
+            # Notify students if public (delivered by the notification worker)
             if instance.is_public:
-                # Get all users except the uploader
-                students = User.objects.filter(is_professor=False).exclude(id=instance.uploader.id)
-                
-                # Create bulk notifications for students
-                notifications = [
-                    Notification(
-                        user=student,
-                        type='new_upload',
-                        message=f"New Resource uploaded: '{instance.title}' on {instance.created_at.strftime('%Y-%m-%d at %I:%M %p')}",
-                        url=reverse('resources:resource_detail', args=[instance.id]),
-                        related_object_type='resource',
-                        related_object_id=instance.id
-                    )
-                    for student in students
-                ]
-                Notification.objects.bulk_create(notifications)
+                enqueue_broadcast(
+                    audience='students',
+                    type='new_upload',
+                    message=f"New Resource uploaded: '{instance.title}' on {instance.created_at.strftime('%Y-%m-%d at %I:%M %p')}",
+                    url=url,
+                    sender=instance.uploader,
+                    related_object_type='resource',
+                    related_object_id=instance.id
+                )
             
             # Notify professors if pending review
             if instance.verification_status == 'pending':
-                professors = User.objects.filter(is_professor=True)
-                
-                # Create bulk notifications for professors
-                prof_notifications = [
-                    Notification(
-                        user=professor,
-                        type='content_review',
-                        message=f"New Resource submitted by {instance.uploader.get_display_name()} for review: '{instance.title}'",
-                        url=reverse('resources:resource_detail', args=[instance.id]),
-                        related_object_type='resource',
-                        related_object_id=instance.id
-                    )
-                    for professor in professors
-                ]
-                if prof_notifications:
-                    Notification.objects.bulk_create(prof_notifications)
+                enqueue_broadcast(
+                    audience='professors',
+                    type='content_review',
+                    message=f"New Resource submitted by {instance.uploader.get_display_name()} for review: '{instance.title}'",
+                    url=url,
+                    related_object_type='resource',
+                    related_object_id=instance.id
+                )
         except Exception as e:
             print(f"Failed to create upload notifications for Resource {instance.id}: {e}")
 
@@ -86,7 +81,7 @@ def notify_verification_status_change(sender, instance, **kwargs):
                         message = f"Your Resource '{instance.title}' was rejected. Please check for feedback or contact a moderator."
                         notif_type = 'verification_rejected'
                     
-                    Notification.objects.create(
+                    enqueue_notification(
                         user=instance.uploader,
                         type=notif_type,
                         message=message,
@@ -110,7 +105,7 @@ def notify_new_rating(sender, instance, created, **kwargs):
         # Don't notify if user rates their own content
         if instance.user.id != instance.resource.uploader.id:
             try:
-                Notification.objects.create(
+                enqueue_notification(
                     user=instance.resource.uploader,
                     type='new_rating',
                     message=f"Someone rated your Resource '{instance.resource.title}'.",
@@ -132,7 +127,7 @@ def notify_new_comment(sender, instance, created, **kwargs):
         # Don't notify if user comments on their own content
         if instance.user.id != instance.resource.uploader.id:
             try:
-                Notification.objects.create(
+                enqueue_notification(
                     user=instance.resource.uploader,
                     type='new_comment',
                     message=f"Someone commented on your Resource '{instance.resource.title}'.",
@@ -142,3 +137,190 @@ def notify_new_comment(sender, instance, created, **kwargs):
                 )
             except Exception as e:
                 print(f"Failed to create comment notification for Resource {instance.resource.id}: {e}")
+
+
+@receiver(post_save, sender=Resource)
+def index_resource_for_search(sender, instance, update_fields=None, **kwargs):
+    """Re-index the resource when its title or description may have changed."""
+    if search.should_reindex(update_fields):
+        try:
+            search.index_object(instance)
+        except Exception as e:
+            print(f"Failed to index Resource {instance.id} for search: {e}")
+
+
+@receiver(post_delete, sender=Resource)
+def remove_resource_from_search(sender, instance, **kwargs):
+    """Remove a deleted resource from the search index."""
+    try:
+        search.remove_object(instance)
+    except Exception as e:
+        print(f"Failed to remove Resource {instance.id} from search index: {e}")
+
+
+@receiver(post_save, sender=Resource)
+def schedule_resource_text_extraction(sender, instance, update_fields=None, **kwargs):
+    """Extract searchable text once per uploaded (or replaced) file, off the request path."""
+    if update_fields is not None and 'file_url' not in update_fields:
+        return
+    try:
+        if extraction.needs_extraction(instance):
+            extraction.schedule_extraction(instance)
+    except Exception as e:
+        print(f"Failed to schedule text extraction for Resource {instance.id}: {e}")
+
+
+@receiver(post_save, sender=Resource)
+def schedule_resource_thumbnail(sender, instance, update_fields=None, **kwargs):
+    """Render a thumbnail once per uploaded (or replaced) file, off the request path."""
+    if update_fields is not None and 'file_url' not in update_fields:
+        return
+    try:
+        if thumbnails.needs_thumbnail(instance):
+            thumbnails.schedule_thumbnail(instance)
+    except Exception as e:
+        print(f"Failed to schedule thumbnail for Resource {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Resource)
+def delete_resource_thumbnail(sender, instance, **kwargs):
+    """Remove the thumbnail from storage along with the resource."""
+    try:
+        thumbnails.delete_thumbnail(instance.thumbnail_url)
+    except Exception as e:
+        print(f"Failed to delete thumbnail for Resource {instance.id}: {e}")
+
+
+@receiver(post_save, sender=Resource)
+def drop_replaced_resource_previews(sender, instance, created, update_fields=None, **kwargs):
+    """Free cached previews of a file that has been replaced."""
+    if created or (update_fields is not None and 'file_url' not in update_fields):
+        return
+    try:
+        previews.invalidate(instance.pk, instance.file_url)
+    except Exception as e:
+        print(f"Failed to invalidate previews for Resource {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Resource)
+def drop_deleted_resource_previews(sender, instance, **kwargs):
+    try:
+        previews.invalidate(instance.pk)
+    except Exception as e:
+        print(f"Failed to invalidate previews for Resource {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Resource)
+def release_deleted_resource_file(sender, instance, **kwargs):
+    """Drop the resource's reference to its stored file however it was deleted
+    (views, admin, cascades, queryset deletes); the object goes after commit."""
+    if not instance.file_url:
+        return
+    try:
+        supabase_storage.release_file(instance.file_url)
+    except Exception as e:
+        logger.error(f"Failed to release the file of Resource {instance.id}: {e}", exc_info=True)
+
+
+@receiver(post_delete, sender=Resource)
+def drop_deleted_resource_from_storage_cache(sender, instance, **kwargs):
+    """Free the local cached copy of a file uploaded before deduplication once
+    its resource is deleted. Indexed files may be shared by other resources;
+    their copy goes with the StoredFile (below)."""
+    if not instance.file_url or StoredFile.objects.filter(file_url=instance.file_url).exists():
+        return
+    file_url = instance.file_url
+    transaction.on_commit(lambda: _purge_storage_cache(file_url))
+
+
+@receiver(post_delete, sender=StoredFile)
+def drop_deleted_file_from_storage_cache(sender, instance, **kwargs):
+    """Free the local cached copy of a file once nothing references it."""
+    file_url = instance.file_url
+    transaction.on_commit(lambda: _purge_storage_cache(file_url))
+
+
+def _purge_storage_cache(file_url):
+    try:
+        storage_cache.purge(file_url)
+    except Exception as e:
+        logger.error(f"Failed to purge storage cache for {file_url}: {e}", exc_info=True)
+
+
+@receiver(post_save, sender=Resource)
+def mark_resource_engagement_stale(sender, instance, update_fields=None, **kwargs):
+    """Queue a score refresh when counters or verification may have changed."""
+    if ranking.should_refresh(update_fields):
+        try:
+            ranking.mark_stale('resource', instance.pk)
+        except Exception as e:
+            print(f"Failed to mark engagement score stale for Resource {instance.id}: {e}")
+
+
+@receiver([post_save, post_delete], sender=Rating)
+@receiver([post_save, post_delete], sender=Like)
+def mark_resource_engagement_stale_on_feedback(sender, instance, **kwargs):
+    """Ratings and likes change the resource's engagement score."""
+    try:
+        ranking.mark_stale('resource', instance.resource_id)
+    except Exception as e:
+        print(f"Failed to mark engagement score stale for Resource {instance.resource_id}: {e}")
+
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_resource_rating(sender, instance, **kwargs):
+    counters.remember_stars(instance)
+
+
+@receiver(post_save, sender=Rating)
+def count_resource_rating(sender, instance, created, **kwargs):
+    """Keep Resource.rating_sum/rating_count in step with ratings."""
+    try:
+        counters.rating_saved(Resource, instance.resource_id, instance, created)
+    except Exception as e:
+        print(f"Failed to update rating counters for Resource {instance.resource_id}: {e}")
+
+
+@receiver(post_delete, sender=Rating)
+def uncount_resource_rating(sender, instance, **kwargs):
+    try:
+        counters.rating_deleted(Resource, instance.resource_id, instance)
+    except Exception as e:
+        print(f"Failed to update rating counters for Resource {instance.resource_id}: {e}")
+
+
+# Related model -> Resource counter it feeds
+RESOURCE_COUNTERS = {Like: 'likes_count', Bookmark: 'bookmarks_count', Comment: 'comments_count'}
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Bookmark)
+@receiver(post_save, sender=Comment)
+def count_resource_child(sender, instance, created, **kwargs):
+    """Count new likes, bookmarks, comments on the resource."""
+    if created:
+        try:
+            counters.increment(Resource, instance.resource_id, **{RESOURCE_COUNTERS[sender]: 1})
+        except Exception as e:
+            print(f"Failed to update {RESOURCE_COUNTERS[sender]} for Resource {instance.resource_id}: {e}")
+
+
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Bookmark)
+@receiver(post_delete, sender=Comment)
+def uncount_resource_child(sender, instance, **kwargs):
+    try:
+        counters.increment(Resource, instance.resource_id, **{RESOURCE_COUNTERS[sender]: -1})
+    except Exception as e:
+        print(f"Failed to update {RESOURCE_COUNTERS[sender]} for Resource {instance.resource_id}: {e}")
+
+
+@receiver([post_save, post_delete], sender=Rating)
+@receiver([post_save, post_delete], sender=Like)
+@receiver([post_save, post_delete], sender=Bookmark)
+def invalidate_resource_viewer_state(sender, instance, **kwargs):
+    """Drop the user's cached like/bookmark/rating state for list pages."""
+    try:
+        viewer_state.invalidate(instance.user_id)
+    except Exception as e:
+        print(f"Failed to invalidate viewer state for User {instance.user_id}: {e}")
@@ -0,0 +1,173 @@
+"""Local on-disk LRU cache of stored files, in front of storage downloads.
+Hot course files are downloaded many times a day; each copy used to be
+fetched from storage again. Files are now kept in a DiskCache under
+STORAGE_CACHE_DIR, keyed by object path and ETag, so every gunicorn worker
+on the host shares one copy and a changed object never serves stale bytes.
+Files indexed by StoredFile are content-addressed and never change, so
+their SHA-256 is the version and serves as the ETag with no request to
+storage. For older files a download asks storage for the object's ETag (a
+HEAD on the pooled connection, remembered for STORAGE_CACHE_ETAG_TTL
+seconds). Hits are sent
+with FileResponse, which hands the file to the server's sendfile, and
+misses are streamed as before while being teed into the cache. Range
+requests always go to storage. `manage.py storage_cache` shows stats and
+warms or purges the cache.
+"""
+import hashlib
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+
+from papertrail.http_client import IDENTITY_ENCODING, get_session
+
+from .disk_cache import DiskCache, EntryWriter
+from .supabase_storage import supabase_storage
+
+__all__ = [
+    "is_enabled",
+    "get_cache",
+    "remember_etag",
+    "content_etag",
+    "storage_etag",
+    "current_etag",
+    "open_file",
+    "writer_for",
+    "tee",
+    "warm",
+    "purge",
+]
+
+_cache = None
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'STORAGE_CACHE_MAX_BYTES', 0) > 0
+
+
+def get_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(
+            settings.STORAGE_CACHE_DIR,
+            max_bytes=getattr(settings, 'STORAGE_CACHE_MAX_BYTES', 1024 * 1024 * 1024),
+            max_entry_bytes=getattr(settings, 'STORAGE_CACHE_MAX_ENTRY_BYTES', 100 * 1024 * 1024),
+        )
+    return _cache
+
+
+def _object(file_url: str) -> Tuple[str, str]:
+    """(entry prefix, object path) of a stored file; every version of an
+    object shares the prefix, so a new ETag drops the old copy."""
+    path = supabase_storage.object_path(file_url)
+    if path.startswith('http'):
+        path = urlparse(path).path
+    return hashlib.sha256(path.encode()).hexdigest()[:16], path
+
+
+def _key(path: str, etag: str) -> str:
+    return f'{path}#{etag}'
+
+
+def _etag_cache_key(file_url: str) -> str:
+    return 'storage-etag:' + hashlib.sha256(file_url.encode()).hexdigest()[:32]
+
+
+def remember_etag(file_url: str, etag: str):
+    cache.set(_etag_cache_key(file_url), etag, getattr(settings, 'STORAGE_CACHE_ETAG_TTL', 60))
+
+
+def content_etag(file_url: str) -> Optional[str]:
+    """ETag of a file indexed by StoredFile (its content hash), or None."""
+    from .models import StoredFile
+
+    sha256 = StoredFile.objects.filter(file_url=file_url).values_list('sha256', flat=True).first()
+    return f'"{sha256}"' if sha256 else None
+
+
+def storage_etag(file_url: str) -> Optional[str]:
+    """Storage's ETag for a file, or None when storage does not give one."""
+    etag = cache.get(_etag_cache_key(file_url))
+    if etag is None:
+        response = get_session().head(file_url, headers=IDENTITY_ENCODING, allow_redirects=True)
+        etag = response.headers.get('ETag') if response.status_code == 200 else None
+        if not etag:
+            return None
+        remember_etag(file_url, etag)
+    return etag
+
+
+def current_etag(file_url: str) -> Optional[str]:
+    """ETag of the file's current version: its content hash when indexed,
+    else storage's ETag."""
+    return content_etag(file_url) or storage_etag(file_url)
+
+
+def open_file(file_url: str, etag: str) -> Optional[Tuple[Dict, BinaryIO]]:
+    """(metadata, open file) of the cached copy of this version, or None."""
+    prefix, path = _object(file_url)
+    return get_cache().open(prefix, _key(path, etag))
+
+
+def writer_for(file_url: str, etag: str, content_type: str, immutable: bool = False) -> EntryWriter:
+    """Entry writer for this version; unless the object is `immutable`
+    (content-addressed), older cached versions are dropped first."""
+    prefix, path = _object(file_url)
+    if not immutable:
+        # Older versions of the object are no longer served
+        get_cache().delete(prefix, keep_key=_key(path, etag))
+    return get_cache().writer(prefix, _key(path, etag), content_type=content_type)
+
+
+def tee(chunks: Iterator[bytes], writer: EntryWriter) -> Iterator[bytes]:
+    """Yield chunks while caching them; the entry is kept only if every
+    chunk was read (a client that disconnects mid-download leaves nothing)."""
+    completed = False
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+        completed = True
+    finally:
+        if completed:
+            writer.commit()
+        else:
+            writer.discard()
+
+
+def warm(file_url: str) -> bool:
+    """Download a file into the cache unless this version is there already.
+    Returns True when the file is cached afterwards."""
+    etag = content_etag(file_url)
+    immutable = etag is not None
+    if not immutable:
+        etag = storage_etag(file_url)
+    if etag is None:
+        return False
+    cached = open_file(file_url, etag)
+    if cached is not None:
+        cached[1].close()
+        return True
+    response = get_session().get(file_url, headers=IDENTITY_ENCODING, stream=True, timeout=(
+        getattr(settings, 'DOWNLOAD_CONNECT_TIMEOUT', 5), getattr(settings, 'DOWNLOAD_READ_TIMEOUT', 30)
+    ))
+    try:
+        if response.status_code != 200:
+            return False
+        writer = writer_for(file_url, etag if immutable else response.headers.get('ETag', etag),
+                            response.headers.get('Content-Type', 'application/octet-stream'), immutable=immutable)
+        for _ in tee(response.iter_content(chunk_size=getattr(settings, 'DOWNLOAD_CHUNK_SIZE', 64 * 1024)), writer):
+            pass
+        return writer.committed
+    finally:
+        response.close()
+
+
+def purge(file_url: Optional[str] = None) -> int:
+    """Drop one file's cached copies, or everything. Returns entries removed."""
+    if file_url is None:
+        return get_cache().clear()
+    prefix, _ = _object(file_url)
+    cache.delete(_etag_cache_key(file_url))
+    return get_cache().delete(prefix)
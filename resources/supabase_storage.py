@@ -2,16 +2,21 @@
 Supabase Storage Utility Module
 Handles file uploads and management with Supabase Storage
 """
+import hashlib
 import os
 import uuid
 from django.conf import settings
-from supabase import create_client, Client
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from typing import Optional, Tuple
 import mimetypes
+from urllib.parse import unquote
+
+from papertrail.storage_backends import SupabaseBucket
 
 
 class SupabaseStorage:
-    """Utility class for Supabase storage operations"""
+    """Utility class for Supabase storage operations (over the shared pooled HTTP client)"""
     
     def __init__(self):
         """Initialize Supabase client"""
@@ -22,8 +27,8 @@ class SupabaseStorage:
         # Only create client if both credentials are provided, non-empty, and valid
         if supabase_url and supabase_url.strip() and supabase_key and supabase_key.strip():
             try:
-                self.supabase: Client = create_client(supabase_url, supabase_key)
                 self.bucket_name = getattr(settings, 'SUPABASE_BUCKET', None)
+                self.supabase = SupabaseBucket(supabase_url, supabase_key, self.bucket_name)
             except Exception as e:
                 # If client creation fails, disable Supabase
                 print(f"Warning: Failed to initialize Supabase client: {e}")
@@ -36,7 +41,14 @@ class SupabaseStorage:
     
     def upload_file(self, file, folder: str = "resources") -> Tuple[bool, Optional[str], Optional[str]]:
         """
-        Upload a file to Supabase Storage
+        Upload a file to Supabase Storage, or reuse the stored copy of identical content
+        
+        The SHA-256 of the upload is computed while reading it in chunks. When a
+        StoredFile with that hash exists, its reference count goes up and its URL is
+        returned with no transfer to storage. Call it inside the transaction that
+        saves the referencing row, so a rollback also drops the reference. A
+        deleted Resource releases its file itself (resources.signals); call
+        release_file() when a resource's file is replaced.
         
         Args:
             file: Django UploadedFile object
@@ -48,30 +60,153 @@ class SupabaseStorage:
         if not self.supabase:
             return False, None, "Supabase is not configured"
         
+        from .models import StoredFile
+        
         try:
-            # Generate unique filename
-            file_extension = os.path.splitext(file.name)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = f"{folder}/{unique_filename}"
+            # Hash while streaming the upload (held on disk by Django when large)
+            hasher = hashlib.sha256()
+            for chunk in file.chunks():
+                hasher.update(chunk)
+            sha256 = hasher.hexdigest()
+            
+            # Duplicate content: just another reference
+            file_url = self._add_reference(sha256)
+            if file_url:
+                return True, file_url, None
             
-            # Read file content
-            file_content = file.read()
+            # Content-addressed name; the suffix keeps a re-upload after deletion from
+            # colliding with a delete of the previous copy still in flight
+            file_extension = os.path.splitext(file.name)[1]
+            file_path = f"{folder}/{sha256}-{uuid.uuid4().hex[:8]}{file_extension}"
             
             # Get mime type
             mime_type, _ = mimetypes.guess_type(file.name)
             if not mime_type:
                 mime_type = 'application/octet-stream'
             
-            # Upload to Supabase
-            response = self.supabase.storage.from_(self.bucket_name).upload(
-                path=file_path,
-                file=file_content,
-                file_options={"content-type": mime_type}
-            )
+            # Upload to Supabase, streamed from the upload in fixed-size parts
+            self.supabase.upload_stream(file_path, file, file.size, mime_type)
+            
+            file_url = self._register(sha256, file_path, file.size)
+            if not file_url:
+                return False, None, "Upload conflicted with a concurrent upload, please retry"
+            return True, file_url, None
+            
+        except Exception as e:
+            return False, None, str(e)
+    
+    def adopt_upload(self, file_path: str, sha256: str, size: int) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Index an object a client uploaded directly (see resources.direct_uploads)
+        
+        The caller has verified the object's content hashes to `sha256`. When that
+        content is stored already, the new object is removed and the existing copy
+        gains a reference; otherwise the object itself is indexed. Pair with
+        release_file() like upload_file().
+        
+        Args:
+            file_path: Path of the uploaded object in the bucket
+            sha256: Hex SHA-256 of its content
+            size: Size of its content in bytes
+        
+        Returns:
+            Tuple of (success: bool, file_url: str or None, error_message: str or None)
+        """
+        if not self.supabase:
+            return False, None, "Supabase is not configured"
+        
+        try:
+            file_url = self._add_reference(sha256)
+            if file_url:
+                if self.object_path(file_url) != file_path:
+                    self.supabase.remove([file_path])
+                return True, file_url, None
             
-            # Get public URL
-            file_url = self.supabase.storage.from_(self.bucket_name).get_public_url(file_path)
+            file_url = self._register(sha256, file_path, size)
+            if not file_url:
+                return False, None, "Upload conflicted with a concurrent upload, please retry"
+            return True, file_url, None
             
+        except Exception as e:
+            return False, None, str(e)
+    
+    def _register(self, sha256: str, file_path: str, size: int) -> Optional[str]:
+        """Index a newly stored object with one reference; returns its URL, or None"""
+        from .models import StoredFile
+        
+        file_url = self.supabase.public_url(file_path)
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(
+                    sha256=sha256, object_path=file_path, file_url=file_url,
+                    size=size, ref_count=1,
+                )
+        except IntegrityError:
+            # The same content was stored concurrently: keep that copy, and only
+            # remove this object when the row indexes another one
+            existing_path = StoredFile.objects.filter(sha256=sha256).values_list('object_path', flat=True).first()
+            if existing_path != file_path:
+                self.supabase.remove([file_path])
+            file_url = self._add_reference(sha256)
+        return file_url
+    
+    def _add_reference(self, sha256: str) -> Optional[str]:
+        """URL of the stored copy of this content after counting one more reference, or None"""
+        from .models import StoredFile
+        
+        # Rows at zero references are being deleted and must not be revived
+        stored = StoredFile.objects.filter(sha256=sha256, ref_count__gt=0)
+        if stored.update(ref_count=F('ref_count') + 1):
+            return stored.values_list('file_url', flat=True).first()
+        return None
+    
+    def release_file(self, file_url: str) -> Tuple[bool, Optional[str]]:
+        """
+        Drop one reference to an uploaded file; the object is deleted from storage
+        once nothing references it (after the current transaction commits)
+        
+        Args:
+            file_url: Public URL returned by upload_file
+        
+        Returns:
+            Tuple of (success: bool, error_message: str or None)
+        """
+        from .models import StoredFile
+        
+        stored = StoredFile.objects.filter(file_url=file_url).first()
+        if stored is None:
+            # Uploaded before deduplication: the only reference
+            transaction.on_commit(lambda: self.delete_file(file_url))
+            return True, None
+        
+        with transaction.atomic():
+            StoredFile.objects.filter(pk=stored.pk, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+            deleted, _ = StoredFile.objects.filter(pk=stored.pk, ref_count=0).delete()
+        if deleted:
+            transaction.on_commit(lambda: self.delete_file(stored.object_path))
+        return True, None
+    
+    def upload_bytes(self, content: bytes, folder: str, extension: str,
+                     content_type: str) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Upload generated content (e.g. a thumbnail) to Supabase Storage
+        
+        Args:
+            content: Bytes to store
+            folder: Folder path in the bucket
+            extension: File extension including the dot (e.g. ".webp")
+            content_type: MIME type served with the file
+        
+        Returns:
+            Tuple of (success: bool, file_url: str or None, error_message: str or None)
+        """
+        if not self.supabase:
+            return False, None, "Supabase is not configured"
+        
+        try:
+            file_path = f"{folder}/{uuid.uuid4()}{extension}"
+            self.supabase.upload(file_path, content, content_type)
+            file_url = self.supabase.public_url(file_path)
             return True, file_url, None
             
         except Exception as e:
@@ -91,19 +226,61 @@ class SupabaseStorage:
             return False, "Supabase is not configured"
         
         try:
-            # Extract path from URL if full URL is provided
-            if file_path.startswith('http'):
-                # Parse the path from the URL
-                parts = file_path.split(f'/storage/v1/object/public/{self.bucket_name}/')
-                if len(parts) > 1:
-                    file_path = parts[1]
-            
-            self.supabase.storage.from_(self.bucket_name).remove([file_path])
+            file_path = self.object_path(file_path)
+            self.supabase.remove([file_path])
             return True, None
             
         except Exception as e:
             return False, str(e)
     
+    def object_path(self, file_url: str) -> str:
+        """Path in the bucket of a public file URL (paths are returned unchanged)"""
+        if file_url.startswith('http'):
+            parts = file_url.split(f'/storage/v1/object/public/{self.bucket_name}/')
+            if len(parts) > 1:
+                return unquote(parts[1])
+        return file_url
+    
+    def signed_download_url(self, file_url: str, filename: str, expires_in: int) -> Optional[str]:
+        """
+        Short-lived URL that downloads a stored file as `filename`
+        
+        Args:
+            file_url: Public URL (or bucket path) of the file
+            filename: Name the browser should save the file as
+            expires_in: Seconds the URL stays valid
+        
+        Returns:
+            Signed URL, or None if Supabase is not configured or signing fails
+        """
+        if not self.supabase:
+            return None
+        
+        try:
+            return self.supabase.signed_url(self.object_path(file_url), expires_in, download=filename)
+        except Exception as e:
+            print(f"Error signing download URL: {e}")
+            return None
+    
+    def signed_upload_url(self, file_path: str) -> Optional[str]:
+        """
+        URL a browser can upload one file to directly (PUT), without our key
+        
+        Args:
+            file_path: Path in the bucket the file will be stored at
+        
+        Returns:
+            Signed URL, or None if Supabase is not configured or signing fails
+        """
+        if not self.supabase:
+            return None
+        
+        try:
+            return self.supabase.signed_upload_url(file_path)
+        except Exception as e:
+            print(f"Error signing upload URL: {e}")
+            return None
+    
     def get_file_info(self, file_path: str) -> Optional[dict]:
         """
         Get file information from Supabase Storage
@@ -118,7 +295,7 @@ class SupabaseStorage:
             return None
         
         try:
-            files = self.supabase.storage.from_(self.bucket_name).list(path=file_path)
+            files = self.supabase.list(file_path)
             if files and len(files) > 0:
                 return files[0]
             return None
@@ -140,7 +317,7 @@ class SupabaseStorage:
             return []
         
         try:
-            files = self.supabase.storage.from_(self.bucket_name).list(path=folder)
+            files = self.supabase.list(folder)
             return files
         except Exception as e:
             print(f"Error listing files: {e}")
@@ -1,3 +1,914 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from datetime import timedelta
+from typing import BinaryIO, List, Optional, Union
+from unittest import mock
+from urllib.parse import quote, urlencode
 
-# Create your tests here.
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, transaction
+from django.http import FileResponse, HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts import counter_buffer, search
+from papertrail.storage_backends import StorageError, SupabaseBucket
+
+from . import direct_uploads, downloads, extraction, previews, storage_cache, thumbnails, unique_viewers
+from .disk_cache import DiskCache
+from .models import DirectUploadClaim, Resource, ResourceText, StoredFile
+from .supabase_storage import supabase_storage
+
+User = get_user_model()
+
+PDF = b'%PDF-1.4\n' + b'1 0 obj << >> endobj\n' * 50
+
+
+class LocalBucket:
+    """
+    Filesystem stand-in for SupabaseBucket: objects are files under `root`,
+    and URLs follow Supabase's layout under `base_url` so code that maps
+    them back to bucket paths works unchanged. Nothing serves the URLs;
+    signed ones carry a random token.
+    """
+    def __init__(self, root: str, base_url: str = 'http://storage.local', bucket_name: str = 'papertrail-storage'):
+        self.root = os.path.realpath(root)
+        self.base_url = f"{base_url.rstrip('/')}/storage/v1"
+        self.bucket_name = bucket_name
+
+    def _url(self, *parts: str) -> str:
+        return '/'.join([self.base_url, *(quote(part) for part in parts)])
+
+    def _file(self, path: str) -> str:
+        full = os.path.realpath(os.path.join(self.root, path))
+        if not full.startswith(self.root + os.sep):
+            raise StorageError(f"Invalid object path: {path}", 400)
+        return full
+
+    def upload(self, path: str, content: Union[bytes, BinaryIO], content_type: str, upsert: bool = False):
+        full = self._file(path)
+        if os.path.exists(full) and not upsert:
+            raise StorageError(f"Object already exists: {path}", 409)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, 'wb') as out:
+            if isinstance(content, bytes):
+                out.write(content)
+            else:
+                shutil.copyfileobj(content, out)
+        return {'Key': f'{self.bucket_name}/{path}'}
+
+    def upload_stream(self, path: str, file: BinaryIO, size: int, content_type: str, upsert: bool = False):
+        file.seek(0)
+        return self.upload(path, file, content_type, upsert=upsert)
+
+    def remove(self, paths: List[str]) -> list:
+        removed = []
+        for path in paths:
+            try:
+                os.remove(self._file(path))
+            except FileNotFoundError:
+                continue
+            removed.append({'name': path})
+        return removed
+
+    def list(self, path: str = '') -> list:
+        directory = self._file(path) if path else self.root
+        try:
+            return [{'name': name} for name in sorted(os.listdir(directory))[:100]]
+        except FileNotFoundError:
+            return []
+
+    def signed_url(self, path: str, expires_in: int, download: Optional[str] = None) -> str:
+        query = {'token': uuid.uuid4().hex}
+        if download:
+            query['download'] = download
+        return f"{self._url('object', 'sign', self.bucket_name, path)}?{urlencode(query, quote_via=quote)}"
+
+    def signed_upload_url(self, path: str, upsert: bool = False) -> str:
+        return f"{self._url('object', 'upload', 'sign', self.bucket_name, path)}?token={uuid.uuid4().hex}"
+
+    def download(self, path: str):
+        """Response streaming the object's file, like SupabaseBucket.download()."""
+        full = self._file(path)
+        if not os.path.isfile(full):
+            raise StorageError(f"Object not found: {path}", 404)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self._url('object', self.bucket_name, path)
+        response.headers['Content-Length'] = str(os.path.getsize(full))
+        response.raw = open(full, 'rb')
+        return response
+
+    def public_url(self, path: str) -> str:
+        return self._url('object', 'public', self.bucket_name, path)
+
+
+class LocalBucketTestCase(TestCase):
+    """Runs each test against a LocalBucket in a temporary directory."""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.bucket = LocalBucket(root, bucket_name='test-bucket')
+        for name, value in (('supabase', self.bucket), ('bucket_name', self.bucket.bucket_name)):
+            patcher = mock.patch.object(supabase_storage, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def assertStored(self, path):
+        self.assertTrue(os.path.isfile(os.path.join(self.bucket.root, path)), path)
+
+    def assertNotStored(self, path):
+        self.assertFalse(os.path.exists(os.path.join(self.bucket.root, path)), path)
+
+
+class DirectUploadTests(LocalBucketTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        self.other = User.objects.create_user(username='other', password='x', first_name='O', last_name='T')
+
+    def stage(self, content, declared=None, name='notes.pdf', user=None):
+        """Issue a ticket for `declared` (default: `content`) and upload `content` to it."""
+        declared = content if declared is None else declared
+        issued = direct_uploads.issue_ticket(
+            user or self.user, name, len(declared), hashlib.sha256(declared).hexdigest()
+        )
+        path = direct_uploads.read_ticket(user or self.user, issued['ticket'])['path']
+        self.bucket.upload(path, content, 'application/octet-stream')
+        return issued, path
+
+    def assertRejected(self, ticket, status=400, user=None):
+        with self.assertRaises(direct_uploads.DirectUploadError) as raised:
+            direct_uploads.confirm(user or self.user, ticket)
+        self.assertEqual(raised.exception.status, status)
+        return raised.exception
+
+    def test_issue_ticket_signs_a_staging_path(self):
+        issued = direct_uploads.issue_ticket(self.user, 'Week 1.pdf', len(PDF), hashlib.sha256(PDF).hexdigest())
+        data = direct_uploads.read_ticket(self.user, issued['ticket'])
+        self.assertTrue(data['path'].startswith(f'uploads/{self.user.pk}/'))
+        self.assertTrue(data['path'].endswith('.pdf'))
+        self.assertEqual(data['name'], 'Week 1.pdf')
+        self.assertEqual(data['size'], len(PDF))
+        self.assertIn('/object/upload/sign/test-bucket/', issued['upload_url'])
+
+    def test_issue_ticket_rejects_bad_declarations(self):
+        sha256 = hashlib.sha256(PDF).hexdigest()
+        for filename, size, digest in (
+            ('notes.exe', len(PDF), sha256),
+            ('notes.pdf', 0, sha256),
+            ('notes.pdf', 50 * 1024 * 1024, sha256),
+            ('notes.pdf', len(PDF), 'not-a-hash'),
+        ):
+            with self.assertRaises(direct_uploads.DirectUploadError):
+                direct_uploads.issue_ticket(self.user, filename, size, digest)
+
+    def test_confirm_indexes_the_upload(self):
+        issued, path = self.stage(PDF, name='Week 1.pdf')
+        upload = direct_uploads.confirm(self.user, issued['ticket'])
+        self.assertEqual(upload['original_filename'], 'Week 1.pdf')
+        self.assertEqual(upload['file_size'], len(PDF))
+        self.assertEqual(upload['file_url'], self.bucket.public_url(path))
+        stored = StoredFile.objects.get(sha256=hashlib.sha256(PDF).hexdigest())
+        self.assertEqual((stored.object_path, stored.ref_count), (path, 1))
+        self.assertStored(path)
+
+    def test_confirm_reuses_stored_content(self):
+        first, first_path = self.stage(PDF)
+        direct_uploads.confirm(self.user, first['ticket'])
+        second, second_path = self.stage(PDF)
+        upload = direct_uploads.confirm(self.user, second['ticket'])
+        self.assertEqual(upload['file_url'], self.bucket.public_url(first_path))
+        self.assertEqual(StoredFile.objects.get(object_path=first_path).ref_count, 2)
+        self.assertNotStored(second_path)
+
+    def test_confirm_rejects_wrong_size(self):
+        issued, path = self.stage(PDF + b'extra', declared=PDF)
+        self.assertIn('size', self.assertRejected(issued['ticket']).message)
+        self.assertNotStored(path)
+
+        issued, path = self.stage(PDF[:-1], declared=PDF)
+        self.assertIn('size', self.assertRejected(issued['ticket']).message)
+        self.assertNotStored(path)
+
+    def test_confirm_rejects_wrong_magic_bytes(self):
+        fake = b'MZ' + PDF[2:]
+        issued, path = self.stage(fake)
+        self.assertIn('not a valid file', self.assertRejected(issued['ticket']).message)
+        self.assertNotStored(path)
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_confirm_rejects_hash_mismatch(self):
+        tampered = PDF[:-1] + b'!'
+        issued, path = self.stage(tampered, declared=PDF)
+        self.assertIn('checksum', self.assertRejected(issued['ticket']).message)
+        self.assertNotStored(path)
+
+    def test_confirm_rejects_missing_object(self):
+        issued = direct_uploads.issue_ticket(self.user, 'notes.pdf', len(PDF), hashlib.sha256(PDF).hexdigest())
+        self.assertIn('not found', self.assertRejected(issued['ticket']).message)
+
+    def test_confirm_rejects_another_users_ticket(self):
+        issued, path = self.stage(PDF)
+        self.assertRejected(issued['ticket'], status=403, user=self.other)
+        self.assertStored(path)
+        self.assertFalse(DirectUploadClaim.objects.exists())
+
+    def test_confirm_rejects_tampered_ticket(self):
+        issued, _ = self.stage(PDF)
+        self.assertIn('Invalid', self.assertRejected(issued['ticket'][:-2] + 'xx').message)
+
+    def test_confirm_rejects_expired_ticket(self):
+        issued, path = self.stage(PDF)
+        with override_settings(DIRECT_UPLOAD_TICKET_EXPIRES=-1):
+            self.assertIn('expired', self.assertRejected(issued['ticket']).message)
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_confirm_rejects_replay(self):
+        issued, path = self.stage(PDF)
+        direct_uploads.confirm(self.user, issued['ticket'])
+        self.assertRejected(issued['ticket'], status=409)
+        stored = StoredFile.objects.get(object_path=path)
+        self.assertEqual(stored.ref_count, 1)
+        self.assertStored(path)
+
+    def test_confirm_rejects_replay_of_deduplicated_upload(self):
+        first, _ = self.stage(PDF)
+        direct_uploads.confirm(self.user, first['ticket'])
+        second, _ = self.stage(PDF)
+        direct_uploads.confirm(self.user, second['ticket'])
+        self.assertRejected(second['ticket'], status=409)
+        self.assertEqual(StoredFile.objects.get().ref_count, 2)
+
+    def test_register_keeps_object_already_indexed_at_its_path(self):
+        issued, path = self.stage(PDF)
+        direct_uploads.confirm(self.user, issued['ticket'])
+        # A racing confirm that lost the insert must not remove the winner's object
+        sha256 = hashlib.sha256(PDF).hexdigest()
+        self.assertEqual(supabase_storage._register(sha256, path, len(PDF)), self.bucket.public_url(path))
+        self.assertStored(path)
+        self.assertEqual(StoredFile.objects.get().ref_count, 2)
+
+
+@override_settings(DOWNLOAD_STRATEGY='redirect')
+class RedirectDownloadTests(LocalBucketTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        self.resource = Resource.objects.create(
+            title='Week 1', uploader=self.user, resource_type='pdf',
+            file_url=self.bucket.public_url('resources/abc123.pdf'), original_filename='Week 1 notes.pdf',
+            is_public=True, verification_status='verified', approved=True,
+        )
+        self.client.force_login(self.user)
+
+    def download(self):
+        return self.client.get(reverse('resources:resource_download', args=[self.resource.pk]))
+
+    def test_public_verified_resource_redirects_with_download_name(self):
+        self.assertEqual(downloads.get_strategy(self.resource), 'redirect')
+        response = self.download()
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('/object/sign/test-bucket/resources/abc123.pdf?', response['Location'])
+        self.assertIn('download=Week%201%20notes.pdf', response['Location'])
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_redirect_without_bucket_uses_public_url(self):
+        with mock.patch.object(supabase_storage, 'supabase', None):
+            url = downloads.redirect_url(self.resource, 'Week 1 notes.pdf')
+        self.assertEqual(url, f'{self.resource.file_url}?download=Week%201%20notes.pdf')
+
+    def test_private_and_unverified_resources_are_streamed(self):
+        for is_public, status in ((False, 'verified'), (True, 'pending'), (True, 'not_verified')):
+            Resource.objects.filter(pk=self.resource.pk).update(is_public=is_public, verification_status=status)
+            self.resource.refresh_from_db()
+            self.assertEqual(downloads.get_strategy(self.resource), 'stream')
+            with mock.patch.object(downloads, 'stream_file', return_value=HttpResponse(PDF)) as stream_file:
+                response = self.download()
+            self.assertEqual(response.status_code, 200)
+            stream_file.assert_called_once()
+            self.assertEqual(stream_file.call_args.args[2], 'Week 1 notes.pdf')
+
+    def test_supabase_signed_url_carries_download_name(self):
+        bucket = SupabaseBucket('https://project.supabase.co', 'key', 'test-bucket')
+        signed = mock.Mock(**{'json.return_value': {'signedURL': '/object/sign/test-bucket/a.pdf?token=t'}})
+        with mock.patch.object(bucket, '_request', return_value=signed) as request:
+            url = bucket.signed_url('a.pdf', 60, download='Week 1 notes.pdf')
+        self.assertEqual(
+            url, 'https://project.supabase.co/storage/v1/object/sign/test-bucket/a.pdf?token=t&download=Week%201%20notes.pdf'
+        )
+        self.assertEqual(request.call_args.kwargs['json'], {'expiresIn': 60})
+
+
+class SupabaseBucketTests(TestCase):
+
+    def test_upload_stream_sends_the_file_object_in_one_request(self):
+        bucket = SupabaseBucket('https://project.supabase.co', 'key', 'test-bucket')
+        upload = SimpleUploadedFile('notes.pdf', PDF)
+        upload.read(10)
+        response = mock.Mock(**{'json.return_value': {'Key': 'test-bucket/resources/a.pdf'}})
+        with mock.patch.object(bucket, '_request', return_value=response) as request:
+            bucket.upload_stream('resources/a.pdf', upload, upload.size, 'application/pdf')
+        request.assert_called_once()
+        self.assertIs(request.call_args.kwargs['data'], upload)
+        self.assertEqual(upload.tell(), 0)
+        self.assertEqual(request.call_args.kwargs['headers']['Content-Length'], str(len(PDF)))
+
+
+class ResourceFileTestCase(LocalBucketTestCase):
+    """Resources whose files are uploaded to the LocalBucket; extraction and
+    thumbnails are not scheduled."""
+
+    def setUp(self):
+        super().setUp()
+        for target in ('resources.extraction.schedule_extraction', 'resources.thumbnails.schedule_thumbnail'):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        self.client.force_login(self.user)
+
+    def upload(self, content=PDF, name='notes.pdf'):
+        with self.captureOnCommitCallbacks(execute=True):
+            success, file_url, error = supabase_storage.upload_file(SimpleUploadedFile(name, content))
+        self.assertTrue(success, error)
+        return file_url
+
+    def create(self, file_url, title='Week 1'):
+        return Resource.objects.create(
+            title=title, uploader=self.user, resource_type='pdf', file_url=file_url,
+            original_filename='notes.pdf', is_public=False,
+        )
+
+
+class StoredFileReferenceTests(ResourceFileTestCase):
+
+    def stored(self, file_url):
+        return StoredFile.objects.filter(object_path=supabase_storage.object_path(file_url)).first()
+
+    def test_delete_view_releases_file(self):
+        file_url = self.upload()
+        self.assertEqual(self.upload(), file_url)
+        first, second = self.create(file_url), self.create(file_url, title='Week 1 copy')
+        path = supabase_storage.object_path(file_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('resources:resource_delete', args=[first.pk]))
+        self.assertEqual(self.stored(file_url).ref_count, 1)
+        self.assertStored(path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('resources:resource_delete', args=[second.pk]))
+        self.assertIsNone(self.stored(file_url))
+        self.assertNotStored(path)
+
+    def test_edit_view_releases_replaced_file(self):
+        old_url = self.upload()
+        resource = self.create(old_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('resources:resource_edit', args=[resource.pk]), {
+                'title': 'Week 1', 'description': '', 'resource_type': 'pdf',
+                'file': SimpleUploadedFile('week1-v2.pdf', PDF + b'%v2'),
+            })
+        resource.refresh_from_db()
+        self.assertNotEqual(resource.file_url, old_url)
+        self.assertEqual(self.stored(resource.file_url).ref_count, 1)
+        self.assertIsNone(self.stored(old_url))
+        self.assertNotStored(supabase_storage.object_path(old_url))
+
+    def test_cascade_delete_releases_file(self):
+        file_url = self.upload()
+        self.create(file_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertIsNone(self.stored(file_url))
+        self.assertNotStored(supabase_storage.object_path(file_url))
+
+    def test_queryset_delete_releases_file(self):
+        file_url = self.upload()
+        self.create(file_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Resource.objects.filter(uploader=self.user).delete()
+        self.assertIsNone(self.stored(file_url))
+
+    def test_rolled_back_delete_keeps_file(self):
+        file_url = self.upload()
+        pk = self.create(file_url).pk
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Resource.objects.get(pk=pk).delete()
+                    raise DatabaseError('rolled back')
+            except DatabaseError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertTrue(Resource.objects.filter(pk=pk).exists())
+        self.assertEqual(self.stored(file_url).ref_count, 1)
+        self.assertStored(supabase_storage.object_path(file_url))
+
+    def test_file_without_stored_row_is_deleted_after_commit(self):
+        path = 'resources/legacy.pdf'
+        self.bucket.upload(path, PDF, 'application/pdf')
+        resource = self.create(self.bucket.public_url(path))
+        with self.captureOnCommitCallbacks() as callbacks:
+            resource.delete()
+            self.assertStored(path)
+        for callback in callbacks:
+            callback()
+        self.assertNotStored(path)
+
+
+def storage_response(content, status=200, etag='"storage-etag"'):
+    """A streamed storage response, as the pooled session returns it."""
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update({'Content-Type': 'application/pdf', 'Content-Length': str(len(content)), 'ETag': etag})
+    response.raw = io.BytesIO(content)
+    return response
+
+
+@override_settings(DOWNLOAD_STRATEGY='stream', DOWNLOAD_CHUNK_SIZE=100, STORAGE_CACHE_MAX_BYTES=0,
+                   COUNTER_BUFFER_FLUSH_INTERVAL=0)
+class StreamDownloadTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        self.resource = Resource.objects.create(
+            title='Week 1', uploader=self.user, resource_type='pdf',
+            file_url='https://storage.example.com/resources/abc123.pdf', original_filename='Week 1 notes.pdf',
+            is_public=True, verification_status='verified', approved=True,
+        )
+        self.client.force_login(self.user)
+        self.session = mock.Mock()
+        patcher = mock.patch.object(downloads, 'get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def download(self, storage, **headers):
+        self.session.get.return_value = storage
+        return self.client.get(reverse('resources:resource_download', args=[self.resource.pk]), headers=headers)
+
+    def downloads_counted(self):
+        return Resource.objects.values_list('download_count', flat=True).get(pk=self.resource.pk)
+
+    def test_file_is_streamed_in_chunks(self):
+        response = self.download(storage_response(PDF))
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertEqual(b''.join(chunks), PDF)
+        self.assertEqual(max(map(len, chunks)), 100)
+        self.assertEqual(response['Content-Length'], str(len(PDF)))
+        self.assertEqual(response['ETag'], '"storage-etag"')
+        self.assertIn('filename="Week 1 notes.pdf"', response['Content-Disposition'])
+        kwargs = self.session.get.call_args.kwargs
+        self.assertTrue(kwargs['stream'])
+        self.assertEqual(kwargs['headers']['Accept-Encoding'], 'identity')
+
+    def test_ranges_are_forwarded_and_counted_once(self):
+        partial = storage_response(PDF[:100], status=206)
+        partial.headers['Content-Range'] = f'bytes 0-99/{len(PDF)}'
+        response = self.download(partial, range='bytes=0-99')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 0-99/{len(PDF)}')
+        self.assertEqual(b''.join(response.streaming_content), PDF[:100])
+        self.assertEqual(self.session.get.call_args.kwargs['headers']['Range'], 'bytes=0-99')
+
+        rest = storage_response(PDF[100:], status=206)
+        self.download(rest, range='bytes=100-', if_range='"storage-etag"')
+        self.assertEqual(self.session.get.call_args.kwargs['headers']['If-Range'], '"storage-etag"')
+        self.assertEqual(self.downloads_counted(), 1)
+
+    def test_storage_validators_pass_through(self):
+        response = self.download(storage_response(b'', status=304), if_none_match='"storage-etag"')
+        self.assertEqual((response.status_code, response['ETag']), (304, '"storage-etag"'))
+        response = self.download(storage_response(b'', status=416), range=f'bytes={len(PDF)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_missing_file_returns_to_the_resource(self):
+        response = self.download(storage_response(b'', status=404))
+        self.assertRedirects(response, reverse('resources:resource_detail', args=[self.resource.pk]),
+                             fetch_redirect_response=False)
+
+
+class StorageCacheTests(ResourceFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = override_settings(STORAGE_CACHE_DIR=directory, STORAGE_CACHE_MAX_BYTES=10 * 1024 * 1024)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        self.session = mock.Mock()
+        self.session.get.side_effect = lambda *args, **kwargs: storage_response(PDF)
+        self.session.head.return_value = storage_response(b'')
+        for patcher in (
+            mock.patch.object(storage_cache, '_cache', None),
+            mock.patch.object(storage_cache, 'get_session', return_value=self.session),
+            mock.patch.object(downloads, 'get_session', return_value=self.session),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def download(self, resource, **headers):
+        request = RequestFactory().get('/', headers=headers)
+        response = downloads.stream_file(request, resource, 'notes.pdf')
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, content
+
+    def test_indexed_file_is_served_from_cache_without_asking_storage(self):
+        resource = self.create(self.upload())
+        etag = f'"{hashlib.sha256(PDF).hexdigest()}"'
+
+        response, content = self.download(resource)
+        self.assertEqual((content, response['ETag']), (PDF, etag))
+        self.assertEqual(self.session.get.call_count, 1)
+
+        response, content = self.download(resource)
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual((content, response['ETag']), (PDF, etag))
+        self.assertEqual(self.session.get.call_count, 1)
+        self.session.head.assert_not_called()
+
+        response, _ = self.download(resource, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_legacy_file_is_revalidated_with_storage(self):
+        path = 'resources/legacy.pdf'
+        self.bucket.upload(path, PDF, 'application/pdf')
+        resource = self.create(self.bucket.public_url(path))
+        self.download(resource)
+        response, content = self.download(resource)
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(response['ETag'], '"storage-etag"')
+        # Remembered for STORAGE_CACHE_ETAG_TTL
+        self.assertEqual(self.session.head.call_count, 1)
+
+        self.session.head.return_value = storage_response(b'', etag='"changed"')
+        cache.clear()
+        self.download(resource)
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_shared_file_stays_cached_until_its_last_resource_is_deleted(self):
+        file_url = self.upload()
+        self.assertEqual(self.upload(), file_url)
+        first, second = self.create(file_url), self.create(file_url, title='Week 1 copy')
+        self.download(first)
+        self.assertEqual(storage_cache.get_cache().usage()[0], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(storage_cache.get_cache().usage()[0], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(storage_cache.get_cache().usage()[0], 0)
+
+
+class PreviewTests(ResourceFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings = override_settings(PREVIEW_CACHE_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.session = mock.Mock()
+        for patcher in (
+            mock.patch.object(previews, '_cache', None),
+            mock.patch.object(previews, 'get_session', return_value=self.session),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def resource(self, resource_type='txt', file_url='https://storage.example.com/resources/notes.txt'):
+        return Resource.objects.create(
+            title='Week 1', uploader=self.user, resource_type=resource_type, file_url=file_url,
+            original_filename=f'notes.{resource_type}',
+        )
+
+    def preview(self, resource):
+        return self.client.get(reverse('resources:resource_preview', args=[resource.pk]))
+
+    def test_text_preview_is_built_once(self):
+        self.session.get.return_value = storage_response(b'Gradient descent notes')
+        resource = self.resource()
+        for _ in range(2):
+            response = self.preview(resource)
+            self.assertEqual(response.json(), {'content': 'Gradient descent notes', 'type': 'text'})
+        self.session.get.assert_called_once()
+
+    def test_extracted_text_saves_the_download(self):
+        resource = self.resource()
+        ResourceText.objects.create(
+            resource=resource, source_url=resource.file_url, status='done',
+            text='x' * (previews.PREVIEW_TEXT_LENGTH + 1),
+        )
+        content = self.preview(resource).json()['content']
+        self.assertTrue(content.endswith(previews.TRUNCATED_NOTE))
+        self.session.get.assert_not_called()
+
+    def test_replaced_file_gets_a_new_preview(self):
+        self.session.get.return_value = storage_response(b'First draft')
+        resource = self.resource()
+        self.preview(resource)
+        resource.file_url = 'https://storage.example.com/resources/notes-v2.txt'
+        resource.save()
+        self.session.get.return_value = storage_response(b'Second draft')
+        self.assertEqual(self.preview(resource).json()['content'], 'Second draft')
+        self.assertEqual(previews.get_cache().usage()[0], 1)
+
+    def test_errors_are_reported_as_json(self):
+        self.session.get.return_value = storage_response(b'', status=404)
+        response = self.preview(self.resource())
+        self.assertEqual((response.status_code, response.json()['error']), (404, 'File not found on storage server.'))
+        response = self.preview(self.resource(resource_type='link'))
+        self.assertEqual(response.status_code, 400)
+
+    def preview_file(self, resource, **headers):
+        return self.client.get(reverse('resources:resource_preview_file', args=[resource.pk]), headers=headers)
+
+    def test_pdf_preview_is_served_as_bytes_with_ranges(self):
+        self.session.get.return_value = storage_response(PDF)
+        resource = self.resource('pdf', 'https://storage.example.com/resources/notes.pdf')
+        url = self.preview(resource).json()['url']
+        self.assertEqual(url, reverse('resources:resource_preview_file', args=[resource.pk]))
+
+        response = self.preview_file(resource)
+        self.assertEqual((response.content, response['Content-Type']), (PDF, 'application/pdf'))
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+        self.assertIn('max-age=300', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.preview_file(resource, range='bytes=0-9', if_range=etag)
+        self.assertEqual((response.status_code, response.content), (206, PDF[:10]))
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{len(PDF)}')
+        with mock.patch.object(previews, 'get_preview') as get_preview:
+            self.assertEqual(self.preview_file(resource, if_none_match=etag).status_code, 304)
+        get_preview.assert_not_called()
+        self.session.get.assert_called_once()
+
+    def test_files_too_large_to_cache_are_streamed(self):
+        resource = self.resource('image', 'https://storage.example.com/resources/photo.jpg')
+        Resource.objects.filter(pk=resource.pk).update(file_size=previews.get_cache().max_entry_bytes + 1)
+        with mock.patch.object(downloads, 'stream_file', return_value=HttpResponse(PDF)) as stream_file:
+            self.assertEqual(self.preview_file(resource).content, PDF)
+        self.assertFalse(stream_file.call_args.kwargs['as_attachment'])
+
+    def test_serve_bytes_ranges(self):
+        def serve(**headers):
+            request = RequestFactory().get('/', headers=headers)
+            return downloads.serve_bytes(request, lambda: ('text/plain', b'0123456789'), '"v1"', 'digits.txt')
+
+        for header, status, content in (
+            ('bytes=2-4', 206, b'234'),
+            ('bytes=-3', 206, b'789'),
+            ('bytes=8-', 206, b'89'),
+            ('bytes=5-100', 206, b'56789'),
+            ('bytes=0-1,4-5', 200, b'0123456789'),
+            ('lines=1-2', 200, b'0123456789'),
+            ('bytes=10-', 416, b''),
+        ):
+            response = serve(range=header)
+            self.assertEqual((response.status_code, response.content), (status, content), header)
+        self.assertEqual(serve(range='bytes=10-')['Content-Range'], 'bytes */10')
+        self.assertEqual(serve(range='bytes=2-4', if_range='"v0"').status_code, 200)
+
+
+def picture(size=(1200, 800), format='PNG'):
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new('RGB', size, (40, 90, 160)).save(output, format)
+    return output.getvalue()
+
+
+@override_settings(THUMBNAIL_SIZE=480)
+class ThumbnailTests(ResourceFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session = mock.Mock()
+        patcher = mock.patch.object(thumbnails, 'get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertThumbnail(self, content, size):
+        from PIL import Image
+
+        with Image.open(io.BytesIO(content)) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', size))
+
+    def test_renderers_make_small_webp_thumbnails(self):
+        from pypdf import PdfWriter
+
+        self.assertThumbnail(thumbnails.make_thumbnail('image', picture(format='JPEG')), (480, 320))
+        pdf = io.BytesIO()
+        writer = PdfWriter()
+        writer.add_blank_page(width=612, height=792)
+        writer.write(pdf)
+        self.assertThumbnail(thumbnails.make_thumbnail('pdf', pdf.getvalue()), (371, 480))
+        pptx = io.BytesIO()
+        with zipfile.ZipFile(pptx, 'w') as package:
+            package.writestr('docProps/thumbnail.jpeg', picture((256, 192), 'JPEG'))
+        self.assertThumbnail(thumbnails.make_thumbnail('pptx', pptx.getvalue()), (256, 192))
+        self.assertIsNone(thumbnails.make_thumbnail('txt', b'notes'))
+
+    def test_thumbnail_is_uploaded_and_recorded_once(self):
+        self.session.get.return_value = storage_response(picture())
+        resource = Resource.objects.create(
+            title='Diagram', uploader=self.user, resource_type='image',
+            file_url='https://storage.example.com/resources/diagram.png',
+        )
+        url = thumbnails.generate_thumbnail(resource.pk)
+        self.assertTrue(supabase_storage.object_path(url).startswith('thumbnails/'))
+        self.assertStored(supabase_storage.object_path(url))
+        resource.refresh_from_db()
+        self.assertEqual((resource.thumbnail_url, resource.thumbnail_source_url), (url, resource.file_url))
+        self.assertFalse(thumbnails.needs_thumbnail(resource))
+        self.assertEqual(thumbnails.generate_thumbnail(resource.pk), url)
+        self.session.get.assert_called_once()
+
+        replacement = thumbnails.generate_thumbnail(resource.pk, force=True)
+        self.assertNotEqual(replacement, url)
+        self.assertNotStored(supabase_storage.object_path(url))
+
+    def test_thumbnail_of_a_replaced_file_is_discarded(self):
+        resource = Resource.objects.create(
+            title='Diagram', uploader=self.user, resource_type='image',
+            file_url='https://storage.example.com/resources/diagram.png',
+        )
+
+        def replace_while_rendering(*args, **kwargs):
+            Resource.objects.filter(pk=resource.pk).update(file_url='https://storage.example.com/resources/v2.png')
+            return storage_response(picture())
+
+        self.session.get.side_effect = replace_while_rendering
+        self.assertIsNone(thumbnails.generate_thumbnail(resource.pk))
+        self.assertEqual(self.bucket.list('thumbnails'), [])
+        resource.refresh_from_db()
+        self.assertTrue(thumbnails.needs_thumbnail(resource))
+
+
+@override_settings(TEXT_EXTRACTION_MAX_BYTES=1000, DOWNLOAD_CHUNK_SIZE=100)
+class ExtractionTests(ResourceFileTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session = mock.Mock()
+        patcher = mock.patch.object(extraction, 'get_session', return_value=self.session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.resource = Resource.objects.create(
+            title='Week 1', uploader=self.user, resource_type='txt',
+            file_url='https://storage.example.com/resources/notes.txt', original_filename='notes.txt',
+        )
+
+    def extract(self, response):
+        self.session.get.return_value = response
+        record = extraction.extract_resource_text(self.resource.pk)
+        self.assertEqual(record.attempts, 1)
+        return record
+
+    def test_text_is_stored_and_searchable(self):
+        record = self.extract(storage_response('Gradient descent notes'.encode()))
+        self.assertEqual((record.status, record.text, record.error), ('done', 'Gradient descent notes', ''))
+        self.assertEqual(record.source_url, self.resource.file_url)
+        self.assertTrue(self.session.get.call_args.kwargs['stream'])
+        self.assertFalse(extraction.needs_extraction(self.resource))
+        matches = search.search_documents('gradient descent', kinds=['resource'])
+        self.assertEqual(list(matches.values_list('object_id', flat=True)), [self.resource.pk])
+
+    def test_declared_oversize_file_is_skipped_unread(self):
+        response = storage_response(b'x' * 1001)
+        response.iter_content = mock.Mock()
+        record = self.extract(response)
+        self.assertEqual((record.status, record.text), ('unsupported', ''))
+        self.assertIn('1000 bytes', record.error)
+        response.iter_content.assert_not_called()
+        self.assertTrue(response.raw.closed)
+
+    def test_undeclared_oversize_file_stops_at_the_cap(self):
+        read = []
+        response = storage_response(b'')
+        del response.headers['Content-Length']
+        response.iter_content = lambda chunk_size: (read.append(chunk_size) or b'x' * chunk_size for _ in range(50))
+        record = self.extract(response)
+        self.assertEqual(record.status, 'unsupported')
+        self.assertEqual(len(read), 11)
+        self.assertTrue(response.raw.closed)
+        self.assertEqual(ResourceText.objects.get(resource=self.resource).status, 'unsupported')
+
+    def test_storage_error_marks_failed(self):
+        with self.assertLogs('resources.extraction', 'WARNING'):
+            record = self.extract(storage_response(b'', status=404))
+        self.assertEqual(record.status, 'failed')
+        self.assertIn('404', record.error)
+
+
+class DiskCacheTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.cache = DiskCache(self.directory, max_bytes=1000, max_entry_bytes=400)
+
+    def test_writes_under_the_cap_do_not_scan(self):
+        self.cache.put(1, 'a', b'x' * 100)
+        with mock.patch.object(self.cache, '_entries', wraps=self.cache._entries) as entries:
+            self.cache.put(1, 'b', b'x' * 100)
+            writer = self.cache.writer(2, 'c')
+            writer.write(b'x' * 100)
+            writer.commit()
+        entries.assert_not_called()
+        self.assertEqual(self.cache.stats()['total_bytes'], self.cache.usage()[1])
+
+    def test_going_over_the_cap_evicts_least_recently_used(self):
+        for key in 'abcd':
+            self.cache.put(1, key, b'x' * 300)
+            os.utime(self.cache._path(1, key), (0, 0) if key == 'a' else None)
+        self.assertIsNone(self.cache.get(1, 'a'))
+        self.assertIsNotNone(self.cache.get(1, 'd'))
+        entries, size = self.cache.usage()
+        self.assertEqual(self.cache.stats()['total_bytes'], size)
+        self.assertLessEqual(size, 1000)
+
+    def test_delete_lowers_the_total(self):
+        self.cache.put(1, 'a', b'x' * 100)
+        self.cache.put(2, 'b', b'x' * 100)
+        self.assertEqual(self.cache.delete(1), 1)
+        self.assertEqual(self.cache.stats()['total_bytes'], self.cache.usage()[1])
+
+
+@override_settings(COUNTER_BUFFER_FLUSH_INTERVAL=60)
+class UniqueViewerTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='x', first_name='S', last_name='T')
+        self.first, self.second = (
+            Resource.objects.create(title=title, uploader=self.user, resource_type='link', external_url='https://example.com')
+            for title in ('Week 1', 'Week 2')
+        )
+        self.addCleanup(self.discard_pending)
+
+    def discard_pending(self):
+        if counter_buffer._timer is not None:
+            counter_buffer._timer.cancel()
+            counter_buffer._timer = None
+        counter_buffer._take()
+        unique_viewers._pending.clear()
+
+    def record(self, resource, viewers, day=None):
+        for viewer in viewers:
+            unique_viewers.record(resource.pk, f'user:{viewer}', day)
+
+    def assertAbout(self, estimate, expected):
+        self.assertAlmostEqual(estimate, expected, delta=expected * 0.06)
+
+    def test_merge_is_the_register_wise_maximum(self):
+        sketches = [bytes((i * 7 + n * 13) % 23 for i in range(unique_viewers.REGISTERS)) for n in range(300)]
+        expected = bytes(max(column) for column in zip(*sketches))
+        self.assertEqual(unique_viewers._merge(sketches), expected)
+        target = bytearray(sketches[0])
+        unique_viewers._merge_into(target, sketches[1])
+        self.assertEqual(bytes(target), bytes(map(max, sketches[0], sketches[1])))
+
+    def test_repeat_views_count_once(self):
+        self.record(self.first, range(2000))
+        self.record(self.first, range(2000))
+        counter_buffer.flush()
+        self.assertAbout(unique_viewers.unique_viewers([self.first.pk]), 2000)
+
+    def test_days_and_resources_merge_as_a_union(self):
+        today = timezone.localdate()
+        self.record(self.first, range(0, 1500))
+        self.record(self.first, range(1000, 2500), day=today - timedelta(days=1))
+        self.record(self.second, range(2000, 3000))
+        counter_buffer.flush()
+        self.record(self.first, range(2500, 3000))
+        counter_buffer.flush()
+
+        by_resource = unique_viewers.unique_viewers_by_resource([self.first.pk, self.second.pk])
+        self.assertAbout(by_resource[self.first.pk], 3000)
+        self.assertAbout(by_resource[self.second.pk], 1000)
+        self.assertAbout(unique_viewers.unique_viewers([self.first.pk, self.second.pk]), 3000)
+        self.assertAbout(unique_viewers.unique_viewers([self.first.pk], days=1), 2000)
+
+    def test_no_views_estimate_zero(self):
+        self.assertEqual(unique_viewers.unique_viewers([self.first.pk]), 0)
+        self.assertEqual(unique_viewers.unique_viewers_by_resource([self.first.pk]), {})
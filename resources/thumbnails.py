@@ -0,0 +1,223 @@
+"""Small WebP thumbnails of uploaded resource files.
+Each image, PDF or PPTX file is downloaded once, off the request path, in a
+small thread pool; the thumbnail is uploaded next to the file (under
+"thumbnails/") and its URL stored on Resource.thumbnail_url, so list and
+detail pages show a picture without fetching the original. A PDF's
+thumbnail is its first page rendered with pdfium (the largest picture on
+the page if rendering fails); a PPTX's is the first-slide render PowerPoint
+stores in the file (or the largest picture on slide 1). Files without
+either keep their icon. `manage.py generate_thumbnails` backfills or retries from the shell.
+"""
+import io
+import logging
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from papertrail.http_client import get_session
+
+from .models import Resource
+from .supabase_storage import supabase_storage
+
+__all__ = [
+    "RENDERERS",
+    "make_thumbnail",
+    "needs_thumbnail",
+    "schedule_thumbnail",
+    "generate_thumbnail",
+    "delete_thumbnail",
+]
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_FOLDER = 'thumbnails'
+
+_executor = None
+# pdfium is not thread-safe
+_pdfium_lock = threading.Lock()
+
+
+# ========================================
+# Renderers (file bytes -> source image bytes)
+# ========================================
+
+def _largest(images: Iterable[bytes]) -> Optional[bytes]:
+    """Biggest picture by pixel count; covers and slide backgrounds beat logos."""
+    from PIL import Image
+
+    best, best_area = None, 0
+    for data in images:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                area = image.width * image.height
+        except Exception:
+            continue
+        if area > best_area:
+            best, best_area = data, area
+    return best
+
+
+def _render_image(content: bytes) -> Optional[bytes]:
+    return content
+
+
+def _rasterize_pdf(content: bytes) -> Optional[bytes]:
+    """PNG of the first page, rendered at thumbnail size."""
+    import pypdfium2 as pdfium
+
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(content)
+        try:
+            if len(pdf) == 0:
+                return None
+            page = pdf[0]
+            width, height = page.get_size()
+            image = page.render(scale=getattr(settings, 'THUMBNAIL_SIZE', 480) / max(width, height, 1)).to_pil()
+        finally:
+            pdf.close()
+    output = io.BytesIO()
+    image.save(output, 'PNG')
+    return output.getvalue()
+
+
+def _render_pdf(content: bytes) -> Optional[bytes]:
+    try:
+        return _rasterize_pdf(content)
+    except Exception as e:
+        logger.warning(f'Could not render PDF page 1, using its largest picture: {e}')
+
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    if not reader.pages:
+        return None
+    return _largest(image.data for image in reader.pages[0].images)
+
+
+def _render_pptx(content: bytes) -> Optional[bytes]:
+    with zipfile.ZipFile(io.BytesIO(content)) as package:
+        names = package.namelist()
+        # PowerPoint saves a render of the first slide here
+        stored = [name for name in names if name.lower().startswith('docprops/thumbnail.')]
+        if stored:
+            return package.read(stored[0])
+
+    from pptx import Presentation
+    from pptx.enum.shapes import MSO_SHAPE_TYPE
+
+    prs = Presentation(io.BytesIO(content))
+    if not prs.slides:
+        return None
+    pictures = [shape for shape in prs.slides[0].shapes if shape.shape_type == MSO_SHAPE_TYPE.PICTURE]
+    return _largest(shape.image.blob for shape in pictures)
+
+
+RENDERERS: Dict[str, Callable[[bytes], Optional[bytes]]] = {
+    'image': _render_image,
+    'pdf': _render_pdf,
+    'pptx': _render_pptx,
+}
+
+
+def make_thumbnail(resource_type: str, content: bytes) -> Optional[bytes]:
+    """WebP thumbnail of a file's content, or None when there is nothing to show."""
+    from PIL import Image, ImageOps
+
+    renderer = RENDERERS.get(resource_type)
+    source = renderer(content) if renderer else None
+    if not source:
+        return None
+    size = getattr(settings, 'THUMBNAIL_SIZE', 480)
+    with Image.open(io.BytesIO(source)) as image:
+        # JPEGs decode straight at a reduced scale
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        output = io.BytesIO()
+        image.save(output, 'WEBP', quality=getattr(settings, 'THUMBNAIL_QUALITY', 80), method=4)
+    return output.getvalue()
+
+
+# ========================================
+# Pipeline
+# ========================================
+
+def needs_thumbnail(resource: Resource) -> bool:
+    """True when the resource has a renderable file with no thumbnail of it yet."""
+    if not resource.file_url or resource.resource_type not in RENDERERS:
+        return False
+    return resource.thumbnail_source_url != resource.file_url
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 1),
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def _run_in_thread(resource_id: int):
+    try:
+        generate_thumbnail(resource_id)
+    except Exception as e:
+        logger.error(f'Thumbnail for Resource {resource_id} failed: {e}', exc_info=True)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnail(resource: Resource):
+    """Queue thumbnail generation once the current transaction commits."""
+    resource_id = resource.pk
+    transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, resource_id))
+
+
+def delete_thumbnail(thumbnail_url: Optional[str]):
+    if thumbnail_url:
+        success, error = supabase_storage.delete_file(thumbnail_url)
+        if not success:
+            logger.warning(f'Could not delete thumbnail {thumbnail_url}: {error}')
+
+
+def generate_thumbnail(resource_id: int, force: bool = False) -> Optional[str]:
+    """Download one resource's file, render and upload its thumbnail and store
+    the URL. Returns the thumbnail URL, or None when none could be made.
+    Files that already have one are skipped unless `force`."""
+    resource = Resource.objects.filter(pk=resource_id).first()
+    if resource is None or not resource.file_url or resource.resource_type not in RENDERERS:
+        return None
+    if not force and not needs_thumbnail(resource):
+        return resource.thumbnail_url
+    source_url = resource.file_url
+
+    response = get_session().get(source_url, timeout=getattr(settings, 'THUMBNAIL_TIMEOUT', 60))
+    response.raise_for_status()
+    thumbnail = make_thumbnail(resource.resource_type, response.content)
+
+    thumbnail_url = None
+    if thumbnail:
+        success, thumbnail_url, error = supabase_storage.upload_bytes(
+            thumbnail, folder=THUMBNAIL_FOLDER, extension='.webp', content_type='image/webp'
+        )
+        if not success:
+            raise RuntimeError(f'Thumbnail upload failed: {error}')
+
+    # Recording the source even when there is no picture stops needs_thumbnail() retrying
+    # the same file. The file may have been replaced while we were rendering.
+    updated = Resource.objects.filter(pk=resource_id, file_url=source_url).update(
+        thumbnail_url=thumbnail_url, thumbnail_source_url=source_url,
+    )
+    if not updated:
+        delete_thumbnail(thumbnail_url)
+        return None
+    if resource.thumbnail_url != thumbnail_url:
+        delete_thumbnail(resource.thumbnail_url)
+    return thumbnail_url
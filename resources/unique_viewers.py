@@ -0,0 +1,188 @@
+"""Unique viewers per resource per day, counted with HyperLogLog sketches.
+views_count counts every hit, so refreshing a page inflates it. Each
+resource-day instead keeps 2**PRECISION one-byte registers (1 KB) that
+estimate distinct viewers within about 3%, however many there are. Sketches
+of several days or resources merge by taking the register-wise maximum, so
+"unique viewers over 30 days" is exact union arithmetic, not a sum.
+Viewers are buffered in process and merged into ResourceViewSketch rows on
+the accounts.counter_buffer flush schedule.
+"""
+import hashlib
+import math
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from accounts import counter_buffer
+
+from .models import ResourceViewSketch
+
+__all__ = [
+    "PRECISION",
+    "record",
+    "estimate",
+    "unique_viewers",
+    "unique_viewers_by_resource",
+    "prune",
+    "flush",
+]
+
+PRECISION = 10
+REGISTERS = 1 << PRECISION
+HASH_BITS = 64
+
+_lock = threading.Lock()
+# (resource id, day) -> registers not yet merged into the database
+_pending: Dict[Tuple[int, date], bytearray] = {}
+
+
+# ========================================
+# Sketch arithmetic
+# ========================================
+
+def _position(viewer_key: str) -> Tuple[int, int]:
+    """(register index, rank) of a viewer: the first PRECISION hash bits pick
+    the register, the rank is the position of the first 1 in the rest."""
+    value = int.from_bytes(hashlib.blake2b(viewer_key.encode(), digest_size=8).digest(), 'big')
+    index = value >> (HASH_BITS - PRECISION)
+    rest = value & ((1 << (HASH_BITS - PRECISION)) - 1)
+    return index, HASH_BITS - PRECISION - rest.bit_length() + 1
+
+
+# Sketches merged per pass by _merge()
+MERGE_BATCH = 256
+# 2 ** -rank for every possible rank, for estimate()
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(HASH_BITS - PRECISION + 2)]
+
+
+def _merge_into(target: bytearray, registers: bytes):
+    """Register-wise maximum, in place (map() runs the loop in C)."""
+    target[:] = bytes(map(max, target, registers))
+
+
+def _merge(sketches: Iterable[bytes]) -> bytes:
+    """Register-wise maximum of any number of sketches, taken over a whole
+    batch of them in each pass."""
+    merged = bytes(REGISTERS)
+    batch = []
+    for registers in sketches:
+        batch.append(registers)
+        if len(batch) == MERGE_BATCH:
+            merged = bytes(map(max, merged, *batch))
+            batch = []
+    if batch:
+        merged = bytes(map(max, merged, *batch))
+    return merged
+
+
+def estimate(registers: bytes) -> int:
+    """Distinct viewers estimated from a sketch (linear counting when sparse)."""
+    alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+    raw = alpha * REGISTERS * REGISTERS / sum(map(_INVERSE_POWERS.__getitem__, registers))
+    zeros = registers.count(0)
+    if raw <= 2.5 * REGISTERS and zeros:
+        return round(REGISTERS * math.log(REGISTERS / zeros))
+    return round(raw)
+
+
+# ========================================
+# Recording (view path)
+# ========================================
+
+def record(resource_id: int, viewer_key: str, day: Optional[date] = None):
+    """Note that `viewer_key` (e.g. "user:42") viewed a resource today."""
+    index, rank = _position(viewer_key)
+    key = (resource_id, day or timezone.localdate())
+    with _lock:
+        registers = _pending.get(key)
+        if registers is None:
+            registers = _pending[key] = bytearray(REGISTERS)
+        if rank <= registers[index]:
+            return
+        registers[index] = rank
+    counter_buffer.after_write()
+
+
+def _pending_count() -> int:
+    with _lock:
+        return len(_pending)
+
+
+def _merge_row(resource_id: int, day: date, registers: bytearray):
+    with transaction.atomic():
+        sketch = ResourceViewSketch.objects.select_for_update().filter(resource_id=resource_id, day=day).first()
+        if sketch is None:
+            try:
+                with transaction.atomic():
+                    ResourceViewSketch.objects.create(resource_id=resource_id, day=day, registers=bytes(registers))
+                return
+            except IntegrityError:
+                # Created concurrently by another process, or the resource is gone
+                sketch = ResourceViewSketch.objects.select_for_update().filter(resource_id=resource_id, day=day).first()
+                if sketch is None:
+                    return
+        merged = bytearray(bytes(sketch.registers))
+        _merge_into(merged, registers)
+        sketch.registers = bytes(merged)
+        sketch.save(update_fields=['registers'])
+
+
+def flush() -> int:
+    """Merge buffered registers into the stored sketches. Returns rows written."""
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    written = 0
+    for (resource_id, day), registers in list(pending.items()):
+        try:
+            _merge_row(resource_id, day, registers)
+        except Exception:
+            with _lock:
+                for key, regs in pending.items():
+                    _merge_into(_pending.setdefault(key, bytearray(REGISTERS)), regs)
+            raise
+        del pending[(resource_id, day)]
+        written += 1
+    return written
+
+
+counter_buffer.register(_pending_count, flush)
+
+
+# ========================================
+# Reading (analytics)
+# ========================================
+
+def _sketches(resource_ids: Iterable[int], days: int):
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return (
+        ResourceViewSketch.objects.filter(resource_id__in=list(resource_ids), day__gte=since)
+        .values_list('resource_id', 'registers')
+        .iterator()
+    )
+
+
+def unique_viewers_by_resource(resource_ids: Iterable[int], days: int = 30) -> Dict[int, int]:
+    """Estimated distinct viewers of each resource over the last `days` days."""
+    sketches: Dict[int, List[bytes]] = defaultdict(list)
+    for resource_id, registers in _sketches(resource_ids, days):
+        sketches[resource_id].append(bytes(registers))
+    return {resource_id: estimate(_merge(daily)) for resource_id, daily in sketches.items()}
+
+
+def unique_viewers(resource_ids: Iterable[int], days: int = 30) -> int:
+    """Estimated distinct people who viewed any of the resources over the last `days` days."""
+    return estimate(_merge(bytes(registers) for _, registers in _sketches(resource_ids, days)))
+
+
+def prune(days: Optional[int] = None) -> int:
+    """Delete sketches older than UNIQUE_VIEWER_RETENTION_DAYS. Returns rows deleted."""
+    if days is None:
+        days = getattr(settings, 'UNIQUE_VIEWER_RETENTION_DAYS', 90)
+    deleted, _ = ResourceViewSketch.objects.filter(day__lt=timezone.localdate() - timedelta(days=days)).delete()
+    return deleted
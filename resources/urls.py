@@ -12,12 +12,15 @@ urlpatterns = [
     path('api/list/', views.resource_list_api, name='resource_list_api'),
     path('my-resources/', views.my_resources, name='my_resources'),
     path('upload/', views.resource_upload, name='resource_upload'),
+    path('upload/ticket/', views.resource_upload_ticket, name='resource_upload_ticket'),
+    path('upload/confirm/', views.resource_upload_confirm, name='resource_upload_confirm'),
     path('<int:pk>/', views.resource_detail, name='resource_detail'),
     path('<int:pk>/edit/', views.resource_edit, name='resource_edit'),
     path('<int:pk>/update/', views.update_resource, name='update_resource'),
     path('<int:pk>/delete/', views.resource_delete, name='resource_delete'),
     path('<int:pk>/download/', views.resource_download, name='resource_download'),
     path('<int:pk>/preview/', views.resource_preview, name='resource_preview'),
+    path('<int:pk>/preview/file/', views.resource_preview_file, name='resource_preview_file'),
     
     # Rating and Comments
     path('<int:pk>/rate/', views.rate_resource, name='rate_resource'),
@@ -4,12 +4,15 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import OperationalError, transaction
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q, prefetch_related_objects
 from django.urls import reverse
+from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from .models import Resource, Tag, Bookmark, Rating, Comment, Like
 from .forms import ResourceUploadForm, RatingForm, CommentForm
 from .supabase_storage import supabase_storage
+from . import direct_uploads, downloads, extraction, previews, unique_viewers
+from accounts import pagination, viewer_state
 from django.utils.timesince import timesince
 import json
 
@@ -42,6 +45,39 @@ def home(request):
 
 # --- Resource Upload Views ---
 
+def _apply_upload_verification(resource, user):
+    """Set the verification status of a newly uploaded resource."""
+    # Approval / verification logic:
+    # Professors: auto-verify regardless of visibility.
+    # Non-professors:
+    #   - If uploaded as private (is_public=False): treat as verified immediately (no approval needed).
+    #   - If uploaded as public (is_public=True): mark as pending until professor approval.
+    if getattr(user, 'is_professor', False):
+        resource.verification_status = 'verified'
+        resource.approved = True
+        resource.verification_by = user
+        resource.verified_at = timezone.now()
+    else:
+        if resource.is_public:
+            resource.verification_status = 'pending'
+            resource.approved = False
+            resource.verification_by = None
+            resource.verified_at = None
+        else:  # private upload -> auto verified
+            resource.verification_status = 'verified'
+            resource.approved = True
+            resource.verification_by = user  # owner acts as implicit verifier
+            resource.verified_at = timezone.now()
+
+
+def _upload_success_message(request):
+    # Different success messages based on role
+    if getattr(request.user, 'is_professor', False):
+        messages.success(request, 'Resource uploaded and published successfully!')
+    else:
+        messages.success(request, 'Resource uploaded successfully! It is pending verification.')
+
+
 @login_required
 def resource_upload(request):
     """Upload a new resource"""
@@ -71,28 +107,14 @@ def resource_upload(request):
                         else:
                             messages.error(request, f'File upload failed: {error}')
                             return render(request, 'resources/resource_upload.html', {'form': form})
+                    elif form.cleaned_data.get('upload_ticket'):
+                        # Already sent straight to storage by the upload page
+                        upload = direct_uploads.confirm(request.user, form.cleaned_data['upload_ticket'])
+                        resource.file_url = upload['file_url']
+                        resource.original_filename = upload['original_filename']
+                        resource.file_size = upload['file_size']
                     
-                    # Approval / verification logic:
-                    # Professors: auto-verify regardless of visibility.
-                    # Non-professors:
-                    #   - If uploaded as private (is_public=False): treat as verified immediately (no approval needed).
-                    #   - If uploaded as public (is_public=True): mark as pending until professor approval.
-                    if getattr(request.user, 'is_professor', False):
-                        resource.verification_status = 'verified'
-                        resource.approved = True
-                        resource.verification_by = request.user
-                        resource.verified_at = timezone.now()
-                    else:
-                        if resource.is_public:
-                            resource.verification_status = 'pending'
-                            resource.approved = False
-                            resource.verification_by = None
-                            resource.verified_at = None
-                        else:  # private upload -> auto verified
-                            resource.verification_status = 'verified'
-                            resource.approved = True
-                            resource.verification_by = request.user  # owner acts as implicit verifier
-                            resource.verified_at = timezone.now()
+                    _apply_upload_verification(resource, request.user)
                     
                     resource.save()
                     form.save_m2m()  # Save tags
@@ -100,14 +122,12 @@ def resource_upload(request):
                     # Get resource ID for redirect
                     resource_id = resource.pk
                 
-                # Different success messages based on role
-                if getattr(request.user, 'is_professor', False):
-                    messages.success(request, 'Resource uploaded and published successfully!')
-                else:
-                    messages.success(request, 'Resource uploaded successfully! It is pending verification.')
-                
+                _upload_success_message(request)
                 return redirect('resources:resource_detail', pk=resource_id)
             
+            except direct_uploads.DirectUploadError as e:
+                messages.error(request, e.message)
+                return render(request, 'resources/resource_upload.html', {'form': form})
             except Exception as e:
                 import logging
                 logger = logging.getLogger(__name__)
@@ -117,7 +137,60 @@ def resource_upload(request):
     else:
         form = ResourceUploadForm()
     
-    return render(request, 'resources/resource_upload.html', {'form': form})
+    return render(request, 'resources/resource_upload.html', {
+        'form': form,
+        'direct_uploads_enabled': direct_uploads.is_enabled(),
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def resource_upload_ticket(request):
+    """Sign a direct-to-storage upload of one file (AJAX)"""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON data.'}, status=400)
+    
+    try:
+        ticket = direct_uploads.issue_ticket(
+            request.user, data.get('name'), data.get('size'), data.get('sha256')
+        )
+    except direct_uploads.DirectUploadError as e:
+        return JsonResponse({'success': False, 'error': e.message}, status=e.status)
+    return JsonResponse({'success': True, **ticket})
+
+
+@login_required
+@require_http_methods(["POST"])
+def resource_upload_confirm(request):
+    """Create a resource from the upload form once its file is in storage (AJAX)"""
+    form = ResourceUploadForm(request.POST)
+    if not form.is_valid():
+        errors = [error for field_errors in form.errors.values() for error in field_errors]
+        return JsonResponse({'success': False, 'error': ' '.join(errors)}, status=400)
+    if not form.cleaned_data.get('upload_ticket'):
+        return JsonResponse({'success': False, 'error': 'Missing upload ticket.'}, status=400)
+    
+    try:
+        with transaction.atomic():
+            upload = direct_uploads.confirm(request.user, form.cleaned_data['upload_ticket'])
+            resource = form.save(commit=False)
+            resource.uploader = request.user
+            resource.file_url = upload['file_url']
+            resource.original_filename = upload['original_filename']
+            resource.file_size = upload['file_size']
+            _apply_upload_verification(resource, request.user)
+            resource.save()
+            form.save_m2m()  # Save tags
+    except direct_uploads.DirectUploadError as e:
+        return JsonResponse({'success': False, 'error': e.message}, status=e.status)
+    
+    _upload_success_message(request)
+    return JsonResponse({
+        'success': True,
+        'redirect_url': reverse('resources:resource_detail', args=[resource.pk]),
+    })
 
 
 @login_required
@@ -136,8 +209,9 @@ def resource_detail(request, pk):
             messages.error(request, 'This resource is pending verification.')
             return redirect('resources:resource_list')
 
-    # Increment view count
+    # Increment view count and record the viewer for unique-viewer estimates
     resource.increment_view_count()
+    unique_viewers.record(resource.pk, f'user:{request.user.pk}')
 
     # Bookmark state for current user (shows toggle button)
     is_bookmarked = False
@@ -248,13 +322,9 @@ def resource_detail(request, pk):
 @login_required
 def my_resources(request):
     """List all resources uploaded by the current user"""
-    resources = Resource.objects.filter(uploader=request.user).order_by('-created_at')
-    bookmarked_ids = set()
-    if request.user.is_authenticated:
-        bookmarked_ids = set(
-            Bookmark.objects.filter(user=request.user, resource__in=resources)
-            .values_list('resource_id', flat=True)
-        )
+    resources = list(Resource.objects.filter(uploader=request.user).order_by('-created_at'))
+    state = viewer_state.load(request.user, [('resource', r.pk) for r in resources], relations=('bookmarked',))
+    bookmarked_ids = state.ids('bookmarked', 'resource')
     context = {
         'resources': resources,
         'is_my_resources': True,
@@ -270,8 +340,6 @@ def resource_list(request):
     - Regular users: verified public resources only.
     Private resources never shown here.
     """
-    from django.core.paginator import Paginator
-    
     if getattr(request.user, 'is_professor', False):
         resources = Resource.objects.filter(is_public=True).filter(
             Q(verification_status='verified') | Q(verification_status='pending')
@@ -296,23 +364,16 @@ def resource_list(request):
             Q(title__icontains=search_query) | Q(description__icontains=search_query)
         )
     
-    # Order by created_at
-    resources = resources.order_by('-created_at')
-    
-    # Pagination
-    paginator = Paginator(resources, 12)  # 12 items per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Newest first, paged by cursor on (created_at, id)
+    resources = resources.select_related('uploader')
+    page_obj = pagination.paginate(resources, request.GET.get('cursor'), 12)
     
     # Annotate each resource with user_has_liked status
-    if request.user.is_authenticated:
-        from .models import Like
-        liked_ids = set(Like.objects.filter(user=request.user, resource__in=page_obj.object_list).values_list('resource_id', flat=True))
-        for resource in page_obj.object_list:
-            resource.user_has_liked = resource.pk in liked_ids
-    else:
-        for resource in page_obj.object_list:
-            resource.user_has_liked = False
+    state = viewer_state.load(
+        request.user, [('resource', r.pk) for r in page_obj.object_list], relations=('liked', 'bookmarked')
+    )
+    for resource in page_obj.object_list:
+        resource.user_has_liked = state.is_liked('resource', resource.pk)
     
     tags_list = Tag.objects.all().order_by('name')
     
@@ -329,12 +390,11 @@ def resource_list(request):
     
     context = {
         'resources': page_obj,
+        'page_obj': page_obj,
+        'cursor_query': pagination.cursor_query(request),
         'search_query': search_query,
         'tag_filter': tag_filter,
-        'bookmarked_ids': set(
-            Bookmark.objects.filter(user=request.user, resource__in=page_obj.object_list)
-            .values_list('resource_id', flat=True)
-        ) if request.user.is_authenticated else set(),
+        'bookmarked_ids': state.ids('bookmarked', 'resource'),
         'tags_list': tags_list,
         'resource_type_options': resource_type_options,
     }
@@ -346,9 +406,8 @@ def resource_list_api(request):
     Scope rules:
             - all: verified public resources (plus pending public for professors)
       - mine: all resources uploaded by the user (public or private, any verification status)
+    Paged by ?cursor= (newest first); ?include_total=1 adds an approximate total.
     """
-    from django.core.paginator import Paginator
-
     scope = request.GET.get('scope', 'all')
     if scope == 'mine':
         # Show only user's uploads (any verification status, any visibility)
@@ -368,7 +427,10 @@ def resource_list_api(request):
 
     tag_filter = request.GET.get('tag')
     if tag_filter:
-        resources_qs = resources_qs.filter(tags__name__iexact=tag_filter)
+        # EXISTS instead of a join, so no DISTINCT is needed
+        resources_qs = resources_qs.filter(Exists(
+            Resource.tags.through.objects.filter(resource_id=OuterRef('pk'), tag__name__iexact=tag_filter)
+        ))
 
     search_query = request.GET.get('q')
     if search_query:
@@ -376,15 +438,20 @@ def resource_list_api(request):
             Q(title__icontains=search_query) | Q(description__icontains=search_query)
         )
 
-    resources_qs = resources_qs.order_by('-created_at').distinct()
-
-    page_size = int(request.GET.get('page_size', 12))
-    page_number = request.GET.get('page', 1)
-    paginator = Paginator(resources_qs, page_size)
-    page_obj = paginator.get_page(page_number)
+    page_obj = pagination.paginate(
+        resources_qs.select_related('uploader'),
+        request.GET.get('cursor'),
+        pagination.get_page_size(request.GET.get('page_size'), 12),
+        with_total=request.GET.get('include_total') == '1',
+    )
+    page_resources = page_obj.object_list
+    prefetch_related_objects(page_resources, 'tags')
+    bookmarked_ids = viewer_state.load(
+        request.user, [('resource', r.pk) for r in page_resources], relations=('bookmarked',)
+    ).ids('bookmarked', 'resource')
 
     data = []
-    for r in page_obj.object_list.select_related('uploader').prefetch_related('tags'):
+    for r in page_resources:
         data.append({
             'id': r.id,
             'title': r.title,
@@ -396,21 +463,17 @@ def resource_list_api(request):
             'average_rating': r.get_average_rating(),
             'rating_count': r.get_rating_count(),
             'tags': [t.name for t in r.tags.all()[:6]],
-            'tags_extra': max(r.tags.count() - 6, 0),
+            'tags_extra': max(len(r.tags.all()) - 6, 0),
             'uploader': getattr(r.uploader, 'get_full_name', lambda: r.uploader.username)() or r.uploader.username,
             'created_at': r.created_at.isoformat(),
             'created_since': timesince(r.created_at) + ' ago',
-            'bookmarked': request.user.is_authenticated and Bookmark.objects.filter(user=request.user, resource=r).exists(),
+            'bookmarked': r.id in bookmarked_ids,
         })
 
     return JsonResponse({
         'success': True,
         'results': data,
-        'page': page_obj.number,
-        'num_pages': paginator.num_pages,
-        'has_next': page_obj.has_next(),
-        'has_previous': page_obj.has_previous(),
-        'total': paginator.count,
+        **page_obj.as_json(),
     })
 
 # bookmark_toggle view removed (feature deprecated)
@@ -524,63 +587,65 @@ def resource_edit(request, pk):
             original_public = resource.is_public
             new_public = resource_obj.is_public
 
-            # Handle new file upload if provided
-            if 'file' in request.FILES:
-                uploaded_file = request.FILES['file']
-                
-                # Delete old file if exists
-                if resource.file_url:
-                    supabase_storage.delete_file(resource.file_url)
+            # Upload, release of the old file and save succeed or fail together
+            with transaction.atomic():
+                # Handle new file upload if provided
+                if 'file' in request.FILES:
+                    uploaded_file = request.FILES['file']
+                    old_file_url = resource.file_url
                 
-                # Upload new file
-                success, file_url, error = supabase_storage.upload_file(
-                    uploaded_file,
-                    folder="resources"
-                )
+                    # Upload new file (identical content reuses the stored copy)
+                    success, file_url, error = supabase_storage.upload_file(
+                        uploaded_file,
+                        folder="resources"
+                    )
                 
-                if success:
-                    resource_obj.file_url = file_url
-                    resource_obj.original_filename = uploaded_file.name
-                    resource_obj.file_size = uploaded_file.size
+                    if success:
+                        # Release old file (deleted from storage once nothing references it)
+                        if old_file_url:
+                            supabase_storage.release_file(old_file_url)
+                        resource_obj.file_url = file_url
+                        resource_obj.original_filename = uploaded_file.name
+                        resource_obj.file_size = uploaded_file.size
+                    else:
+                        messages.error(request, f'File upload failed: {error}')
+                        return render(request, 'resources/resource_edit.html', {
+                            'form': form,
+                            'resource': resource
+                        })
+
+                # Visibility transition logic for non-professor uploader:
+                # - private -> public: set to pending (requires approval)
+                # - public -> private: auto-verify if not already verified
+                if not getattr(request.user, 'is_professor', False) and resource.uploader == request.user:
+                    if (not original_public) and new_public:
+                        resource_obj.verification_status = 'pending'
+                        resource_obj.approved = False
+                        resource_obj.verification_by = None
+                        resource_obj.verified_at = None
+                    elif original_public and (not new_public):
+                        # Moving to private; verification no longer depends on professor approval
+                        if resource_obj.verification_status != 'verified':
+                            resource_obj.verification_status = 'verified'
+                            resource_obj.approved = True
+                            resource_obj.verification_by = request.user
+                            resource_obj.verified_at = timezone.now()
+
+                # Persist main changes
+                resource_obj.save()
+
+                # Tags: prefer comma-separated input if provided
+                tags_text = request.POST.get('tags_text', None)
+                if tags_text is not None:
+                    tag_names = [t.strip() for t in tags_text.split(',') if t.strip()]
+                    tag_objs = []
+                    for name in tag_names:
+                        tag, _ = Tag.objects.get_or_create(name=name)
+                        tag_objs.append(tag)
+                    resource_obj.tags.set(tag_objs)
                 else:
-                    messages.error(request, f'File upload failed: {error}')
-                    return render(request, 'resources/resource_edit.html', {
-                        'form': form,
-                        'resource': resource
-                    })
-
-            # Visibility transition logic for non-professor uploader:
-            # - private -> public: set to pending (requires approval)
-            # - public -> private: auto-verify if not already verified
-            if not getattr(request.user, 'is_professor', False) and resource.uploader == request.user:
-                if (not original_public) and new_public:
-                    resource_obj.verification_status = 'pending'
-                    resource_obj.approved = False
-                    resource_obj.verification_by = None
-                    resource_obj.verified_at = None
-                elif original_public and (not new_public):
-                    # Moving to private; verification no longer depends on professor approval
-                    if resource_obj.verification_status != 'verified':
-                        resource_obj.verification_status = 'verified'
-                        resource_obj.approved = True
-                        resource_obj.verification_by = request.user
-                        resource_obj.verified_at = timezone.now()
-
-            # Persist main changes
-            resource_obj.save()
-
-            # Tags: prefer comma-separated input if provided
-            tags_text = request.POST.get('tags_text', None)
-            if tags_text is not None:
-                tag_names = [t.strip() for t in tags_text.split(',') if t.strip()]
-                tag_objs = []
-                for name in tag_names:
-                    tag, _ = Tag.objects.get_or_create(name=name)
-                    tag_objs.append(tag)
-                resource_obj.tags.set(tag_objs)
-            else:
-                # Fall back to form's m2m if our custom field wasn't used
-                form.save_m2m()
+                    # Fall back to form's m2m if our custom field wasn't used
+                    form.save_m2m()
 
             # Refresh instance for template usage/redirect
             resource = resource_obj
@@ -685,11 +750,10 @@ def resource_delete(request, pk):
         return redirect('resources:resource_detail', pk=pk)
     
     if request.method == 'POST':
-        # Delete file from Supabase if exists
-        if resource.file_url:
-            supabase_storage.delete_file(resource.file_url)
-        
-        resource.delete()
+        with transaction.atomic():
+            # A post_delete signal releases the file (deleted from Supabase
+            # once no other resource uses it, after commit)
+            resource.delete()
         messages.success(request, 'Resource deleted successfully.')
         
         # Check if user came from my-resources page
@@ -703,10 +767,8 @@ def resource_delete(request, pk):
 
 @login_required
 def resource_download(request, pk):
-    """Track download and serve file securely or redirect to external URL"""
-    from django.http import FileResponse
-    import mimetypes
-    import urllib.parse
+    """Track download and serve the stored file (see resources.downloads) or redirect to external URL"""
+    import requests
     
     resource = get_object_or_404(Resource, pk=pk)
     
@@ -721,78 +783,39 @@ def resource_download(request, pk):
             messages.error(request, 'This resource is pending verification.')
             return redirect('resources:resource_list')
     
-    # Increment download count
-    resource.increment_download_count()
+    # Increment download count (once per download, not per resumed range)
+    if downloads.counts_as_download(request):
+        resource.increment_download_count()
     
     # For external URLs, redirect directly
     if resource.external_url:
         return redirect(resource.external_url)
     
-    # For file URLs (Supabase storage), download and serve with correct filename
+    # For file URLs (Supabase storage), serve the file with its original filename
     if resource.file_url:
-        from django.http import HttpResponse
-        import requests
-        
-        # Get the original filename
-        if resource.original_filename and resource.original_filename.strip():
-            filename = resource.original_filename
-        else:
-            # Try to extract from file_url (last part of path)
-            from urllib.parse import urlparse
-            parsed_url = urlparse(resource.file_url)
-            path_parts = parsed_url.path.split('/')
-            filename_from_url = path_parts[-1] if path_parts else None
-            
-            # If URL has a UUID-like filename, fall back to title
-            if filename_from_url and len(filename_from_url) == 36 and filename_from_url.count('-') == 4:
-                # This looks like a UUID, use title instead
-                extension_map = {
-                    'pdf': '.pdf',
-                    'ppt': '.ppt',
-                    'pptx': '.pptx',
-                    'docx': '.docx',
-                    'txt': '.txt',
-                    'image': '.jpg',
-                    'link': ''
-                }
-                ext = extension_map.get(resource.resource_type, '')
-                filename = f"{resource.title}{ext}"
-            else:
-                # Use filename from URL
-                filename = filename_from_url if filename_from_url else f"{resource.title}.bin"
-        
+        filename = downloads.download_filename(resource)
+        strategy = downloads.get_strategy(resource)
+        if strategy == 'redirect':
+            return downloads.redirect_file(request, resource, filename)
+        serve = downloads.proxy_file if strategy == 'proxy' else downloads.stream_file
         try:
-            # Download the file from Supabase
-            response = requests.get(resource.file_url, timeout=30)
-            
-            if response.status_code == 200:
-                # Create HTTP response with the file content
-                file_response = HttpResponse(response.content, content_type=response.headers.get('content-type', 'application/octet-stream'))
-                
-                # Set proper Content-Disposition header with original filename
-                file_response['Content-Disposition'] = f'attachment; filename="{filename}"'
-                file_response['Content-Length'] = len(response.content)
-                
-                return file_response
-            else:
-                messages.error(request, 'File not found on storage server.')
-                return redirect('resources:resource_detail', pk=pk)
-                
+            file_response = serve(request, resource, filename)
         except requests.RequestException as e:
             messages.error(request, f'Error downloading file: {str(e)}')
             return redirect('resources:resource_detail', pk=pk)
+        if file_response is None:
+            messages.error(request, 'File not found on storage server.')
+            return redirect('resources:resource_detail', pk=pk)
+        return file_response
     
     # No file available
     messages.error(request, 'No file available for download.')
     return redirect('resources:resource_detail', pk=pk)
 
 
-def resource_preview(request, pk):
-    """Preview file content without downloading"""
+def _preview_access_error(request, resource):
+    """JSON error response when the user may not preview this resource, else None"""
     from django.http import JsonResponse
-    import requests
-    
-    resource = get_object_or_404(Resource, pk=pk)
     
     # Restrict access to private resources to uploader only
     if not resource.is_public and resource.uploader != request.user:
@@ -805,123 +828,70 @@ def resource_preview(request, pk):
     
     if not resource.file_url:
         return JsonResponse({'error': 'No file available.'}, status=404)
+    return None
+
+
+def resource_preview(request, pk):
+    """Preview file content without downloading (text; images and PDFs point to resource_preview_file)"""
+    from django.http import JsonResponse
+    import requests
+    
+    resource = get_object_or_404(Resource, pk=pk)
+    error = _preview_access_error(request, resource)
+    if error:
+        return error
+    
+    if resource.resource_type in previews.FILE_PREVIEW_TYPES:
+        return JsonResponse({
+            'type': resource.resource_type,
+            'url': reverse('resources:resource_preview_file', args=[pk]),
+        })
     
     try:
-        # Download the file from Supabase
-        response = requests.get(resource.file_url, timeout=30)
-        
-        if response.status_code != 200:
-            return JsonResponse({'error': 'File not found on storage server.'}, status=404)
-        
-        file_content = response.content
-        
-        # Process based on file type
-        if resource.resource_type == 'txt':
-            # Return text content
-            try:
-                text_content = file_content.decode('utf-8', errors='ignore')
-                # Limit to first 10000 characters for preview
-                preview_text = text_content[:10000]
-                if len(text_content) > 10000:
-                    preview_text += '\n\n... (truncated, download to see full content)'
-                return JsonResponse({'content': preview_text, 'type': 'text'})
-            except Exception as e:
-                return JsonResponse({'error': f'Could not read text file: {str(e)}'}, status=400)
-        
-        elif resource.resource_type == 'image':
-            # Return image as base64
-            import base64
-            base64_content = base64.b64encode(file_content).decode('utf-8')
-            return JsonResponse({
-                'content': base64_content, 
-                'type': 'image',
-                'mime_type': response.headers.get('content-type', 'image/jpeg')
-            })
-        
-        elif resource.resource_type == 'pdf':
-            # Return PDF as base64
-            import base64
-            base64_content = base64.b64encode(file_content).decode('utf-8')
-            return JsonResponse({
-                'content': base64_content,
-                'type': 'pdf',
-                'mime_type': 'application/pdf'
-            })
-        
-        elif resource.resource_type == 'docx':
-            # Extract text from DOCX file
-            try:
-                from docx import Document
-                import io
-                
-                # Load document from binary content
-                doc = Document(io.BytesIO(file_content))
-                
-                # Extract all paragraphs
-                text_content = []
-                for para in doc.paragraphs:
-                    if para.text.strip():
-                        text_content.append(para.text)
-                
-                # Extract tables
-                for table in doc.tables:
-                    table_text = []
-                    for row in table.rows:
-                        row_text = []
-                        for cell in row.cells:
-                            row_text.append(cell.text.strip())
-                        table_text.append(' | '.join(row_text))
-                    text_content.extend(table_text)
-                
-                # Join all content
-                preview_text = '\n'.join(text_content)
-                
-                # Limit to first 10000 characters
-                if len(preview_text) > 10000:
-                    preview_text = preview_text[:10000] + '\n\n... (truncated, download to see full content)'
-                
-                return JsonResponse({'content': preview_text, 'type': 'text'})
-            except Exception as e:
-                return JsonResponse({'error': f'Could not read DOCX file: {str(e)}'}, status=400)
+        meta, content = previews.get_preview(resource)
+    except previews.PreviewError as e:
+        return JsonResponse({'error': e.message}, status=e.status)
+    except requests.RequestException as e:
+        return JsonResponse({'error': f'Error loading file: {str(e)}'}, status=500)
+    
+    return JsonResponse({'content': content.decode('utf-8'), 'type': 'text'})
+
+
+def resource_preview_file(request, pk):
+    """Raw bytes of an image or PDF for inline preview, with ETag and Range support"""
+    from django.http import JsonResponse
+    import requests
+    
+    resource = get_object_or_404(Resource, pk=pk)
+    error = _preview_access_error(request, resource)
+    if error:
+        return error
+    if resource.resource_type not in previews.FILE_PREVIEW_TYPES:
+        return JsonResponse({'error': f'Preview not available for {resource.resource_type} files.'}, status=400)
+    
+    filename = downloads.download_filename(resource)
+    try:
+        if not previews.is_cacheable(resource):
+            # Too large to cache: let storage answer Range and If-None-Match itself
+            response = downloads.stream_file(request, resource, filename, as_attachment=False)
+            if response is None:
+                return JsonResponse({'error': 'File not found on storage server.'}, status=404)
+            return response
         
-        elif resource.resource_type == 'pptx':
-            # Extract text from PPTX file
-            try:
-                from pptx import Presentation
-                import io
-                
-                # Load presentation from binary content
-                prs = Presentation(io.BytesIO(file_content))
-                
-                # Extract all text
-                slide_texts = []
-                for slide_num, slide in enumerate(prs.slides, 1):
-                    slide_text = []
-                    for shape in slide.shapes:
-                        if hasattr(shape, 'text') and shape.text.strip():
-                            slide_text.append(shape.text)
-                    if slide_text:
-                        slide_texts.append(f"--- Slide {slide_num} ---\n" + '\n'.join(slide_text))
-                
-                # Join all slides
-                preview_text = '\n\n'.join(slide_texts)
-                
-                # Limit to first 10000 characters
-                if len(preview_text) > 10000:
-                    preview_text = preview_text[:10000] + '\n\n... (truncated, download to see full content)'
-                
-                return JsonResponse({'content': preview_text, 'type': 'text'})
-            except Exception as e:
-                return JsonResponse({'error': f'Could not read PPTX file: {str(e)}'}, status=400)
+        def load():
+            meta, content = previews.get_preview(resource)
+            return meta['mime_type'], content
         
-        else:
-            return JsonResponse({'error': f'Preview not available for {resource.resource_type} files.'}, status=400)
-    
+        return downloads.serve_bytes(
+            request, load, previews.preview_etag(resource), filename,
+            max_age=getattr(settings, 'PREVIEW_BROWSER_MAX_AGE', 300),
+        )
+    except previews.PreviewError as e:
+        return JsonResponse({'error': e.message}, status=e.status)
     except requests.RequestException as e:
         return JsonResponse({'error': f'Error loading file: {str(e)}'}, status=500)
 
 
-
 @login_required
 def rate_resource(request, pk):
     """Rate a resource (supports AJAX)"""
@@ -984,6 +954,8 @@ def rate_resource(request, pk):
         )
         
         action = 'rated' if created else 'updated rating for'
+        # Counters were updated in the database by the rating signals
+        resource.refresh_from_db(fields=['rating_sum', 'rating_count'])
         avg_rating = resource.get_average_rating()
         rating_count = resource.get_rating_count()
 
@@ -1137,8 +1109,9 @@ def toggle_like(request, pk):
         action = 'liked'
         user_has_liked = True
     
-    # Get updated like count
-    like_count = resource.likes.count()
+    # Get updated like count (maintained by the like signals)
+    resource.refresh_from_db(fields=['likes_count'])
+    like_count = resource.likes_count
     
     return JsonResponse({
         'success': True,
@@ -6,7 +6,7 @@
   const typeSelect = document.getElementById('typeFilter');
   // Tag filter removed
   const pagingContainer = document.querySelector('.pagination-wrap');
-  let currentPage = 1; let loading=false;
+  let currentCursor = ''; let loading=false;
 
   function debounce(fn, wait){ let t; return (...a)=>{ clearTimeout(t); t=setTimeout(()=>fn.apply(this,a),wait);}; }
 
@@ -53,18 +53,18 @@
     } catch(e){ console.warn('Remove bookmark failed', e); }
   }
 
-  async function fetchBookmarks(page=1){
+  async function fetchBookmarks(cursor=''){
     if(loading) return; loading=true; grid.classList.add('loading');
     const params = new URLSearchParams();
     if(searchInput && searchInput.value.trim()) params.append('q', searchInput.value.trim());
     if(typeSelect && typeSelect.value) params.append('resource_type', typeSelect.value);
-    params.append('page', page);
+    if(cursor) params.append('cursor', cursor);
     try {
       const resp = await fetch('/bookmarks/api/list/?'+params.toString(), { headers:{'Accept':'application/json'} });
       if(!resp.ok) throw new Error('Network');
       const json = await resp.json();
       if(!json.success) throw new Error('API');
-      currentPage = json.page;
+      currentCursor = cursor;
       const html = json.results.map(cardHTML).join('');
       if(html){ grid.innerHTML = html; grid.classList.remove('is-empty'); } else { grid.innerHTML = '<div class="resources-empty">No bookmarks found.</div>'; grid.classList.add('is-empty'); }
       renderPagination(json);
@@ -74,14 +74,13 @@
   }
 
   function renderPagination(meta){
-    if(!pagingContainer) return; const {page,num_pages,has_previous,has_next}=meta;
-    if(num_pages<=1){ pagingContainer.innerHTML=''; return; }
+    if(!pagingContainer) return; const {next_cursor,previous_cursor,has_previous,has_next}=meta;
+    if(!has_previous && !has_next){ pagingContainer.innerHTML=''; return; }
     let out='<ul class="pagination justify-content-center">';
-    if(has_previous){ out+=`<li class='page-item'><a class='page-link' data-page='${page-1}' href='#'>Previous</a></li>`; }
-    out+=`<li class='page-item active'><span class='page-link'>Page ${page} of ${num_pages}</span></li>`;
-    if(has_next){ out+=`<li class='page-item'><a class='page-link' data-page='${page+1}' href='#'>Next</a></li>`; }
+    if(has_previous){ out+=`<li class='page-item'><a class='page-link' data-cursor='${previous_cursor}' href='#'>Previous</a></li>`; }
+    if(has_next){ out+=`<li class='page-item'><a class='page-link' data-cursor='${next_cursor}' href='#'>Next</a></li>`; }
     out+='</ul>'; pagingContainer.innerHTML=out;
-    pagingContainer.querySelectorAll('a.page-link').forEach(a=>{ a.addEventListener('click',e=>{ e.preventDefault(); fetchBookmarks(parseInt(a.dataset.page)); }); });
+    pagingContainer.querySelectorAll('a.page-link').forEach(a=>{ a.addEventListener('click',e=>{ e.preventDefault(); fetchBookmarks(a.dataset.cursor); }); });
   }
 
   function bindRemove(){
@@ -90,9 +89,9 @@
     });
   }
 
-  const debouncedFetch = debounce(()=>fetchBookmarks(1), 400);
+  const debouncedFetch = debounce(()=>fetchBookmarks(), 400);
   if(searchInput) searchInput.addEventListener('input', debouncedFetch);
-  if(typeSelect) typeSelect.addEventListener('change', ()=>fetchBookmarks(1));
+  if(typeSelect) typeSelect.addEventListener('change', ()=>fetchBookmarks());
 
   // Enhance selects (reuse from resources)
   function enhanceSelect(sel){
@@ -101,7 +100,7 @@
     const trigger=document.createElement('button'); trigger.type='button'; trigger.className='filter-dd-trigger'; trigger.setAttribute('aria-haspopup','listbox'); trigger.setAttribute('aria-expanded','false'); trigger.innerHTML=`<span class='dd-icon'><i class='fas fa-filter'></i></span><span class='dd-label'>${sel.options[sel.selectedIndex]?.text||'Select'}</span>`;
     const menu=document.createElement('ul'); menu.className='filter-dd-menu'; menu.setAttribute('role','listbox'); menu.tabIndex=-1;
     const isType= sel.id==='typeFilter'; const localIconMap=iconMap;
-    Array.from(sel.options).forEach(opt=>{ const li=document.createElement('li'); li.className='filter-dd-item'; li.setAttribute('role','option'); li.dataset.value=opt.value; if(opt.selected) li.setAttribute('aria-selected','true'); const icon=isType && opt.value? `<span class='type-icon'><i class='fas fa-${localIconMap[opt.value]||'file-alt'}'></i></span>`:'<span class="type-icon"></span>'; li.innerHTML=`${icon}<span class='opt-text'>${opt.text}</span>`; li.addEventListener('click',()=>{ Array.from(menu.children).forEach(c=>c.removeAttribute('aria-selected')); li.setAttribute('aria-selected','true'); sel.value=opt.value; sel.dispatchEvent(new Event('change',{bubbles:true})); trigger.querySelector('.dd-label').textContent=opt.text; closeMenu(); fetchBookmarks(1); }); menu.appendChild(li); });
+    Array.from(sel.options).forEach(opt=>{ const li=document.createElement('li'); li.className='filter-dd-item'; li.setAttribute('role','option'); li.dataset.value=opt.value; if(opt.selected) li.setAttribute('aria-selected','true'); const icon=isType && opt.value? `<span class='type-icon'><i class='fas fa-${localIconMap[opt.value]||'file-alt'}'></i></span>`:'<span class="type-icon"></span>'; li.innerHTML=`${icon}<span class='opt-text'>${opt.text}</span>`; li.addEventListener('click',()=>{ Array.from(menu.children).forEach(c=>c.removeAttribute('aria-selected')); li.setAttribute('aria-selected','true'); sel.value=opt.value; sel.dispatchEvent(new Event('change',{bubbles:true})); trigger.querySelector('.dd-label').textContent=opt.text; closeMenu(); fetchBookmarks(); }); menu.appendChild(li); });
     function openMenu(){ wrapper.classList.add('open'); trigger.setAttribute('aria-expanded','true'); menu.focus(); }
     function closeMenu(){ wrapper.classList.remove('open'); trigger.setAttribute('aria-expanded','false'); }
     trigger.addEventListener('click',()=>{ wrapper.classList.contains('open')? closeMenu():openMenu(); });
@@ -113,5 +112,5 @@
   enhanceSelect(typeSelect);
 
   // Initial load (JS overrides server fallback)
-  fetchBookmarks(currentPage);
+  fetchBookmarks(currentCursor);
 })();
\ No newline at end of file
@@ -6,6 +6,12 @@
 let searchTimeout = null;
 let searchAbortController = null;
 
+// Typeahead: the server ignores shorter queries, so don't send them
+const SEARCH_MIN_LENGTH = 3;
+// Recent responses keyed by normalized query (mirrors the server-side cache)
+const searchResultCache = new Map();
+const SEARCH_CACHE_SIZE = 50;
+
 // Initialize search functionality
 function initGlobalSearch() {
     const searchInput = document.querySelector('.search-box-inline input[type="text"]');
@@ -27,8 +33,11 @@ function initGlobalSearch() {
             clearTimeout(searchTimeout);
         }
         
-        // Hide dropdown if query is empty
-        if (query.length === 0) {
+        // Hide dropdown if query is too short; cancel any request in flight
+        if (normalizeSearchQuery(query).length < SEARCH_MIN_LENGTH) {
+            if (searchAbortController) {
+                searchAbortController.abort();
+            }
             hideSearchResults();
             return;
         }
@@ -59,12 +68,16 @@ function initGlobalSearch() {
     }
 }
 
+// Lowercase words separated by single spaces (same normalization as the server)
+function normalizeSearchQuery(query) {
+    return (query.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || []).join(' ');
+}
+
 // Perform global search API call
 async function performGlobalSearch(query) {
     const searchLoading = document.getElementById('searchLoading');
     const searchEmpty = document.getElementById('searchEmpty');
     const searchResultsList = document.getElementById('searchResultsList');
-    const searchResultsCount = document.getElementById('searchResultsCount');
     const searchDropdown = document.getElementById('searchResultsDropdown');
     
     // Abort previous request if exists
@@ -72,6 +85,15 @@ async function performGlobalSearch(query) {
         searchAbortController.abort();
     }
     
+    const normalized = normalizeSearchQuery(query);
+    if (searchResultCache.has(normalized)) {
+        searchDropdown.style.display = 'block';
+        searchLoading.style.display = 'none';
+        searchEmpty.style.display = 'none';
+        showSearchData(query, searchResultCache.get(normalized));
+        return;
+    }
+    
     // Create new abort controller
     searchAbortController = new AbortController();
     
@@ -82,7 +104,7 @@ async function performGlobalSearch(query) {
     searchResultsList.innerHTML = '';
     
     try {
-        const response = await fetch(`/api/global-search/?q=${encodeURIComponent(query)}`, {
+        const response = await fetch(`/api/global-search/?q=${encodeURIComponent(normalized)}`, {
             signal: searchAbortController.signal
         });
         
@@ -93,17 +115,12 @@ async function performGlobalSearch(query) {
         const data = await response.json();
         searchLoading.style.display = 'none';
         
-        // Display results
-        displaySearchResults(data);
-        
-        // Update count
-        const totalResults = (data.resources?.length || 0) + 
-                           (data.quizzes?.length || 0) + 
-                           (data.flashcards?.length || 0);
-        searchResultsCount.textContent = `(${totalResults})`;
+        if (searchResultCache.size >= SEARCH_CACHE_SIZE) {
+            searchResultCache.delete(searchResultCache.keys().next().value);
+        }
+        searchResultCache.set(normalized, data);
         
-        // Update "View All" link
-        document.getElementById('viewAllSearchResults').href = `/search/?q=${encodeURIComponent(query)}`;
+        showSearchData(query, data);
         
     } catch (error) {
         if (error.name === 'AbortError') {
@@ -118,6 +135,21 @@ async function performGlobalSearch(query) {
     }
 }
 
+// Render results, count and "View All" link for a query
+function showSearchData(query, data) {
+    // Display results
+    displaySearchResults(data);
+    
+    // Update count
+    const totalResults = (data.resources?.length || 0) + 
+                       (data.quizzes?.length || 0) + 
+                       (data.flashcards?.length || 0);
+    document.getElementById('searchResultsCount').textContent = `(${totalResults})`;
+    
+    // Update "View All" link
+    document.getElementById('viewAllSearchResults').href = `/search/?q=${encodeURIComponent(query)}`;
+}
+
 // Display search results in dropdown
 function displaySearchResults(data) {
     const searchResultsList = document.getElementById('searchResultsList');
@@ -125,9 +157,11 @@ function displaySearchResults(data) {
     
     const hasResults = (data.resources?.length > 0) || 
                       (data.quizzes?.length > 0) || 
-                      (data.flashcards?.length > 0);
+                      (data.flashcards?.length > 0) ||
+                      (data.tags?.length > 0);
     
     if (!hasResults) {
+        searchResultsList.innerHTML = '';
         searchEmpty.style.display = 'block';
         return;
     }
@@ -209,6 +243,29 @@ function displaySearchResults(data) {
         html += '</div>';
     }
     
+    // Tags
+    if (data.tags && data.tags.length > 0) {
+        html += '<div class="search-results-group">';
+        html += '<div class="search-results-group-header">';
+        html += '<i class="fas fa-tags"></i> Tags';
+        html += '</div>';
+        
+        data.tags.forEach(tag => {
+            html += `
+                <a href="${escapeHtml(tag.url)}" class="search-result-item">
+                    <div class="search-result-icon">
+                        <i class="fas fa-tag"></i>
+                    </div>
+                    <div class="search-result-content">
+                        <div class="search-result-title">${escapeHtml(tag.name)}</div>
+                    </div>
+                </a>
+            `;
+        });
+        
+        html += '</div>';
+    }
+    
     searchResultsList.innerHTML = html;
 }
 
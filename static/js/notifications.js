@@ -4,6 +4,7 @@
  */
 
 let notificationPollingInterval = null;
+let notificationEventSource = null;
 
 // Initialize notification system
 function initNotificationSystem() {
@@ -16,8 +17,8 @@ function initNotificationSystem() {
     // Load initial unread count
     fetchUnreadCount();
     
-    // Poll for updates every 30 seconds
-    notificationPollingInterval = setInterval(fetchUnreadCount, 30000);
+    // Receive updates over Server-Sent Events (falls back to polling)
+    connectNotificationStream();
     
     // Toggle notification dropdown
     notificationBellBtn.addEventListener('click', function(e) {
@@ -41,10 +42,50 @@ function initNotificationSystem() {
     });
 }
 
+// Open the notification event stream; EventSource reconnects on its own
+// and resumes from the last event id it saw
+function connectNotificationStream() {
+    if (!window.EventSource) {
+        startNotificationPolling();
+        return;
+    }
+    
+    notificationEventSource = new EventSource('/api/notifications/stream/');
+    
+    notificationEventSource.addEventListener('unread', function(e) {
+        const data = JSON.parse(e.data);
+        updateNotificationBadge(data.count);
+    });
+    
+    notificationEventSource.addEventListener('notification', function() {
+        // Refresh the open dropdown so the new notification shows up
+        const dropdown = document.getElementById('notificationDropdown');
+        if (dropdown && dropdown.style.display === 'block') {
+            loadNotifications();
+        }
+    });
+    
+    notificationEventSource.onerror = function() {
+        // CLOSED means the server refused the stream (e.g. 503 when the worker is full)
+        if (notificationEventSource.readyState === EventSource.CLOSED) {
+            notificationEventSource = null;
+            startNotificationPolling();
+        }
+    };
+}
+
+// Poll for updates every 30 seconds when streaming is unavailable
+function startNotificationPolling() {
+    if (!notificationPollingInterval) {
+        notificationPollingInterval = setInterval(fetchUnreadCount, 30000);
+    }
+}
+
 // Fetch unread notification count
 async function fetchUnreadCount() {
     try {
-        const response = await fetch('/api/notifications/unread-count/');
+        // no-cache revalidates with the ETag; unchanged counts come back as 304
+        const response = await fetch('/api/notifications/unread-count/', { cache: 'no-cache' });
         if (!response.ok) throw new Error('Failed to fetch count');
         
         const data = await response.json();
@@ -303,6 +344,9 @@ window.addEventListener('beforeunload', function() {
     if (notificationPollingInterval) {
         clearInterval(notificationPollingInterval);
     }
+    if (notificationEventSource) {
+        notificationEventSource.close();
+    }
 });
 
 // Initialize on page load
@@ -247,7 +247,41 @@ document.addEventListener('DOMContentLoaded', function() {
     if (previewContent) previewContent.style.display = 'none';
     if (previewError) previewError.style.display = 'none';
     
-    // Fetch preview from backend
+    function showError(error) {
+      if (previewLoading) previewLoading.style.display = 'none';
+      if (previewError) previewError.style.display = 'block';
+      if (errorMessage) errorMessage.textContent = error.message || 'Could not load file preview. Please try downloading the file instead.';
+    }
+
+    // Images and PDFs load as raw bytes; probe one byte first so errors show in the modal
+    if (fileType === 'image' || fileType === 'pdf') {
+      const fileUrl = `/resources/${resourceId}/preview/file/`;
+      fetch(fileUrl, { headers: { 'Range': 'bytes=0-0' } })
+        .then(response => {
+          if (!response.ok) {
+            return response.json().then(data => {
+              throw new Error(data.error || 'Failed to load preview');
+            });
+          }
+          if (previewLoading) previewLoading.style.display = 'none';
+          if (fileType === 'image') {
+            const imagePreview = document.getElementById('imagePreview');
+            const previewImage = document.getElementById('previewImage');
+            if (previewImage) previewImage.src = fileUrl;
+            if (imagePreview) imagePreview.style.display = 'block';
+          } else {
+            const pdfPreview = document.getElementById('pdfPreview');
+            const pdfFrame = document.getElementById('pdfFrame');
+            if (pdfFrame) pdfFrame.src = fileUrl;
+            if (pdfPreview) pdfPreview.style.display = 'block';
+          }
+          if (previewContent) previewContent.style.display = 'block';
+        })
+        .catch(showError);
+      return;
+    }
+
+    // Text previews come from the JSON endpoint
     fetch(`/resources/${resourceId}/preview/`)
       .then(response => {
         if (!response.ok) {
@@ -260,21 +294,7 @@ document.addEventListener('DOMContentLoaded', function() {
       .then(data => {
         if (previewLoading) previewLoading.style.display = 'none';
         
-        if (data.type === 'image') {
-          const imagePreview = document.getElementById('imagePreview');
-          const previewImage = document.getElementById('previewImage');
-          if (previewImage) previewImage.src = `data:${data.mime_type};base64,${data.content}`;
-          if (imagePreview) imagePreview.style.display = 'block';
-          if (previewContent) previewContent.style.display = 'block';
-        } 
-        else if (data.type === 'pdf') {
-          const pdfPreview = document.getElementById('pdfPreview');
-          const pdfFrame = document.getElementById('pdfFrame');
-          if (pdfFrame) pdfFrame.src = `data:application/pdf;base64,${data.content}`;
-          if (pdfPreview) pdfPreview.style.display = 'block';
-          if (previewContent) previewContent.style.display = 'block';
-        }
-        else if (data.type === 'text') {
+        if (data.type === 'text') {
           const textPreview = document.getElementById('textPreview');
           const textContent = document.getElementById('textContent');
           if (textContent) textContent.textContent = data.content;
@@ -282,11 +302,7 @@ document.addEventListener('DOMContentLoaded', function() {
           if (previewContent) previewContent.style.display = 'block';
         }
       })
-      .catch(error => {
-        if (previewLoading) previewLoading.style.display = 'none';
-        if (previewError) previewError.style.display = 'block';
-        if (errorMessage) errorMessage.textContent = error.message || 'Could not load file preview. Please try downloading the file instead.';
-      });
+      .catch(showError);
   }
 
   // === RATING MODAL (NEW STYLE) ===
@@ -13,7 +13,7 @@
   // Determine initial scope from active tab (supports /my-resources/ server-rendered view)
   let currentScope = (tabs.find(t => t.classList.contains('active'))?.dataset.scope) || 'all';
 
-  let currentPage = 1;
+  let currentCursor = '';
   let loading = false;
   let lastQuery = '';
 
@@ -70,7 +70,7 @@
 
   // Bookmark handlers removed (feature deprecated)
 
-  async function fetchResources(page=1){
+  async function fetchResources(cursor=''){
     if(loading) {
       console.log('[Resources] Already loading, skipping...');
       return;
@@ -81,13 +81,13 @@
     if(searchInput && searchInput.value.trim()) params.append('q', searchInput.value.trim());
   if(typeSelect && typeSelect.value) params.append('resource_type', typeSelect.value);
     if(currentScope === 'mine') params.append('scope','mine');
-    params.append('page', page);
+    if(cursor) params.append('cursor', cursor);
     try {
       const resp = await fetch('/resources/api/list/?'+params.toString(), { headers:{'Accept':'application/json'} });
       if(!resp.ok) throw new Error('Network error');
       const json = await resp.json();
       if(!json.success) throw new Error('API error');
-      currentPage = json.page;
+      currentCursor = cursor;
       const html = json.results.map(r=>buildCard(r)).join('');
       if(html){
         grid.innerHTML = html;
@@ -111,30 +111,29 @@
     }
   }
 
+  // Cursor pagination: the API returns opaque next/previous cursors
   function renderPagination(meta){
     if(!pagingContainer) return;
-    const {page, num_pages, has_previous, has_next} = meta;
-    if(num_pages <= 1){ pagingContainer.innerHTML=''; return; }
+    const {next_cursor, previous_cursor, has_previous, has_next} = meta;
+    if(!has_previous && !has_next){ pagingContainer.innerHTML=''; return; }
     let inner = '<ul class="pagination justify-content-center">';
     if(has_previous){
-      inner += `<li class="page-item"><a class="page-link" data-page="1" href="#">First</a></li>`;
-      inner += `<li class="page-item"><a class="page-link" data-page="${page-1}" href="#">Previous</a></li>`;
+      inner += `<li class="page-item"><a class="page-link" data-cursor="" href="#">Newest</a></li>`;
+      inner += `<li class="page-item"><a class="page-link" data-cursor="${previous_cursor}" href="#">Previous</a></li>`;
     }
-    inner += `<li class="page-item active"><span class="page-link">Page ${page} of ${num_pages}</span></li>`;
     if(has_next){
-      inner += `<li class="page-item"><a class="page-link" data-page="${page+1}" href="#">Next</a></li>`;
-      inner += `<li class="page-item"><a class="page-link" data-page="${num_pages}" href="#">Last</a></li>`;
+      inner += `<li class="page-item"><a class="page-link" data-cursor="${next_cursor}" href="#">Next</a></li>`;
     }
     inner += '</ul>';
     pagingContainer.innerHTML = inner;
     pagingContainer.querySelectorAll('a.page-link').forEach(a=>{
-      a.addEventListener('click', e=>{ e.preventDefault(); const p=a.getAttribute('data-page'); fetchResources(parseInt(p)); });
+      a.addEventListener('click', e=>{ e.preventDefault(); fetchResources(a.getAttribute('data-cursor')); });
     });
   }
 
-  const debouncedFetch = debounce(()=>fetchResources(1), 400);
+  const debouncedFetch = debounce(()=>fetchResources(), 400);
   if(searchInput){ searchInput.addEventListener('input', debouncedFetch); }
-  if(typeSelect){ typeSelect.addEventListener('change', ()=>fetchResources(1)); }
+  if(typeSelect){ typeSelect.addEventListener('change', ()=>fetchResources()); }
   // No Clear button; filters auto-apply
 
   // Tab handling
@@ -149,12 +148,12 @@
       if(scopeHeading){
         scopeHeading.textContent = currentScope === 'mine' ? 'My Resources' : 'Latest Resources';
       }
-      fetchResources(1);
+      fetchResources();
     });
   });
 
   // Initial fetch enhancement (progressive enhancement - only if JS active)
-  fetchResources(currentPage);
+  fetchResources(currentCursor);
 
   // ===== Custom Dropdown Enhancement =====
   function enhanceSelect(sel){
@@ -188,7 +187,7 @@
         li.setAttribute('aria-selected','true');
         sel.value=opt.value; sel.dispatchEvent(new Event('change',{bubbles:true}));
         trigger.querySelector('.dd-label').textContent=opt.text;
-        closeMenu(); fetchResources(1);
+        closeMenu(); fetchResources();
       });
       menu.appendChild(li);
     });